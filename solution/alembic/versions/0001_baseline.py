@@ -0,0 +1,192 @@
+"""baseline
+
+Схема на момент перехода на миграции: то, что раньше создавал create_all при
+старте API, включая компактную партиционированную ad_events. Существующие базы
+не пересоздаются — api.database.migrations помечает их этой ревизией.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 12:17:58.674582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('advertisers',
+    sa.Column('advertiser_id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(length=128), nullable=False),
+    sa.PrimaryKeyConstraint('advertiser_id')
+    )
+    op.create_index(op.f('ix_advertisers_name'), 'advertisers', ['name'], unique=False)
+    op.create_table('bot_fsm_states',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('state', sa.String(), nullable=True),
+    sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_bot_fsm_states_expires_at'), 'bot_fsm_states', ['expires_at'], unique=False)
+    op.create_table('bot_notifications',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('dedupe_key', sa.String(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default='pending', nullable=False),
+    sa.Column('coalesced', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('next_attempt_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('sent_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_bot_notifications_due', 'bot_notifications', ['next_attempt_at'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+    op.create_index('uq_bot_notifications_pending', 'bot_notifications', ['chat_id', 'dedupe_key'], unique=True, postgresql_where=sa.text("status = 'pending'"))
+    op.create_table('clients',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('login', sa.String(length=64), nullable=False),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('gender', sa.Enum('MALE', 'FEMALE', name='clientgenderenum'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_clients_age'), 'clients', ['age'], unique=False)
+    op.create_index(op.f('ix_clients_gender'), 'clients', ['gender'], unique=False)
+    op.create_index(op.f('ix_clients_location'), 'clients', ['location'], unique=False)
+    op.create_index(op.f('ix_clients_login'), 'clients', ['login'], unique=False)
+    op.create_table('system_time',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('current_date', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('bot_users',
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('date', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('advertiser_id', sa.UUID(), nullable=True),
+    sa.Column('advertiser_name', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['advertiser_id'], ['advertisers.advertiser_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('campaigns',
+    sa.Column('campaign_id', sa.UUID(), nullable=False),
+    sa.Column('advertiser_id', sa.UUID(), nullable=False),
+    sa.Column('impressions_limit', sa.Integer(), nullable=False),
+    sa.Column('clicks_limit', sa.Integer(), nullable=False),
+    sa.Column('cost_per_impression', sa.Float(), nullable=False),
+    sa.Column('cost_per_click', sa.Float(), nullable=False),
+    sa.Column('ad_title', sa.String(), nullable=False),
+    sa.Column('ad_photo_url', sa.String(), nullable=True),
+    sa.Column('ad_photo_variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('first_event_day', sa.Integer(), nullable=True),
+    sa.Column('ad_text', sa.Text(), nullable=False),
+    sa.Column('start_date', sa.Integer(), nullable=False),
+    sa.Column('end_date', sa.Integer(), nullable=False),
+    sa.Column('target_gender', sa.Enum('MALE', 'FEMALE', 'ALL', name='targetinggenderenum'), nullable=True),
+    sa.Column('target_age_from', sa.Integer(), nullable=True),
+    sa.Column('target_age_to', sa.Integer(), nullable=True),
+    sa.Column('target_location', sa.String(), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.Column('create_date', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['advertiser_id'], ['advertisers.advertiser_id'], ),
+    sa.PrimaryKeyConstraint('campaign_id')
+    )
+    op.create_index(op.f('ix_campaigns_clicks_limit'), 'campaigns', ['clicks_limit'], unique=False)
+    op.create_index(op.f('ix_campaigns_cost_per_click'), 'campaigns', ['cost_per_click'], unique=False)
+    op.create_index(op.f('ix_campaigns_cost_per_impression'), 'campaigns', ['cost_per_impression'], unique=False)
+    op.create_index(op.f('ix_campaigns_create_date'), 'campaigns', ['create_date'], unique=False)
+    op.create_index(op.f('ix_campaigns_end_date'), 'campaigns', ['end_date'], unique=False)
+    op.create_index(op.f('ix_campaigns_impressions_limit'), 'campaigns', ['impressions_limit'], unique=False)
+    op.create_index(op.f('ix_campaigns_is_deleted'), 'campaigns', ['is_deleted'], unique=False)
+    op.create_index(op.f('ix_campaigns_start_date'), 'campaigns', ['start_date'], unique=False)
+    op.create_index(op.f('ix_campaigns_target_age_from'), 'campaigns', ['target_age_from'], unique=False)
+    op.create_index(op.f('ix_campaigns_target_age_to'), 'campaigns', ['target_age_to'], unique=False)
+    op.create_index(op.f('ix_campaigns_target_gender'), 'campaigns', ['target_gender'], unique=False)
+    op.create_index(op.f('ix_campaigns_target_location'), 'campaigns', ['target_location'], unique=False)
+    op.create_table('ml_scores',
+    sa.Column('client_id', sa.UUID(), nullable=False),
+    sa.Column('advertiser_id', sa.UUID(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['advertiser_id'], ['advertisers.advertiser_id'], ),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('client_id', 'advertiser_id')
+    )
+    op.create_index(op.f('ix_ml_scores_advertiser_id'), 'ml_scores', ['advertiser_id'], unique=False)
+    op.create_index(op.f('ix_ml_scores_client_id'), 'ml_scores', ['client_id'], unique=False)
+    op.create_index(op.f('ix_ml_scores_score'), 'ml_scores', ['score'], unique=False)
+    op.create_table('ad_event_rollups',
+    sa.Column('campaign_id', sa.UUID(), nullable=False),
+    sa.Column('event_day', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.Enum('IMPRESSION', 'CLICK', name='adeventtypeenum'), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.campaign_id'], ),
+    sa.PrimaryKeyConstraint('campaign_id', 'event_day', 'event_type')
+    )
+    op.create_table('ad_events',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('event_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('campaign_id', sa.UUID(), nullable=False),
+    sa.Column('client_id', sa.UUID(), nullable=False),
+    sa.Column('event_day', sa.Integer(), nullable=False),
+    sa.Column('event_type', postgresql.ENUM(name='adeventtypeenum', create_type=False), nullable=False),
+    sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.campaign_id'], ),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('id', 'event_day'),
+    postgresql_partition_by='RANGE (event_day)'
+    )
+    op.create_index(op.f('ix_ad_events_client_id'), 'ad_events', ['client_id'], unique=False)
+    op.create_index('uq_ad_events_campaign_type_client_day', 'ad_events', ['campaign_id', 'event_type', 'client_id', 'event_day'], unique=True)
+    # Партиции по дням создаёт ensure_partitions при старте API
+    op.execute("CREATE TABLE ad_events_default PARTITION OF ad_events DEFAULT")
+
+
+def downgrade() -> None:
+    op.drop_index('uq_ad_events_campaign_type_client_day', table_name='ad_events')
+    op.drop_index(op.f('ix_ad_events_client_id'), table_name='ad_events')
+    # Вместе с партициями
+    op.drop_table('ad_events')
+    op.drop_table('ad_event_rollups')
+    op.drop_index(op.f('ix_ml_scores_score'), table_name='ml_scores')
+    op.drop_index(op.f('ix_ml_scores_client_id'), table_name='ml_scores')
+    op.drop_index(op.f('ix_ml_scores_advertiser_id'), table_name='ml_scores')
+    op.drop_table('ml_scores')
+    op.drop_index(op.f('ix_campaigns_target_location'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_target_gender'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_target_age_to'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_target_age_from'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_start_date'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_is_deleted'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_impressions_limit'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_end_date'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_create_date'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_cost_per_impression'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_cost_per_click'), table_name='campaigns')
+    op.drop_index(op.f('ix_campaigns_clicks_limit'), table_name='campaigns')
+    op.drop_table('campaigns')
+    op.drop_table('bot_users')
+    op.drop_table('system_time')
+    op.drop_index(op.f('ix_clients_login'), table_name='clients')
+    op.drop_index(op.f('ix_clients_location'), table_name='clients')
+    op.drop_index(op.f('ix_clients_gender'), table_name='clients')
+    op.drop_index(op.f('ix_clients_age'), table_name='clients')
+    op.drop_table('clients')
+    op.drop_index('uq_bot_notifications_pending', table_name='bot_notifications', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_index('ix_bot_notifications_due', table_name='bot_notifications', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_table('bot_notifications')
+    op.drop_index(op.f('ix_bot_fsm_states_expires_at'), table_name='bot_fsm_states')
+    op.drop_table('bot_fsm_states')
+    op.drop_index(op.f('ix_advertisers_name'), table_name='advertisers')
+    op.drop_table('advertisers')
+    for enum in ('adeventtypeenum', 'targetinggenderenum', 'clientgenderenum'):
+        op.execute(f"DROP TYPE {enum}")
@@ -0,0 +1,28 @@
+"""campaigns advertiser listing index
+
+Список кампаний рекламодателя читал всю campaigns: индекса по advertiser_id
+не было. Строится CONCURRENTLY — запись в campaigns не блокируется.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from api.database.migrations import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index_concurrently('ix_campaigns_advertiser_listing', 'campaigns', ['advertiser_id', 'create_date'],
+                              where='NOT is_deleted')
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_campaigns_advertiser_listing', 'campaigns')
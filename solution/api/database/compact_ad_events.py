@@ -0,0 +1,239 @@
+"""
+Перевод ad_events на компактную схему без остановки сервиса.
+
+    python -m api.database.compact_ad_events run
+
+Было: uuid-ключ и отдельный индекс почти на каждой колонке. Стало: колонки
+модели AdEvent, bigint identity, один составной уникальный индекс по
+(campaign_id, event_type, client_id) INCLUDE (event_day) и индекс по client_id.
+Следующий шаг — python -m api.database.partitions convert: таблица без
+копирования становится начальной партицией.
+
+Шаги идемпотентны, их можно запускать по одному и повторять после обрыва:
+
+    prepare      создать ad_events_compact и триггер, который зеркалирует в неё
+                 новые вставки и удаления из ad_events
+    backfill     перенести старые строки пачками по (event_timestamp, id);
+                 позиция хранится в базе, повторный запуск продолжит с неё
+    swap         под короткой блокировкой переименовать таблицы; делается
+                 вместе с выкладкой кода с новой моделью — старый код пишет uuid в id
+    drop-legacy  удалить ad_events_legacy, когда откат больше не нужен
+
+Повторы пары кампания–клиент одного типа (если они успели накопиться) при
+переносе отбрасываются — остаётся самое раннее событие.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import asyncpg
+
+from api.database.engine import POSTGRES_DSN
+
+logger = logging.getLogger(__name__)
+
+# Тот же порядок, что в модели AdEvent: колонки выровнены без дыр
+COLUMNS = ("event_timestamp", "campaign_id", "client_id", "event_day", "event_type")
+
+PREPARE_SQL = f"""
+CREATE TABLE IF NOT EXISTS ad_events_compact (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    event_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    campaign_id UUID NOT NULL,
+    client_id UUID NOT NULL,
+    event_day INTEGER NOT NULL,
+    event_type adeventtypeenum NOT NULL,
+    CONSTRAINT ad_events_compact_pkey PRIMARY KEY (id),
+    CONSTRAINT ad_events_campaign_id_fkey FOREIGN KEY (campaign_id) REFERENCES campaigns (campaign_id),
+    CONSTRAINT ad_events_client_id_fkey FOREIGN KEY (client_id) REFERENCES clients (id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ad_events_compact_campaign_type_client
+    ON ad_events_compact (campaign_id, event_type, client_id) INCLUDE (event_day);
+CREATE INDEX IF NOT EXISTS ix_ad_events_compact_client_id ON ad_events_compact (client_id);
+
+CREATE TABLE IF NOT EXISTS ad_events_compact_progress (
+    last_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT '-infinity',
+    last_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+    copied BIGINT NOT NULL DEFAULT 0,
+    skipped BIGINT NOT NULL DEFAULT 0,
+    done BOOLEAN NOT NULL DEFAULT false
+);
+INSERT INTO ad_events_compact_progress SELECT WHERE NOT EXISTS (SELECT 1 FROM ad_events_compact_progress);
+
+CREATE OR REPLACE FUNCTION ad_events_compact_mirror() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO ad_events_compact ({", ".join(COLUMNS)})
+        VALUES ({", ".join(f"NEW.{column}" for column in COLUMNS)})
+        ON CONFLICT DO NOTHING;
+        RETURN NEW;
+    END IF;
+    DELETE FROM ad_events_compact
+    WHERE campaign_id = OLD.campaign_id AND event_type = OLD.event_type AND client_id = OLD.client_id;
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS ad_events_compact_mirror ON ad_events;
+CREATE TRIGGER ad_events_compact_mirror AFTER INSERT OR DELETE ON ad_events
+    FOR EACH ROW EXECUTE FUNCTION ad_events_compact_mirror();
+"""
+
+# Одна пачка: следующие batch_size строк по (event_timestamp, id) и их копия в новую таблицу
+BACKFILL_SQL = f"""
+WITH batch AS (
+    SELECT id, {", ".join(COLUMNS)} FROM ad_events
+    WHERE (event_timestamp, id) > ($1, $2)
+    ORDER BY event_timestamp, id
+    LIMIT $3
+), inserted AS (
+    INSERT INTO ad_events_compact ({", ".join(COLUMNS)})
+    SELECT {", ".join(COLUMNS)} FROM batch ORDER BY event_timestamp, id
+    ON CONFLICT DO NOTHING
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM batch) AS read,
+    (SELECT count(*) FROM inserted) AS copied,
+    last.event_timestamp, last.id
+FROM (SELECT 1) AS one
+LEFT JOIN (SELECT event_timestamp, id FROM batch ORDER BY event_timestamp DESC, id DESC LIMIT 1) AS last ON true
+"""
+
+SWAP_SQL = """
+DROP TRIGGER ad_events_compact_mirror ON ad_events;
+DROP FUNCTION ad_events_compact_mirror();
+DROP TABLE ad_events_compact_progress;
+
+ALTER TABLE ad_events RENAME TO ad_events_legacy;
+ALTER INDEX ad_events_pkey RENAME TO ad_events_legacy_pkey;
+ALTER INDEX IF EXISTS ix_ad_events_campaign_id RENAME TO ix_ad_events_legacy_campaign_id;
+ALTER INDEX IF EXISTS ix_ad_events_client_id RENAME TO ix_ad_events_legacy_client_id;
+ALTER INDEX IF EXISTS ix_ad_events_event_type RENAME TO ix_ad_events_legacy_event_type;
+ALTER INDEX IF EXISTS ix_ad_events_event_timestamp RENAME TO ix_ad_events_legacy_event_timestamp;
+ALTER INDEX IF EXISTS ix_ad_events_event_day RENAME TO ix_ad_events_legacy_event_day;
+
+ALTER TABLE ad_events_compact RENAME TO ad_events;
+ALTER INDEX ad_events_compact_pkey RENAME TO ad_events_pkey;
+ALTER INDEX uq_ad_events_compact_campaign_type_client RENAME TO uq_ad_events_campaign_type_client;
+ALTER INDEX ix_ad_events_compact_client_id RENAME TO ix_ad_events_client_id;
+ALTER SEQUENCE ad_events_compact_id_seq RENAME TO ad_events_id_seq;
+"""
+
+
+async def layout(conn: asyncpg.Connection) -> str:
+    """legacy — старая схема, backfilling — перенос начат, compact — перенос завершён."""
+    id_type = await conn.fetchval("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'ad_events' AND column_name = 'id'
+    """)
+    if id_type == "bigint":
+        return "compact"
+    if await conn.fetchval("SELECT to_regclass('ad_events_compact') IS NOT NULL"):
+        return "backfilling"
+    return "legacy"
+
+
+async def prepare(conn: asyncpg.Connection) -> None:
+    if await layout(conn) == "compact":
+        logger.info("ad_events already compact")
+        return
+    async with conn.transaction():
+        await conn.execute(PREPARE_SQL)
+    logger.info("ad_events_compact ready, new events are mirrored")
+
+
+async def backfill(conn: asyncpg.Connection, batch_size: int = 10_000, pause: float = 0.05,
+                   max_batches: Optional[int] = None) -> None:
+    """Переносит строки пачками; pause между пачками оставляет базе время на рабочую нагрузку."""
+    if await layout(conn) != "backfilling":
+        raise RuntimeError("run prepare first")
+    started, batches = time.perf_counter(), 0
+    while max_batches is None or batches < max_batches:
+        async with conn.transaction():
+            progress = await conn.fetchrow("SELECT * FROM ad_events_compact_progress FOR UPDATE")
+            if progress["done"]:
+                break
+            read, copied, last_timestamp, last_id = await conn.fetchrow(
+                BACKFILL_SQL, progress["last_timestamp"], progress["last_id"], batch_size,
+            )
+            if read:
+                await conn.execute("""
+                    UPDATE ad_events_compact_progress
+                    SET last_timestamp = $1, last_id = $2, copied = copied + $3, skipped = skipped + $4
+                """, last_timestamp, last_id, copied, read - copied)
+            else:
+                # Всё, что появится дальше, перенесёт триггер
+                await conn.execute("UPDATE ad_events_compact_progress SET done = true")
+        batches += 1
+        if batches % 100 == 0:
+            logger.info("backfill: %d batches, up to %s", batches, last_timestamp)
+        if pause:
+            await asyncio.sleep(pause)
+
+    progress = await conn.fetchrow("SELECT * FROM ad_events_compact_progress")
+    logger.info("backfill %s in %.1fs: %d copied, %d skipped (duplicates or already mirrored)",
+                "done" if progress["done"] else "paused", time.perf_counter() - started,
+                progress["copied"], progress["skipped"])
+
+
+async def swap(conn: asyncpg.Connection, lock_timeout: str = "5s") -> None:
+    state = await layout(conn)
+    if state == "compact":
+        logger.info("ad_events already compact")
+        return
+    if state != "backfilling" or not await conn.fetchval("SELECT done FROM ad_events_compact_progress"):
+        raise RuntimeError("backfill is not finished")
+    async with conn.transaction():
+        # Не ждать дольше lock_timeout за длинными запросами: лучше повторить swap, чем остановить запись
+        await conn.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+        await conn.execute("LOCK TABLE ad_events, ad_events_compact IN ACCESS EXCLUSIVE MODE")
+        await conn.execute(SWAP_SQL)
+    await conn.execute("ANALYZE ad_events")
+    logger.info("ad_events swapped, the old table is ad_events_legacy")
+
+
+async def drop_legacy(conn: asyncpg.Connection) -> None:
+    if await layout(conn) != "compact":
+        raise RuntimeError("swap is not done")
+    await conn.execute("DROP TABLE IF EXISTS ad_events_legacy")
+    logger.info("ad_events_legacy dropped")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Онлайн-перевод ad_events на компактную схему")
+    parser.add_argument("step", choices=["status", "prepare", "backfill", "swap", "drop-legacy", "run"],
+                        help="run = prepare + backfill + swap")
+    parser.add_argument("--dsn", default=POSTGRES_DSN, help="Postgres DSN (по умолчанию из настроек приложения)")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--pause", type=float, default=0.05, help="Пауза между пачками, секунд")
+    parser.add_argument("--lock-timeout", default="5s", help="Сколько ждать блокировку при swap")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        if args.step == "status":
+            print(await layout(conn))
+        if args.step in ("prepare", "run"):
+            await prepare(conn)
+        if args.step in ("backfill", "run") and await layout(conn) == "backfilling":
+            await backfill(conn, args.batch_size, args.pause)
+        if args.step in ("swap", "run"):
+            await swap(conn, args.lock_timeout)
+        if args.step == "drop-legacy":
+            await drop_legacy(conn)
+    finally:
+        await conn.close()
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
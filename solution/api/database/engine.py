@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.utils.metrics import InstrumentedQueuePool, instrument_pool
+from api.utils.sql_profiler import instrument_engine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Та же база для asyncpg напрямую: LISTEN, COPY и утилиты командной строки
+POSTGRES_DSN = (
+    f"postgresql://{settings.POSTGRES_USERNAME}:{settings.POSTGRES_PASSWORD}"
+    f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DATABASE}"
+)
+
+
+def sqlalchemy_url(dsn: str) -> str:
+    """URL для create_async_engine из DSN asyncpg (postgresql://...)."""
+    return make_url(dsn).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+DATABASE_URL = sqlalchemy_url(POSTGRES_DSN)
+
+
+class PoolOvercommitted(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class PoolStatus:
+    size: int
+    max_overflow: int
+    in_use: int
+    idle: int
+    overflow: int
+
+    @property
+    def capacity(self) -> int:
+        return self.size + self.max_overflow
+
+    @property
+    def saturation(self) -> float:
+        return self.in_use / self.capacity
+
+
+def connections_needed(pool_size: int, max_overflow: int, workers: int, reserved: int, listeners: int = 1) -> int:
+    """Потолок соединений всех воркеров: пул с переполнением и соединения LISTEN на процесс, плюс запас."""
+    if pool_size < 1 or max_overflow < 0 or workers < 1 or reserved < 0:
+        raise ValueError(
+            f"invalid pool settings: pool_size={pool_size}, max_overflow={max_overflow}, "
+            f"workers={workers}, reserved={reserved}"
+        )
+    return workers * (pool_size + max_overflow + listeners) + reserved
+
+
+class Database:
+    """
+    Один движок на процесс. Его создаёт start() из lifespan приложения (или
+    main() бота), а закрывает close(). Размеры пула и таймауты — из настроек;
+    start() сверяет потолок соединений всех воркеров с max_connections сервера
+    и заранее открывает warmup соединений, чтобы первые запросы не ждали.
+    """
+
+    def __init__(self, url: str, pool_size: int, max_overflow: int, pool_timeout: float,
+                 pool_recycle: int, connect_timeout: float, workers: int = 1, reserved: int = 0,
+                 listeners: int = 1, warmup: Optional[int] = None, instrument: bool = False,
+                 name: str = "primary"):
+        self.url = url
+        self.name = name
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.connect_timeout = connect_timeout
+        self.workers = workers
+        self.reserved = reserved
+        self.listeners = listeners
+        self.warmup = pool_size if warmup is None else min(warmup, pool_size)
+        self.instrument = instrument
+        self.engine: Optional[AsyncEngine] = None
+        self.sessionmaker: Optional[sessionmaker] = None
+
+    async def start(self) -> None:
+        if self.engine is not None:
+            return
+        needed = connections_needed(self.pool_size, self.max_overflow, self.workers, self.reserved, self.listeners)
+        options = dict(
+            future=True,
+            pool_pre_ping=True,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            connect_args={"timeout": self.connect_timeout},
+        )
+        if self.instrument:
+            options["poolclass"] = InstrumentedQueuePool
+        engine = create_async_engine(self.url, **options)
+        if self.instrument:
+            instrument_pool(engine, self.name)
+            instrument_engine(engine)
+        try:
+            await self._check_capacity(engine, needed)
+            await self._warm(engine)
+        except BaseException:
+            await engine.dispose()
+            raise
+        self.engine = engine
+        self.sessionmaker = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def close(self) -> None:
+        if self.engine is not None:
+            await self.engine.dispose()
+        self.engine = None
+        self.sessionmaker = None
+
+    async def _check_capacity(self, engine: AsyncEngine, needed: int) -> None:
+        async with engine.connect() as conn:
+            max_connections, reserved = (await conn.execute(text(
+                "SELECT current_setting('max_connections')::int, current_setting('superuser_reserved_connections')::int"
+            ))).one()
+        available = max_connections - reserved
+        if needed > available:
+            raise PoolOvercommitted(
+                f"{self.workers} workers x (pool {self.pool_size} + overflow {self.max_overflow} + {self.listeners} listen) "
+                f"+ {self.reserved} reserved = {needed} connections, postgres allows {available}"
+            )
+        logger.info("%s db pool: up to %d of %d postgres connections", self.name, needed, available)
+
+    async def _warm(self, engine: AsyncEngine) -> None:
+        # Соединения открываются одновременно и возвращаются в пул простаивающими
+        connections = [engine.connect() for _ in range(self.warmup)]
+        try:
+            await asyncio.gather(*(conn.start() for conn in connections))
+        finally:
+            await asyncio.gather(*(conn.close() for conn in connections))
+
+    def status(self) -> Optional[PoolStatus]:
+        if self.engine is None:
+            return None
+        pool = self.engine.sync_engine.pool
+        return PoolStatus(
+            size=pool.size(), max_overflow=self.max_overflow,
+            in_use=pool.checkedout(), idle=pool.checkedin(), overflow=max(pool.overflow(), 0),
+        )
+
+    async def ping(self, timeout: float) -> None:
+        async def select_one():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.wait_for(select_one(), timeout)
+
+
+database = Database(
+    DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_timeout=settings.DB_CONNECT_TIMEOUT,
+    workers=settings.API_WORKERS,
+    reserved=settings.DB_RESERVED_CONNECTIONS,
+    warmup=settings.DB_POOL_WARMUP,
+    instrument=True,
+)
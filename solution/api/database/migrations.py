@@ -0,0 +1,183 @@
+"""
+Миграции схемы на Alembic (ревизии — alembic/versions).
+
+    python -m api.database.migrations upgrade    # до головной ревизии; перед выкладкой кода
+    python -m api.database.migrations current    # ревизия базы и ревизия кода
+    python -m api.database.migrations check      # модели и миграции не расходятся
+
+Старт API схему не меняет: check_revision только сверяет ревизию базы с
+головной ревизией кода и не даёт стартовать на непромигрированной базе.
+
+База, созданная раньше через create_all, ревизии не знает. upgrade сначала
+помечает её baseline — если ad_events уже переведена на партиции
+(compact_ad_events, затем partitions convert) — и доводит до головы.
+
+Индексы на рабочих таблицах ревизии строят через create_index_concurrently:
+без блокировки записи, для ad_events — по партициям.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from typing import List, Optional, Sequence
+
+from alembic import command, op
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from api.database.engine import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ALEMBIC_INI = os.path.join(ROOT, "alembic.ini")
+BASELINE = "0001"
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    config = Config(ALEMBIC_INI)
+    # Пути из alembic.ini — относительно его каталога, а не текущего
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+async def current_revision(conn: AsyncConnection) -> Optional[str]:
+    return await conn.run_sync(lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision())
+
+
+async def check_revision(conn: AsyncConnection) -> str:
+    """Для старта API: одна выборка из alembic_version вместо create_all."""
+    current, head = await current_revision(conn), head_revision()
+    if current != head:
+        raise SchemaOutdated(
+            f"database schema is at {current or 'no revision'}, code expects {head}: "
+            "run python -m api.database.migrations upgrade"
+        )
+    return current
+
+
+async def _relkind(conn: AsyncConnection, table: str) -> Optional[str]:
+    return (await conn.execute(text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"),
+                               {"table": table})).scalar()
+
+
+async def adopt(conn: AsyncConnection) -> bool:
+    """Помечает baseline базу, созданную до миграций через create_all. True — если пометил; коммит за вызывающим."""
+    if await current_revision(conn) is not None or await _relkind(conn, "campaigns") is None:
+        return False
+    if await _relkind(conn, "ad_events") != "p" or await _relkind(conn, "ad_event_rollups") is None:
+        raise SchemaOutdated(
+            "ad_events predates the baseline: run python -m api.database.compact_ad_events run, "
+            "then python -m api.database.partitions convert"
+        )
+    # Единственная колонка, которую create_all не мог добавить в уже существующую таблицу
+    await conn.execute(text("ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS ad_photo_variants JSONB"))
+    await conn.run_sync(lambda sync_conn: command.stamp(alembic_config(sync_conn), BASELINE))
+    logger.info("existing schema stamped as baseline %s", BASELINE)
+    return True
+
+
+async def upgrade(engine: AsyncEngine, revision: str = "head") -> None:
+    # Без внешней транзакции: каждая ревизия коммитится сама, а CONCURRENTLY выполняется вне транзакции
+    async with engine.connect() as conn:
+        await adopt(conn)
+        await conn.commit()
+        await conn.run_sync(lambda sync_conn: command.upgrade(alembic_config(sync_conn), revision))
+
+
+def _partitions(table: str) -> List[str]:
+    rows = op.get_bind().execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname
+    """), {"table": table})
+    return [name for name, in rows]
+
+
+def _drop_if_invalid(name: str) -> None:
+    # Оборванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс, и IF NOT EXISTS его бы пропустил
+    invalid = op.get_bind().execute(
+        text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY {name}")
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence[str], unique: bool = False,
+                              where: Optional[str] = None) -> None:
+    """
+    CREATE INDEX CONCURRENTLY из ревизии: запись в таблицу не блокируется.
+    Партиционированной таблице CONCURRENTLY недоступен, поэтому индекс
+    создаётся на родителе через ON ONLY, строится CONCURRENTLY на каждой
+    партиции и подключается к родителю — новые партиции получат его сами.
+    """
+    prefix = "UNIQUE " if unique else ""
+    definition = f"({', '.join(columns)})" + (f" WHERE {where}" if where else "")
+    partitions = _partitions(table)
+    with op.get_context().autocommit_block():
+        if not partitions:
+            _drop_if_invalid(name)
+            op.execute(f"CREATE {prefix}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+            return
+        op.execute(f"CREATE {prefix}INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}")
+        for partition in partitions:
+            child = f"{partition}_{name}"[:63]
+            _drop_if_invalid(child)
+            op.execute(f"CREATE {prefix}INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {definition}")
+            if op.get_bind().execute(text("SELECT NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = "
+                                          "CAST(:child AS regclass))"), {"child": child}).scalar():
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    with op.get_context().autocommit_block():
+        if _partitions(table):
+            # Индексы партиций удаляются вместе с родительским; DROP ... CONCURRENTLY для него недоступен
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        else:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Миграции схемы базы")
+    parser.add_argument("step", choices=["upgrade", "current", "check"])
+    parser.add_argument("revision", nargs="?", default="head", help="Ревизия для upgrade")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(DATABASE_URL)
+    try:
+        if args.step == "upgrade":
+            await upgrade(engine, args.revision)
+        elif args.step == "current":
+            async with engine.connect() as conn:
+                print(f"database: {await current_revision(conn)}, code: {head_revision()}")
+        elif args.step == "check":
+            async with engine.connect() as conn:
+                await check_revision(conn)
+                await conn.run_sync(lambda sync_conn: command.check(alembic_config(sync_conn)))
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
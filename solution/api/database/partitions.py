@@ -0,0 +1,383 @@
+"""
+Партиции ad_events по event_day и их жизненный цикл.
+
+    python -m api.database.partitions convert   # обычная ad_events -> партиционированная
+    python -m api.database.partitions ensure    # партиции на AD_EVENTS_PARTITIONS_AHEAD окон вперёд
+    python -m api.database.partitions retain    # архивировать старые партиции
+
+Окно партиции — AD_EVENTS_PARTITION_DAYS дней; DEFAULT-партиция ловит события,
+для которых партицию не успели создать, и ensure_partitions перекладывает их
+в новую партицию. ensure вызывают старт API и /time/advance.
+
+Ретенция архивирует партиции старше AD_EVENTS_RETENTION_DAYS, но только если
+все кампании с событиями в них закончились: подбору объявления и лимитам
+нужны события живых кампаний целиком. Поэтому кампанию, чьи события уже
+в архиве, нельзя продлить (PUT отвечает 409). В одной транзакции дневные итоги
+партиции пишутся в ad_event_rollups, сверяются с числом строк, и партиция
+отсоединяется — статистика видит либо события, либо итоги. Затем таблица
+выгружается в AD_EVENTS_ARCHIVE_DIR/<имя>.csv.gz и удаляется; если выгрузка
+оборвалась, следующий retain её повторит.
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
+
+from api.database import Base
+from api.database.engine import DATABASE_URL
+from api.database.models.models import AdEvent
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Executor = Union[AsyncConnection, AsyncSession]
+
+PREFIX = "ad_events_p"
+INITIAL = f"{PREFIX}_initial"
+# API может работать в нескольких процессах: ensure и отсоединение — по одному за раз,
+# а retain целиком выполняет только один процесс
+LOCK_KEY = 0x0AD0E7E5
+RETAIN_LOCK_KEY = LOCK_KEY + 1
+
+PARTITIONS_SQL = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'ad_events'::regclass
+"""
+# Отсоединённые, но ещё не выгруженные в архив партиции
+DETACHED_SQL = """
+SELECT relname FROM pg_class
+WHERE relkind = 'r' AND NOT relispartition AND relname LIKE 'ad\\_events\\_p%'
+  AND relnamespace = current_schema()::regnamespace
+ORDER BY relname
+"""
+BOUND_RE = re.compile(r"FOR VALUES FROM \((MINVALUE|-?\d+)\) TO \((MAXVALUE|-?\d+)\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    lower: Optional[int]  # None — MINVALUE
+    upper: Optional[int]  # None — MAXVALUE
+
+    def overlaps(self, lower: int, upper: int) -> bool:
+        return (self.lower is None or self.lower < upper) and (self.upper is None or lower < self.upper)
+
+
+def parse_bound(name: str, bound: str) -> Optional[Partition]:
+    """Partition из pg_get_expr(relpartbound); DEFAULT-партиция — None."""
+    match = BOUND_RE.fullmatch(bound)
+    if not match:
+        return None
+    lower, upper = (None if value.endswith("VALUE") else int(value) for value in match.groups())
+    return Partition(name, lower, upper)
+
+
+def partition_name(lower: int) -> str:
+    return f"{PREFIX}{lower}"
+
+
+def windows(current_day: int, since: Optional[int] = None,
+            days: Optional[int] = None, ahead: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Окна [lower, upper), выровненные по days: от окна с since (или текущего дня) до ahead окон вперёд."""
+    days = days or settings.AD_EVENTS_PARTITION_DAYS
+    ahead = settings.AD_EVENTS_PARTITIONS_AHEAD if ahead is None else ahead
+    first = min(current_day if since is None else since, current_day) // days
+    last = current_day // days + ahead
+    return [(k * days, (k + 1) * days) for k in range(first, last + 1)]
+
+
+async def list_partitions(conn: Executor) -> List[Partition]:
+    rows = (await conn.execute(text(PARTITIONS_SQL))).all()
+    partitions = [p for p in (parse_bound(name, bound) for name, bound in rows) if p is not None]
+    return sorted(partitions, key=lambda p: (p.lower is not None, p.lower or 0))
+
+
+async def _create_partition(conn: Executor, lower: int, upper: int) -> str:
+    name = partition_name(lower)
+    in_range = f"event_day >= {lower} AND event_day < {upper}"
+    # Новая партиция не создастся, пока подходящие ей строки лежат в DEFAULT
+    stray = (await conn.execute(text(f"SELECT count(*) FROM ad_events_default WHERE {in_range}"))).scalar()
+    if stray:
+        logger.warning("moving %d events for days [%d, %d) out of ad_events_default", stray, lower, upper)
+        await conn.execute(text(f"""
+            CREATE TEMP TABLE ad_events_stray AS
+            WITH moved AS (DELETE FROM ad_events_default WHERE {in_range} RETURNING *) SELECT * FROM moved
+        """))
+    await conn.execute(text(f"CREATE TABLE {name} PARTITION OF ad_events FOR VALUES FROM ({lower}) TO ({upper})"))
+    if stray:
+        await conn.execute(text("INSERT INTO ad_events SELECT * FROM ad_events_stray"))
+        await conn.execute(text("DROP TABLE ad_events_stray"))
+    return name
+
+
+async def ensure_partitions(conn: Executor, current_day: int, since: Optional[int] = None) -> List[str]:
+    """
+    Создаёт недостающие партиции в транзакции вызывающего. Окна, которые уже
+    чем-то покрыты (например, начальной партицией после convert), пропускаются.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+    if (await conn.execute(text("SELECT relkind::text FROM pg_class WHERE oid = 'ad_events'::regclass"))).scalar() != "p":
+        logger.warning("ad_events is not partitioned: run python -m api.database.partitions convert")
+        return []
+    existing = await list_partitions(conn)
+    created = []
+    for lower, upper in windows(current_day, since):
+        if not any(p.overlaps(lower, upper) for p in existing):
+            created.append(await _create_partition(conn, lower, upper))
+    if created:
+        logger.info("created ad_events partitions: %s", ", ".join(created))
+    return created
+
+
+async def current_day(conn: Executor) -> int:
+    day = (await conn.execute(text('SELECT "current_date" FROM system_time ORDER BY id DESC LIMIT 1'))).scalar()
+    return day or 0
+
+
+async def archivable(conn: Executor, day: int, retention_days: int) -> List[Partition]:
+    """Партиции старше срока хранения, в которых нет событий незакончившихся кампаний."""
+    horizon = day - retention_days
+    live_from = (await conn.execute(text("""
+        SELECT min(first_event_day) FROM campaigns WHERE NOT is_deleted AND end_date >= :day
+    """), {"day": day})).scalar()
+    if live_from is not None:
+        horizon = min(horizon, live_from)
+    return [p for p in await list_partitions(conn) if p.upper is not None and p.upper <= horizon]
+
+
+async def has_archived_events(conn: Executor, campaign_id) -> bool:
+    """
+    Были ли события кампании в уже отсоединённых партициях. Берёт общую блокировку
+    против отсоединения до конца транзакции: retain не заархивирует новую партицию,
+    пока вызывающий не закоммитит изменение кампании.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock_shared(:key)"), {"key": LOCK_KEY})
+    return (await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM ad_event_rollups WHERE campaign_id = :campaign_id)"),
+        {"campaign_id": campaign_id},
+    )).scalar()
+
+
+async def detach_with_rollup(conn: Executor, partition: Partition) -> int:
+    """Итоги по дням в ad_event_rollups, сверка и отсоединение — в транзакции вызывающего."""
+    name = partition.name
+    await conn.execute(text(f"""
+        INSERT INTO ad_event_rollups (campaign_id, event_day, event_type, events)
+        SELECT campaign_id, event_day, event_type, count(*) FROM {name}
+        GROUP BY campaign_id, event_day, event_type
+    """))
+    rows = (await conn.execute(text(f"SELECT count(*) FROM {name}"))).scalar()
+    in_range = " AND ".join(
+        condition for condition in (
+            None if partition.lower is None else f"event_day >= {partition.lower}",
+            f"event_day < {partition.upper}",
+        ) if condition
+    )
+    rolled = (await conn.execute(
+        text(f"SELECT coalesce(sum(events), 0) FROM ad_event_rollups WHERE {in_range}")
+    )).scalar()
+    if rolled != rows:
+        raise RuntimeError(f"{name}: rollups have {rolled} events, partition has {rows}")
+    await conn.execute(text(f"ALTER TABLE ad_events DETACH PARTITION {name}"))
+    return rows
+
+
+async def archive_detached(conn: AsyncConnection, name: str, archive_dir: str) -> Optional[str]:
+    """Выгружает отсоединённую партицию в gzip-CSV и удаляет таблицу; пустая удаляется без файла."""
+    rows = (await conn.execute(text(f"SELECT count(*) FROM {name}"))).scalar()
+    if not rows:
+        await conn.execute(text(f"DROP TABLE {name}"))
+        await conn.commit()
+        return None
+
+    await asyncio.to_thread(os.makedirs, archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = f"{path}.part"
+    raw = (await conn.get_raw_connection()).driver_connection
+
+    archive = await asyncio.to_thread(gzip.open, partial, "wb")
+    try:
+        async def write(chunk: bytes) -> None:
+            await asyncio.to_thread(archive.write, chunk)
+
+        status = await raw.copy_from_table(name, output=write, format="csv", header=True)
+    finally:
+        await asyncio.to_thread(archive.close)
+    copied = int(status.split()[-1])
+    if copied != rows:
+        raise RuntimeError(f"{name}: archived {copied} rows of {rows}")
+
+    def publish():
+        with open(partial, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+
+    await asyncio.to_thread(publish)
+    await conn.execute(text(f"DROP TABLE {name}"))
+    await conn.commit()
+    return path
+
+
+async def retain(engine: AsyncEngine, retention_days: Optional[int] = None,
+                 archive_dir: Optional[str] = None, lock_timeout: str = "5s") -> List[str]:
+    retention_days = settings.AD_EVENTS_RETENTION_DAYS if retention_days is None else retention_days
+    archive_dir = archive_dir or settings.AD_EVENTS_ARCHIVE_DIR
+    if retention_days is None:
+        return []
+
+    async with engine.connect() as guard:
+        if not (await guard.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RETAIN_LOCK_KEY})).scalar():
+            logger.info("retention is already running in another process")
+            return []
+        try:
+            return await _retain(engine, retention_days, archive_dir, lock_timeout)
+        finally:
+            await guard.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RETAIN_LOCK_KEY})
+
+
+async def _retain(engine: AsyncEngine, retention_days: int, archive_dir: str, lock_timeout: str) -> List[str]:
+    async with engine.begin() as conn:
+        candidates = await archivable(conn, await current_day(conn), retention_days)
+    for partition in candidates:
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            # DETACH берёт эксклюзивную блокировку ad_events: не стоять в очереди за длинными запросами
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+            # Пока ждали блокировку, кампанию могли продлить — её события снова нужны лимитам
+            if partition not in await archivable(conn, await current_day(conn), retention_days):
+                logger.info("%s is no longer archivable, skipped", partition.name)
+                continue
+            rows = await detach_with_rollup(conn, partition)
+        logger.info("detached %s (%d events rolled up)", partition.name, rows)
+
+    archived = []
+    async with engine.connect() as conn:
+        names = (await conn.execute(text(DETACHED_SQL))).scalars().all()
+        await conn.commit()
+        for name in names:
+            path = await archive_detached(conn, name, archive_dir)
+            if path:
+                archived.append(path)
+                logger.info("archived %s to %s", name, path)
+    return archived
+
+
+async def convert(engine: AsyncEngine, lock_timeout: str = "5s") -> None:
+    """
+    Переводит обычную ad_events (после compact_ad_events) в партиционированную
+    без копирования: таблица целиком становится начальной партицией до конца
+    текущего окна. Индексы под новую схему строятся CONCURRENTLY, границу
+    проверяет заранее провалидированный CHECK — под эксклюзивной блокировкой
+    остаются только переименования и ATTACH. Повторный запуск после выкладки
+    кода добирает first_event_day для кампаний, начавших показы в процессе.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS first_event_day INTEGER"))
+        await conn.run_sync(Base.metadata.create_all, tables=[Base.metadata.tables["ad_event_rollups"]])
+        await conn.execute(text("""
+            UPDATE campaigns c SET first_event_day = e.first_day
+            FROM (SELECT campaign_id, min(event_day) AS first_day FROM ad_events GROUP BY campaign_id) e
+            WHERE c.campaign_id = e.campaign_id AND c.first_event_day IS NULL
+        """))
+
+        kind = (await conn.execute(text("SELECT relkind::text FROM pg_class WHERE oid = 'ad_events'::regclass"))).scalar()
+        if kind == "p":
+            logger.info("ad_events already partitioned")
+            return
+        id_type = (await conn.execute(text("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'ad_events' AND column_name = 'id'
+        """))).scalar()
+        if id_type != "bigint":
+            raise RuntimeError("ad_events is not compact yet: run python -m api.database.compact_ad_events first")
+
+        day = await current_day(conn)
+        upper = (day // settings.AD_EVENTS_PARTITION_DAYS + 1) * settings.AD_EVENTS_PARTITION_DAYS
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ad_events_initial_id_day ON ad_events (id, event_day)"
+        ))
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ad_events_initial_campaign_type_client_day "
+            "ON ad_events (campaign_id, event_type, client_id, event_day)"
+        ))
+        await conn.execute(text("ALTER TABLE ad_events DROP CONSTRAINT IF EXISTS ad_events_initial_bound"))
+        await conn.execute(text(
+            f"ALTER TABLE ad_events ADD CONSTRAINT ad_events_initial_bound CHECK (event_day < {upper}) NOT VALID"
+        ))
+        await conn.execute(text("ALTER TABLE ad_events VALIDATE CONSTRAINT ad_events_initial_bound"))
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+        await conn.execute(text("LOCK TABLE ad_events IN ACCESS EXCLUSIVE MODE"))
+        next_id = (await conn.execute(text("SELECT coalesce(max(id), 0) + 1 FROM ad_events"))).scalar()
+        for statement in (
+            # Ограничения и индексы — в том виде, который ATTACH сопоставит с индексами новой таблицы
+            "ALTER TABLE ad_events DROP CONSTRAINT ad_events_pkey, "
+            "ADD CONSTRAINT ad_events_pkey PRIMARY KEY USING INDEX ad_events_initial_id_day",
+            "DROP INDEX uq_ad_events_campaign_type_client",
+            "ALTER TABLE ad_events ALTER COLUMN id DROP IDENTITY",
+            f"ALTER TABLE ad_events RENAME TO {INITIAL}",
+            f"ALTER TABLE {INITIAL} RENAME CONSTRAINT ad_events_pkey TO {INITIAL}_pkey",
+            f"ALTER INDEX ad_events_initial_campaign_type_client_day RENAME TO {INITIAL}_campaign_type_client_day",
+            f"ALTER INDEX ix_ad_events_client_id RENAME TO {INITIAL}_client_id",
+            # Иначе create_all назовёт внешние ключи новой таблицы с суффиксом
+            f"ALTER TABLE {INITIAL} RENAME CONSTRAINT ad_events_campaign_id_fkey TO {INITIAL}_campaign_id_fkey",
+            f"ALTER TABLE {INITIAL} RENAME CONSTRAINT ad_events_client_id_fkey TO {INITIAL}_client_id_fkey",
+        ):
+            await conn.execute(text(statement))
+        # Та же DDL, что у create_all, вместе с DEFAULT-партицией
+        await conn.run_sync(AdEvent.__table__.create)
+        await conn.execute(text(f"ALTER TABLE ad_events ALTER COLUMN id RESTART WITH {next_id}"))
+        await conn.execute(text(
+            f"ALTER TABLE ad_events ATTACH PARTITION {INITIAL} FOR VALUES FROM (MINVALUE) TO ({upper})"
+        ))
+        await conn.execute(text(f"ALTER TABLE {INITIAL} DROP CONSTRAINT ad_events_initial_bound"))
+        await ensure_partitions(conn, day)
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE ad_events"))
+        await conn.commit()
+    logger.info("ad_events partitioned, existing events are in %s", INITIAL)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Партиции ad_events: перевод, создание и архивация")
+    parser.add_argument("step", choices=["convert", "ensure", "retain"])
+    parser.add_argument("--retention-days", type=int, default=settings.AD_EVENTS_RETENTION_DAYS)
+    parser.add_argument("--archive-dir", default=settings.AD_EVENTS_ARCHIVE_DIR)
+    parser.add_argument("--lock-timeout", default="5s", help="Сколько ждать блокировку ad_events")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(DATABASE_URL)
+    try:
+        if args.step == "convert":
+            await convert(engine, args.lock_timeout)
+        elif args.step == "ensure":
+            async with engine.begin() as conn:
+                await ensure_partitions(conn, await current_day(conn))
+        elif args.step == "retain":
+            if args.retention_days is None:
+                raise SystemExit("set --retention-days or AD_EVENTS_RETENTION_DAYS")
+            await retain(engine, args.retention_days, args.archive_dir, args.lock_timeout)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(_main(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Чтение с реплики для read-only маршрутов.
+
+ReplicaRouter отдаёт сессию реплики, пока та отстаёт от primary не больше
+REPLICA_MAX_STALENESS_SECONDS, и сессию primary — если реплика не настроена,
+ещё не проверена, отстала или недоступна.
+
+Отставание меряется по LSN: раз в REPLICA_CHECK_INTERVAL запоминается
+pg_current_wal_flush_lsn() primary, и как только pg_last_wal_replay_lsn() реплики
+его догнал, реплика видит всё, что было закоммичено к моменту замера. Так
+простаивающий primary не выглядит отставанием, как с
+now() - pg_last_xact_replay_timestamp().
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.engine import Database, database
+from api.utils.metrics import DB_READ_SESSIONS_TOTAL, DB_REPLICA_STALENESS_SECONDS
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_flush_lsn() - '0/0'::pg_lsn"
+# NULL, если сервер не в режиме реплики
+REPLAY_LSN_SQL = "SELECT pg_last_wal_replay_lsn() - '0/0'::pg_lsn"
+
+
+class LagTracker:
+    """Отставание реплики: с какого замера LSN primary она уже всё воспроизвела."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.samples: Deque[Tuple[float, int]] = deque(maxlen=max_samples)
+        self.caught_up_at: Optional[float] = None
+
+    def primary(self, at: float, lsn: int) -> None:
+        if self.samples and self.samples[-1][1] == lsn:
+            # Запись не шла: реплике, догнавшей этот LSN, достаточно самого свежего замера
+            self.samples[-1] = (at, lsn)
+        else:
+            self.samples.append((at, lsn))
+
+    def replica(self, at: float, replay_lsn: int) -> float:
+        while self.samples and self.samples[0][1] <= replay_lsn:
+            self.caught_up_at = self.samples.popleft()[0]
+        return math.inf if self.caught_up_at is None else at - self.caught_up_at
+
+
+class ReplicaRouter:
+    def __init__(self, primary: Database, replica: Optional[Database], max_staleness: float,
+                 check_interval: float, clock: Callable[[], float] = time.monotonic):
+        self.primary = primary
+        self.replica = replica
+        self.max_staleness = max_staleness
+        self.check_interval = check_interval
+        self.clock = clock
+        self.lag = LagTracker()
+        self.staleness = math.inf
+        self._task: Optional[asyncio.Task] = None
+
+    def use_replica(self) -> bool:
+        return self.replica is not None and self.replica.engine is not None and self.staleness <= self.max_staleness
+
+    async def start(self) -> None:
+        if self.replica is None or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.replica is not None:
+            await self.replica.close()
+        self._mark_down()
+
+    async def check(self) -> float:
+        async with self.primary.engine.connect() as conn:
+            self.lag.primary(self.clock(), int((await conn.execute(text(PRIMARY_LSN_SQL))).scalar()))
+        async with self.replica.engine.connect() as conn:
+            replay_lsn = (await conn.execute(text(REPLAY_LSN_SQL))).scalar()
+        if replay_lsn is None:
+            raise RuntimeError("replica server is not in recovery")
+        self.staleness = self.lag.replica(self.clock(), int(replay_lsn))
+        DB_REPLICA_STALENESS_SECONDS.set(self.staleness)
+        return self.staleness
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # Реплика могла быть недоступна при старте API — пробуем поднять пул на каждой проверке
+                if self.replica.engine is None:
+                    await self.replica.start()
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not math.isinf(self.staleness):
+                    logger.warning("replica check failed, reading from primary: %s", e)
+                self._mark_down()
+            await asyncio.sleep(self.check_interval)
+
+    def _mark_down(self) -> None:
+        self.staleness = math.inf
+        DB_REPLICA_STALENESS_SECONDS.set(math.inf)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия реплики, если она свежая и отвечает, иначе primary."""
+        session, target = None, "primary"
+        if self.use_replica():
+            session = self.replica.sessionmaker()
+            try:
+                # Соединение берётся сразу: упавшая реплика заменяется primary до первого запроса хендлера
+                await session.connection()
+                target = "replica"
+            except (OSError, SQLAlchemyError) as e:
+                logger.warning("replica unavailable, reading from primary: %s", e)
+                await session.close()
+                self._mark_down()
+                session = None
+        if session is None:
+            session = self.primary.sessionmaker()
+        DB_READ_SESSIONS_TOTAL.labels(target=target).inc()
+        async with session:
+            yield session
+
+
+REPLICA_URL = (
+    f"postgresql+asyncpg://{settings.POSTGRES_USERNAME}:{settings.POSTGRES_PASSWORD}"
+    f"@{settings.POSTGRES_REPLICA_HOST}:{settings.POSTGRES_REPLICA_PORT or settings.POSTGRES_PORT}"
+    f"/{settings.POSTGRES_DATABASE}"
+)
+
+replica_router = ReplicaRouter(
+    database,
+    Database(
+        REPLICA_URL,
+        pool_size=settings.DB_REPLICA_POOL_SIZE,
+        max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_timeout=settings.DB_CONNECT_TIMEOUT,
+        workers=settings.API_WORKERS,
+        reserved=settings.DB_RESERVED_CONNECTIONS,
+        listeners=0,
+        warmup=settings.DB_POOL_WARMUP,
+        instrument=True,
+        name="replica",
+    ) if settings.POSTGRES_REPLICA_HOST else None,
+    max_staleness=settings.REPLICA_MAX_STALENESS_SECONDS,
+    check_interval=settings.REPLICA_CHECK_INTERVAL,
+)
@@ -1,21 +1,53 @@
-from typing import Annotated
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Annotated, AsyncContextManager, AsyncIterator, Callable
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.database import load_sessionmaker
-from app.core.config import settings
+from api.database.engine import database
+from api.database.replica import replica_router
+from api.utils.metrics import DB_SESSION_LIFETIME_SECONDS, db_route
 
-DATABASE_URL = (
-    f"postgresql+asyncpg://{settings.POSTGRES_USERNAME}:{settings.POSTGRES_PASSWORD}"
-    f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DATABASE}"
-)
+# Фабрика коротких сессий: каждый вызов открывает свою сессию на время блока async with
+SessionScope = Callable[[], AsyncContextManager[AsyncSession]]
 
-sessionmaker = load_sessionmaker(DATABASE_URL)
 
-async def get_session() -> AsyncSession:
-    async with sessionmaker() as session:
+def route_label(request: Request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", request.url.path)
+
+
+@asynccontextmanager
+async def session_scope(route: str, read_only: bool = False) -> AsyncIterator[AsyncSession]:
+    """Короткоживущая сессия: соединение берётся из пула только на время блока."""
+    started = time.perf_counter()
+    token = db_route.set(route)
+    try:
+        async with (replica_router.session() if read_only else database.sessionmaker()) as session:
+            yield session
+    finally:
+        DB_SESSION_LIFETIME_SECONDS.labels(route=route).observe(time.perf_counter() - started)
+        db_route.reset(token)
+
+
+async def get_session(request: Request) -> AsyncSession:
+    async with session_scope(route_label(request)) as session:
         yield session
 
 
+async def get_read_session(request: Request) -> AsyncSession:
+    """Для маршрутов, которые только читают: реплика, если она не отстала, иначе primary."""
+    async with session_scope(route_label(request), read_only=True) as session:
+        yield session
+
+
+async def get_session_scope(request: Request) -> SessionScope:
+    """Для хендлеров с внешними вызовами (LLM, S3): сессия открывается только вокруг работы с БД."""
+    return partial(session_scope, route_label(request))
+
+
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+SessionScopeDep = Annotated[SessionScope, Depends(get_session_scope)]
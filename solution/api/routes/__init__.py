@@ -6,6 +6,7 @@ from .ads import router as ads_router
 from .time import router as time_router
 from .stats import router as stats_router
 from .upload import router as upload_router
+from .metrics import router as metrics_router
 
 __all__ = [
     "clients_router",
@@ -15,5 +16,6 @@ __all__ = [
     "ads_router",
     "time_router",
     "stats_router",
-    "upload_router"
+    "upload_router",
+    "metrics_router"
 ]
@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import (
     APIRouter,
     Depends,
@@ -7,17 +9,18 @@ from fastapi import (
 )
 from uuid import UUID
 
-from sqlalchemy import func, asc
+import numpy as np
 from sqlalchemy import (
+    and_,
+    any_,
+    bindparam,
+    func,
     select,
     distinct,
-    literal,
-    or_,
     desc,
-    case as sql_case
 )
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import case as sql_case2
 
 from api.deps import get_session
 from api.database.models.models import (
@@ -27,12 +30,19 @@ from api.database.models.models import (
     Client,
     MLScore,
     SystemTime,
-    TargetingGenderEnum,
 )
 from api.schemas.ads import AdResponse, AdClickRequest
+from api.utils.campaign_snapshot import campaign_snapshot
+from api.utils.metrics import AD_EVENTS_INSERTED_TOTAL, AD_SERVING_STAGE_SECONDS
+from api.utils.notifications import notify_limit_reached
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ads", tags=["Ads"])
 
+# Кандидаты передаются одним массивом: их могут быть тысячи
+CAMPAIGN_IDS = ARRAY(PG_UUID(as_uuid=True))
+
 
 async def get_current_day(session: AsyncSession) -> int:
     """Получаем текущий день из таблицы system_time; если нет — 0."""
@@ -50,144 +60,69 @@ async def get_ad_for_client(
     client_id: UUID = Query(...),
     session: AsyncSession = Depends(get_session),
 ):
-    client_obj = await session.get(Client, client_id)
+    with AD_SERVING_STAGE_SECONDS.labels(stage="client_load").time():
+        client_obj = await session.get(Client, client_id)
     if not client_obj:
         raise HTTPException(status_code=404, detail="Client not found")
 
-    current_day = await get_current_day(session)
-
-    impression_case = sql_case(
-        (AdEvent.event_type == AdEventTypeEnum.IMPRESSION, AdEvent.client_id),
-        else_=None
-    )
-    click_case = sql_case(
-        (AdEvent.event_type == AdEventTypeEnum.CLICK, AdEvent.client_id),
-        else_=None
-    )
-    campaign_stats = (
-        select(
-            AdEvent.campaign_id.label("cid"),
-            func.count(distinct(impression_case)).label("unique_impressions"),
-            func.count(distinct(click_case)).label("unique_clicks"),
+    # Активные кампании с таргетингом, ценами и лимитами — из снимка, без запроса к campaigns
+    with AD_SERVING_STAGE_SECONDS.labels(stage="snapshot").time():
+        snapshot = await campaign_snapshot.get(session)
+        candidates = snapshot.candidates(
+            gender=client_obj.gender.value if client_obj.gender else None,
+            age=client_obj.age or 0,
+            location=client_obj.location or "",
         )
-        .group_by(AdEvent.campaign_id)
-        .subquery()
-    )
+    if not len(candidates):
+        raise HTTPException(status_code=404, detail="No suitable campaign found")
 
-    client_events = (
+    campaign_ids = [snapshot.ads[i].campaign_id for i in candidates]
+    impression = AdEvent.event_type == AdEventTypeEnum.IMPRESSION
+    click = AdEvent.event_type == AdEventTypeEnum.CLICK
+    # Уникальные показы и клики кандидатов и события самого клиента — одним проходом по их событиям;
+    # граница events_from отсекает партиции ad_events до первого показа самой старой кампании
+    events_stmt = (
         select(
-            AdEvent.campaign_id.label("cid"),
-            func.bool_or(AdEvent.event_type == AdEventTypeEnum.IMPRESSION).label("user_has_impression"),
-            func.bool_or(AdEvent.event_type == AdEventTypeEnum.CLICK).label("user_has_click"),
+            AdEvent.campaign_id,
+            func.count(distinct(AdEvent.client_id)).filter(impression),
+            func.count(distinct(AdEvent.client_id)).filter(click),
+            func.bool_or(and_(AdEvent.client_id == client_id, impression)),
+            func.bool_or(and_(AdEvent.client_id == client_id, click)),
         )
-        .where(AdEvent.client_id == client_id)
+        .where(AdEvent.campaign_id == any_(bindparam("campaign_ids", campaign_ids, type_=CAMPAIGN_IDS)))
+        .where(AdEvent.event_day >= snapshot.events_from)
         .group_by(AdEvent.campaign_id)
-        .subquery()
-    )
-
-    ml_scores_subq = (
-        select(
-            MLScore.advertiser_id.label("adv_id"),
-            MLScore.client_id.label("c_id"),
-            MLScore.score.label("ml_score"),
-        )
-        .where(MLScore.client_id == client_id)
-        .subquery()
     )
-
-    c = Campaign
-    cs = campaign_stats
-    ce = client_events
-    ms = ml_scores_subq
-
-    ui_col = func.coalesce(cs.c.unique_impressions, 0)
-    uc_col = func.coalesce(cs.c.unique_clicks, 0)
-
-    is_not_dead = or_(ui_col < c.impressions_limit, uc_col < c.clicks_limit)
-
-    has_impr_col = func.coalesce(ce.c.user_has_impression, literal(False))
-    has_click_col = func.coalesce(ce.c.user_has_click, literal(False))
-
-    filter_impr_ok = or_(has_impr_col == True, ui_col < c.impressions_limit)
-    filter_click_ok = or_(has_click_col == True, uc_col < c.clicks_limit)
-
-    k = 0.001
-    m0 = 5000.0
-    ml_s = func.coalesce(ms.c.ml_score, 0.0)
-    p_click_expr = 1.0 / (1.0 + func.exp(-k * (ml_s - m0)))
-    expected_profit_expr = sql_case2(
-        (has_impr_col == True,
-            sql_case2(
-                (has_click_col == True, 0.0),
-                else_=c.cost_per_click * p_click_expr
-            )
-        ),
-        else_=(c.cost_per_impression + c.cost_per_click * p_click_expr)
-    )
-
-    client_age = client_obj.age or 0
-    client_loc = client_obj.location or ""
-    client_gender_val = client_obj.gender.value if client_obj.gender else None
-
-    filter_gender = or_(
-        c.target_gender == None,
-        c.target_gender == TargetingGenderEnum.ALL,
-        c.target_gender == client_gender_val
-    )
-    filter_age_from = or_(c.target_age_from == None, c.target_age_from <= client_age)
-    filter_age_to   = or_(c.target_age_to   == None, c.target_age_to   >= client_age)
-    filter_location = or_(c.target_location == None, c.target_location == "", c.target_location == client_loc)
-
-    stmt = (
-        select(
-            c.campaign_id,
-            c.advertiser_id,
-            c.ad_title,
-            c.ad_text,
-            c.ad_photo_url,
-            has_impr_col.label("user_has_impression"),
-            has_click_col.label("user_has_click"),
-            ui_col.label("unique_impressions"),
-            uc_col.label("unique_clicks"),
-            c.impressions_limit,
-            c.clicks_limit,
-            c.cost_per_impression,
-            c.cost_per_click,
-        )
-        .add_columns(
-            expected_profit_expr.label("expected_profit"),
-            ml_s.label("calc_ml_score"),
-        )
-        .join(ce, ce.c.cid == c.campaign_id, isouter=True)
-        .join(cs, cs.c.cid == c.campaign_id, isouter=True)
-        .join(ms, ms.c.adv_id == c.advertiser_id, isouter=True)
-        .where(c.is_deleted == False)
-        .where(c.start_date <= current_day)
-        .where(c.end_date >= current_day)
-        .where(is_not_dead)
-        .where(filter_impr_ok)
-        .where(filter_click_ok)
-        .where(filter_gender)
-        .where(filter_age_from)
-        .where(filter_age_to)
-        .where(filter_location)
-        .order_by(desc("expected_profit"), desc("calc_ml_score"))
-        .limit(1)
-    )
-
-    row = (await session.execute(stmt)).mappings().first()
-    if not row:
+    ml_scores_stmt = select(MLScore.advertiser_id, MLScore.score).where(MLScore.client_id == client_id)
+
+    with AD_SERVING_STAGE_SECONDS.labels(stage="candidate_events").time():
+        events = (await session.execute(events_stmt)).all()
+        ml_scores = dict((await session.execute(ml_scores_stmt)).all())
+
+    with AD_SERVING_STAGE_SECONDS.labels(stage="ranking").time():
+        position = {campaign_id: n for n, campaign_id in enumerate(campaign_ids)}
+        unique_impressions = np.zeros(len(candidates), dtype=np.int64)
+        unique_clicks = np.zeros(len(candidates), dtype=np.int64)
+        has_impression = np.zeros(len(candidates), dtype=bool)
+        has_click = np.zeros(len(candidates), dtype=bool)
+        for campaign_id, impressions, clicks, user_impression, user_click in events:
+            n = position[campaign_id]
+            unique_impressions[n], unique_clicks[n] = impressions, clicks
+            has_impression[n], has_click[n] = bool(user_impression), bool(user_click)
+        ml_score = np.array([ml_scores.get(snapshot.ads[i].advertiser_id) or 0.0 for i in candidates],
+                            dtype=np.float64)
+        best = snapshot.best(candidates, unique_impressions, unique_clicks, has_impression, has_click, ml_score)
+    if best is None:
         raise HTTPException(status_code=404, detail="No suitable campaign found")
 
-    best_campaign_id = row["campaign_id"]
-    user_has_impr = row["user_has_impression"]
-
-    if not user_has_impr:
-        success = await safe_record_impression(
-            campaign_id=best_campaign_id,
-            client_id=client_id,
-            session=session
-        )
+    ad = snapshot.ads[best]
+    if not has_impression[position[ad.campaign_id]]:
+        with AD_SERVING_STAGE_SECONDS.labels(stage="impression_record").time():
+            success = await safe_record_impression(
+                campaign_id=ad.campaign_id,
+                client_id=client_id,
+                session=session
+            )
         if not success:
             raise HTTPException(
                 status_code=404,
@@ -195,11 +130,12 @@ async def get_ad_for_client(
             )
 
     return AdResponse(
-        ad_id=row["campaign_id"],
-        ad_title=row["ad_title"],
-        ad_text=row["ad_text"],
-        ad_photo_url=row["ad_photo_url"],
-        advertiser_id=row["advertiser_id"]
+        ad_id=ad.campaign_id,
+        ad_title=ad.ad_title,
+        ad_text=ad.ad_text,
+        ad_photo_url=ad.ad_photo_url,
+        ad_photo_variants=ad.ad_photo_variants,
+        advertiser_id=ad.advertiser_id
     )
 
 
@@ -219,6 +155,24 @@ async def record_ad_click(
     return
 
 
+def _campaign_events(campaign: Campaign, campaign_id: UUID, event_type: AdEventTypeEnum):
+    """События кампании одного типа; граница по first_event_day отсекает партиции до первого показа."""
+    condition = and_(AdEvent.campaign_id == campaign_id, AdEvent.event_type == event_type)
+    if campaign.first_event_day is not None:
+        condition = and_(condition, AdEvent.event_day >= campaign.first_event_day)
+    return condition
+
+
+def _track_first_event_day(campaign: Campaign, day: int) -> None:
+    """
+    first_event_day — минимум по всем записанным дням, а не день первой записи:
+    /time/advance может вернуть время назад, и событие раньше границы
+    выпало бы из подсчёта лимита и проверки дубликата.
+    """
+    if campaign.first_event_day is None or day < campaign.first_event_day:
+        campaign.first_event_day = day
+
+
 async def safe_record_impression(
     campaign_id: UUID,
     client_id: UUID,
@@ -240,10 +194,10 @@ async def safe_record_impression(
     if not (locked_campaign.start_date <= current_day <= locked_campaign.end_date):
         return False
 
+    impressions = _campaign_events(locked_campaign, campaign_id, AdEventTypeEnum.IMPRESSION)
     stmt_count = (
         select(func.count(distinct(AdEvent.client_id)))
-        .where(AdEvent.campaign_id == campaign_id)
-        .where(AdEvent.event_type == AdEventTypeEnum.IMPRESSION)
+        .where(impressions)
     )
     current_impr = (await session.execute(stmt_count)).scalar() or 0
     if current_impr >= locked_campaign.impressions_limit:
@@ -251,9 +205,8 @@ async def safe_record_impression(
 
     check_stmt = (
         select(AdEvent)
-        .where(AdEvent.campaign_id == campaign_id)
+        .where(impressions)
         .where(AdEvent.client_id == client_id)
-        .where(AdEvent.event_type == AdEventTypeEnum.IMPRESSION)
     )
     exists = (await session.execute(check_stmt)).scalar_one_or_none()
     if exists:
@@ -266,7 +219,18 @@ async def safe_record_impression(
         event_day=current_day
     )
     session.add(new_impr)
+    _track_first_event_day(locked_campaign, current_day)
+    limit_reached = current_impr + 1 >= locked_campaign.impressions_limit
     await session.commit()
+    AD_EVENTS_INSERTED_TOTAL.labels(event_type=AdEventTypeEnum.IMPRESSION.value).inc()
+    if limit_reached:
+        # Уведомление — отдельной транзакцией, когда блокировка строки кампании уже снята
+        try:
+            await notify_limit_reached(session, locked_campaign)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            logger.exception("limit notification failed for campaign %s", campaign_id)
     return True
 
 
@@ -293,18 +257,17 @@ async def safe_record_click(
 
     has_impression_stmt = (
         select(AdEvent)
-        .where(AdEvent.campaign_id == campaign_id)
+        .where(_campaign_events(locked_campaign, campaign_id, AdEventTypeEnum.IMPRESSION))
         .where(AdEvent.client_id == client_id)
-        .where(AdEvent.event_type == AdEventTypeEnum.IMPRESSION)
     )
     has_impression = (await session.execute(has_impression_stmt)).scalar_one_or_none()
     if not has_impression:
         return False
 
+    clicks = _campaign_events(locked_campaign, campaign_id, AdEventTypeEnum.CLICK)
     stmt_clicks = (
         select(func.count(distinct(AdEvent.client_id)))
-        .where(AdEvent.campaign_id == campaign_id)
-        .where(AdEvent.event_type == AdEventTypeEnum.CLICK)
+        .where(clicks)
     )
     current_clicks = (await session.execute(stmt_clicks)).scalar() or 0
     if current_clicks >= locked_campaign.clicks_limit:
@@ -312,9 +275,8 @@ async def safe_record_click(
 
     check_stmt = (
         select(AdEvent)
-        .where(AdEvent.campaign_id == campaign_id)
+        .where(clicks)
         .where(AdEvent.client_id == client_id)
-        .where(AdEvent.event_type == AdEventTypeEnum.CLICK)
     )
     clicked = (await session.execute(check_stmt)).scalar_one_or_none()
     if clicked:
@@ -327,5 +289,7 @@ async def safe_record_click(
         event_day=current_day
     )
     session.add(new_click)
+    _track_first_event_day(locked_campaign, current_day)
     await session.commit()
+    AD_EVENTS_INSERTED_TOTAL.labels(event_type=AdEventTypeEnum.CLICK.value).inc()
     return True
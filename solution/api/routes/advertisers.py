@@ -5,21 +5,34 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.database.models.models import Advertiser as AdvertiserModel
-from api.deps import get_session
-from api.schemas.advertiser import AdvertiserResponse, AdvertiserUpsert
+from api.deps import get_read_session, get_session
+from api.schemas.advertiser import AdvertiserResponse, AdvertiserUpsert, ReachEstimate
 from api.schemas.campaign import *
+from api.utils.audience_index import audience_index
+from app.core.change_feed import ChangeEntity, ChangeEvent, publish_changes
 
 router = APIRouter(prefix="/advertisers", tags=["Advertisers"])
 
 
 @router.get("/{advertiserId}", response_model=AdvertiserResponse)
-async def get_advertiser_by_id(advertiserId: UUID, session: AsyncSession = Depends(get_session)):
+async def get_advertiser_by_id(advertiserId: UUID, session: AsyncSession = Depends(get_read_session)):
     advertiser = await session.get(AdvertiserModel, advertiserId)
     if not advertiser:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
     return advertiser
 
 
+@router.post("/{advertiserId}/reach-estimate", response_model=ReachEstimate)
+async def estimate_reach(advertiserId: UUID, targeting: Targeting, session: AsyncSession = Depends(get_read_session)):
+    """Сколько клиентов охватит таргетинг кампании — по индексу аудитории в памяти, без чтения clients."""
+    advertiser = await session.get(AdvertiserModel, advertiserId)
+    if not advertiser:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
+    clients = audience_index.estimate(targeting.gender, targeting.age_from, targeting.age_to, targeting.location)
+    total = len(audience_index)
+    return ReachEstimate(clients=clients, total=total, share=round(clients / total * 100, 2) if total else 0.0)
+
+
 @router.post("/bulk", response_model=List[AdvertiserResponse], status_code=status.HTTP_201_CREATED)
 async def upsert_advertisers(advertisers: List[AdvertiserUpsert], session: AsyncSession = Depends(get_session)):
     result_advertisers = []
@@ -35,6 +48,8 @@ async def upsert_advertisers(advertisers: List[AdvertiserUpsert], session: Async
             session.add(advertiser)
         result_advertisers.append(advertiser)
     try:
+        await publish_changes(session, ChangeEvent(ChangeEntity.ADVERTISER,
+                                                   tuple(str(a.advertiser_id) for a in advertisers)))
         await session.commit()
     except IntegrityError as e:
         await session.rollback()
@@ -1,33 +1,47 @@
 import traceback
-from typing import List, Optional
+from typing import List, NoReturn, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
 from sqlalchemy.future import select
 from sqlalchemy.exc import IntegrityError
 
-from api.deps import get_session
+from api.deps import SessionScope, SessionScopeDep, get_read_session, get_session
 from api.database.models.models import Campaign, Advertiser
-from api.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse
+from api.database.partitions import has_archived_events
+from api.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse, CampaignPage
+from api.utils.campaign_snapshot import campaign_snapshot
 from api.utils.get_neuro_json import extract_json_to_dict
+from api.utils.images import image_pipeline
+from api.utils.moderation_filter import PrefilterVerdict, prefilter_ad
 from api.utils.neuro import moderate_ads, generate_ad_text
+from api.utils.notifications import notify_moderation_rejected
+from app.core.change_feed import ChangeEntity, ChangeEvent, ChangeOp, publish_changes
 from app.core.config import settings
 
 router = APIRouter(prefix="/advertisers/{advertiserId}/campaigns", tags=["Campaigns"])
 
 
+async def _reject_ad(new_session: SessionScope, advertiser_id: UUID, ad_title: str) -> NoReturn:
+    async with new_session() as session:
+        await notify_moderation_rejected(session, advertiser_id, ad_title)
+        await session.commit()
+    raise HTTPException(status_code=400, detail="Ad text is not allowed")
+
+
 @router.post("", response_model=CampaignResponse, status_code=status.HTTP_201_CREATED)
 async def create_campaign(
         advertiserId: UUID,
         campaign_data: CampaignCreate,
+        new_session: SessionScopeDep,
         generate_text: Optional[bool] = False,
-        session: AsyncSession = Depends(get_session)
 ):
-    advertiser = await session.get(Advertiser, advertiserId)
+    async with new_session() as session:
+        advertiser = await session.get(Advertiser, advertiserId)
     if not advertiser:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
 
-
     if generate_text:
         try:
             ad_text = await generate_ad_text(campaign_data.ad_title)
@@ -38,17 +52,22 @@ async def create_campaign(
             raise HTTPException(status_code=400, detail="Ad text is not allowed")
 
     if (campaign_data.ad_text or campaign_data.ad_title) and settings.MODERATE_ADS:
-        try:
-            metadata = await moderate_ads(campaign_data.ad_title, campaign_data.ad_text)
-            print(metadata)
-            neuro_json = extract_json_to_dict(metadata)
-            print(neuro_json)
-        except Exception as e:
-            print(traceback.format_exc())
-            raise HTTPException(status_code=400, detail="Ad text is not allowed")
-        else:
-            if neuro_json.get('passed') is False:
+        prefilter = prefilter_ad(campaign_data.ad_title, campaign_data.ad_text)
+        if prefilter.verdict == PrefilterVerdict.REJECT:
+            await _reject_ad(new_session, advertiserId, campaign_data.ad_title)
+
+        if prefilter.verdict == PrefilterVerdict.UNKNOWN:
+            try:
+                metadata = await moderate_ads(campaign_data.ad_title, campaign_data.ad_text)
+                print(metadata)
+                neuro_json = extract_json_to_dict(metadata)
+                print(neuro_json)
+            except Exception as e:
+                print(traceback.format_exc())
                 raise HTTPException(status_code=400, detail="Ad text is not allowed")
+            else:
+                if neuro_json.get('passed') is False:
+                    await _reject_ad(new_session, advertiserId, campaign_data.ad_title)
 
     new_campaign = Campaign(
         advertiser_id=advertiserId,
@@ -58,6 +77,8 @@ async def create_campaign(
         cost_per_click=campaign_data.cost_per_click,
         ad_title=campaign_data.ad_title,
         ad_text=campaign_data.ad_text,
+        ad_photo_url=campaign_data.ad_photo_url,
+        ad_photo_variants=image_pipeline.variants_for_url(campaign_data.ad_photo_url),
         start_date=campaign_data.start_date,
         end_date=campaign_data.end_date,
         target_gender=campaign_data.targeting.gender,
@@ -66,13 +87,17 @@ async def create_campaign(
         target_location=campaign_data.targeting.location,
         is_deleted=False
     )
-    session.add(new_campaign)
-    try:
-        await session.commit()
-        await session.refresh(new_campaign)
-    except IntegrityError as e:
-        await session.rollback()
-        raise HTTPException(status_code=409, detail="Campaign creation failed") from e
+    async with new_session() as session:
+        session.add(new_campaign)
+        try:
+            await session.flush()
+            await publish_changes(session, ChangeEvent(ChangeEntity.CAMPAIGN, (str(new_campaign.campaign_id),)))
+            await session.commit()
+            await session.refresh(new_campaign)
+        except IntegrityError as e:
+            await session.rollback()
+            raise HTTPException(status_code=409, detail="Campaign creation failed") from e
+        await campaign_snapshot.refresh(session)
 
     return new_campaign
 
@@ -82,7 +107,7 @@ async def list_campaigns(
         advertiserId: UUID,
         page: int = Query(1, ge=1, description="Номер страницы"),
         size: int = Query(10, ge=1, description="Количество элементов на странице"),
-        session: AsyncSession = Depends(get_session)
+        session: AsyncSession = Depends(get_read_session)
 ):
     advertiser = await session.get(Advertiser, advertiserId)
     if not advertiser:
@@ -101,11 +126,35 @@ async def list_campaigns(
     return campaigns
 
 
+@router.get("/page", response_model=CampaignPage)
+async def list_campaigns_page(
+        advertiserId: UUID,
+        page: int = Query(1, ge=1, description="Номер страницы"),
+        size: int = Query(10, ge=1, description="Количество элементов на странице"),
+        session: AsyncSession = Depends(get_read_session)
+):
+    advertiser = await session.get(Advertiser, advertiserId)
+    if not advertiser:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
+
+    active = (Campaign.advertiser_id == advertiserId, Campaign.is_deleted == False)
+    total = await session.scalar(select(func.count()).select_from(Campaign).where(*active))
+    query = (
+        select(Campaign)
+        .where(*active)
+        .order_by(Campaign.create_date.desc())
+        .offset((page - 1) * size)
+        .limit(size)
+    )
+    campaigns = (await session.execute(query)).scalars().all()
+    return CampaignPage(total=total, items=[CampaignResponse.model_validate(c) for c in campaigns])
+
+
 @router.get("/{campaignId}", response_model=CampaignResponse)
 async def get_campaign(
         advertiserId: UUID,
         campaignId: UUID,
-        session: AsyncSession = Depends(get_session)
+        session: AsyncSession = Depends(get_read_session)
 ):
     campaign = await session.get(Campaign, campaignId)
     if not campaign or campaign.advertiser_id != advertiserId or campaign.is_deleted:
@@ -125,6 +174,7 @@ async def update_campaign(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
 
     update_data = campaign_data.model_dump(exclude_unset=True)
+    previous_end_date = campaign.end_date
 
     if "targeting" in update_data:
         targeting_data = update_data.pop("targeting")
@@ -142,6 +192,8 @@ async def update_campaign(
     for field, value in update_data.items():
         if value is not None:
             setattr(campaign, field, value)
+    if "ad_photo_url" in update_data:
+        campaign.ad_photo_variants = image_pipeline.variants_for_url(campaign.ad_photo_url)
 
     new_start_date = campaign.start_date
     new_end_date = campaign.end_date
@@ -153,12 +205,18 @@ async def update_campaign(
         if campaign.target_age_from > campaign.target_age_to:
             raise HTTPException(status_code=400, detail="target_age_to must be greater than or equal to target_age_from")
 
+    if campaign.end_date > previous_end_date and await has_archived_events(session, campaignId):
+        # Лимиты считаются по живым событиям: с архивированными показами продление дало бы перерасход
+        raise HTTPException(status_code=409, detail="Campaign events are archived, end_date can't be extended")
+
     try:
+        await publish_changes(session, ChangeEvent(ChangeEntity.CAMPAIGN, (str(campaignId),)))
         await session.commit()
         await session.refresh(campaign)
     except IntegrityError as e:
         await session.rollback()
         raise HTTPException(status_code=409, detail="Campaign update failed") from e
+    await campaign_snapshot.refresh(session)
 
     return campaign
 
@@ -174,6 +232,8 @@ async def delete_campaign(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
 
     campaign.is_deleted = True
+    await publish_changes(session, ChangeEvent(ChangeEntity.CAMPAIGN, (str(campaignId),), ChangeOp.DELETE))
     await session.commit()
+    await campaign_snapshot.refresh(session)
     return None
 
@@ -4,14 +4,16 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.deps import get_session
+from api.deps import get_read_session, get_session
 from api.database.models.models import Client as ClientModel
 from api.schemas.client import ClientResponse, ClientUpsert
+from api.utils.audience_index import audience_index
+from app.core.change_feed import ChangeEntity, ChangeEvent, publish_changes
 
 router = APIRouter(prefix="/clients", tags=["Clients"])
 
 @router.get("/{clientId}", response_model=ClientResponse)
-async def get_client_by_id(clientId: UUID, session: AsyncSession = Depends(get_session)):
+async def get_client_by_id(clientId: UUID, session: AsyncSession = Depends(get_read_session)):
     client = await session.get(ClientModel, clientId)
     if not client:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
@@ -38,8 +40,11 @@ async def upsert_clients(clients: List[ClientUpsert], session: AsyncSession = De
             session.add(client)
         result_clients.append(client)
     try:
+        await publish_changes(session, ChangeEvent(ChangeEntity.CLIENT, tuple(str(c.id) for c in clients)))
         await session.commit()
     except IntegrityError as e:
         await session.rollback()
         raise HTTPException(status_code=409, detail="Duplicate client record") from e
+    for client in result_clients:
+        audience_index.upsert(client.id, client.gender, client.age, client.location)
     return result_clients
@@ -5,6 +5,7 @@ from fastapi import status
 from api.database.models.models import MLScore
 from api.deps import get_session
 from api.schemas.advertiser import MLScoreSchema
+from app.core.change_feed import ChangeEntity, ChangeEvent, publish_changes
 
 router = APIRouter(tags=["Advertisers"])
 
@@ -38,6 +39,7 @@ async def upsert_ml_score(
                 score=ml_score.score
             )
             session.add(new_ml_score)
+        await publish_changes(session, ChangeEvent(ChangeEntity.ML_SCORE, (f"{ml_score.client_id}:{ml_score.advertiser_id}",)))
         await session.commit()
     except Exception as e:
         print(e)
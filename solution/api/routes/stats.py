@@ -1,19 +1,25 @@
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Sequence
 from collections import defaultdict
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func, distinct, literal, Numeric
+from sqlalchemy import select, func, distinct, literal, Numeric, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from api.deps import get_session
-from api.database.models.models import Campaign, AdEvent, AdEventTypeEnum, Advertiser
-from api.schemas.stats import StatsResponse, DailyStatsResponse
+from api.deps import get_read_session
+from api.database.models.models import Campaign, AdEvent, AdEventRollup, AdEventTypeEnum, Advertiser
+from api.schemas.stats import StatsResponse, DailyStatsResponse, CampaignStatsOverview
 
 router = APIRouter(prefix="/stats", tags=["Statistics"])
 
 
+def _events_from(campaigns: Sequence[Campaign]) -> Optional[int]:
+    """Первый день событий этих кампаний (None — событий ещё нет): раньше него партиции не читаются."""
+    days = [c.first_event_day for c in campaigns if c.first_event_day is not None]
+    return min(days) if days else None
+
+
 async def _compute_campaigns_aggregated_stats(
     session: AsyncSession,
     campaign_ids: List[UUID]
@@ -45,16 +51,26 @@ async def _compute_campaigns_aggregated_stats(
         for c in campaigns
     }
 
-    stmt = (
-        select(
-            AdEvent.campaign_id,
-            AdEvent.event_type,
-            func.count(distinct(AdEvent.client_id)).label("unique_cnt")
+    events_from = _events_from(campaigns)
+    rows = []
+    if events_from is not None:
+        live = (
+            select(
+                AdEvent.campaign_id,
+                AdEvent.event_type,
+                func.count(distinct(AdEvent.client_id)).label("unique_cnt")
+            )
+            .where(AdEvent.campaign_id.in_(campaign_ids))
+            .where(AdEvent.event_day >= events_from)
+            .group_by(AdEvent.campaign_id, AdEvent.event_type)
         )
-        .where(AdEvent.campaign_id.in_(campaign_ids))
-        .group_by(AdEvent.campaign_id, AdEvent.event_type)
-    )
-    rows = (await session.execute(stmt)).all()
+        # Клиент учитывается в кампании один раз за всё время, поэтому итоги архива просто складываются
+        archived = (
+            select(AdEventRollup.campaign_id, AdEventRollup.event_type, func.sum(AdEventRollup.events))
+            .where(AdEventRollup.campaign_id.in_(campaign_ids))
+            .group_by(AdEventRollup.campaign_id, AdEventRollup.event_type)
+        )
+        rows = (await session.execute(union_all(live, archived))).all()
 
     total_impr = 0
     total_clicks = 0
@@ -105,9 +121,13 @@ async def _compute_campaigns_daily_stats(
         for c in campaigns
     }
 
+    events_from = _events_from(campaigns)
+    if events_from is None:
+        return []
+
     day_expr = AdEvent.event_day.label("day_int")
 
-    stmt = (
+    live = (
         select(
             AdEvent.campaign_id,
             day_expr,
@@ -115,10 +135,14 @@ async def _compute_campaigns_daily_stats(
             func.count(distinct(AdEvent.client_id)).label("unique_cnt")
         )
         .where(AdEvent.campaign_id.in_(campaign_ids))
+        .where(AdEvent.event_day >= events_from)
         .group_by(AdEvent.campaign_id, AdEvent.event_day, AdEvent.event_type)
-        .order_by(AdEvent.campaign_id, AdEvent.event_day)
     )
-    rows = (await session.execute(stmt)).all()
+    archived = (
+        select(AdEventRollup.campaign_id, AdEventRollup.event_day, AdEventRollup.event_type, AdEventRollup.events)
+        .where(AdEventRollup.campaign_id.in_(campaign_ids))
+    )
+    rows = (await session.execute(union_all(live, archived))).all()
 
     aggregator = defaultdict(lambda: {"impr": 0, "click": 0})
 
@@ -160,7 +184,7 @@ async def _compute_campaigns_daily_stats(
 
 
 @router.get("/campaigns/{campaignId}", response_model=StatsResponse)
-async def get_campaign_stats(campaignId: UUID, session: AsyncSession = Depends(get_session)):
+async def get_campaign_stats(campaignId: UUID, session: AsyncSession = Depends(get_read_session)):
     campaign = await session.get(Campaign, campaignId)
     if not campaign or campaign.is_deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
@@ -169,8 +193,20 @@ async def get_campaign_stats(campaignId: UUID, session: AsyncSession = Depends(g
     return stats
 
 
+@router.get("/campaigns/{campaignId}/overview", response_model=CampaignStatsOverview)
+async def get_campaign_stats_overview(campaignId: UUID, session: AsyncSession = Depends(get_read_session)):
+    campaign = await session.get(Campaign, campaignId)
+    if not campaign or campaign.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
+
+    return CampaignStatsOverview(
+        stats=await _compute_campaigns_aggregated_stats(session, [campaignId]),
+        daily=await _compute_campaigns_daily_stats(session, [campaignId]),
+    )
+
+
 @router.get("/advertisers/{advertiserId}/campaigns", response_model=StatsResponse)
-async def get_advertiser_campaigns_stats(advertiserId: UUID, session: AsyncSession = Depends(get_session)):
+async def get_advertiser_campaigns_stats(advertiserId: UUID, session: AsyncSession = Depends(get_read_session)):
     advertiser = await session.get(
         Advertiser,
         advertiserId,
@@ -196,7 +232,7 @@ async def get_advertiser_campaigns_stats(advertiserId: UUID, session: AsyncSessi
 
 
 @router.get("/campaigns/{campaignId}/daily", response_model=List[DailyStatsResponse])
-async def get_campaign_daily_stats(campaignId: UUID, session: AsyncSession = Depends(get_session)):
+async def get_campaign_daily_stats(campaignId: UUID, session: AsyncSession = Depends(get_read_session)):
     campaign = await session.get(Campaign, campaignId)
     if not campaign or campaign.is_deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
@@ -206,7 +242,7 @@ async def get_campaign_daily_stats(campaignId: UUID, session: AsyncSession = Dep
 
 
 @router.get("/advertisers/{advertiserId}/campaigns/daily", response_model=List[DailyStatsResponse])
-async def get_advertiser_daily_stats(advertiserId: UUID, session: AsyncSession = Depends(get_session)):
+async def get_advertiser_daily_stats(advertiserId: UUID, session: AsyncSession = Depends(get_read_session)):
     advertiser = await session.get(
         Advertiser,
         advertiserId,
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import math
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
 
+from api.database.engine import database
+from api.database.replica import replica_router
 from api.deps import get_session
 from api.database.models.models import SystemTime
+from api.database.partitions import ensure_partitions, retain
 from api.schemas.time import TimeAdvanceRequest, TimeAdvanceResponse
+from api.utils.campaign_snapshot import campaign_snapshot
+from api.utils.notifications import notify_daily_digests
+from app.core.change_feed import ChangeEntity, ChangeEvent, publish_changes
+from app.core.config import settings
 
 router = APIRouter(prefix="/time", tags=["Time"])
 
@@ -12,8 +24,13 @@ router = APIRouter(prefix="/time", tags=["Time"])
 @router.post("/advance", response_model=TimeAdvanceResponse)
 async def advance_day(
         body: TimeAdvanceRequest,
+        background_tasks: BackgroundTasks,
         session: AsyncSession = Depends(get_session)
 ):
+    # DDL партиций — своей короткой транзакцией, чтобы не держать блокировки ad_events до конца запроса
+    async with session.bind.begin() as conn:
+        await ensure_partitions(conn, body.current_date)
+
     result = await session.execute(select(SystemTime).limit(1))
     row = result.scalar_one_or_none()
 
@@ -21,14 +38,62 @@ async def advance_day(
         row = SystemTime(current_date=body.current_date)
         session.add(row)
     else:
+        if body.current_date > row.current_date:
+            await notify_daily_digests(session, row.current_date)
         row.current_date = body.current_date
 
+    await publish_changes(session, ChangeEvent(ChangeEntity.TIME, (str(body.current_date),)))
     await session.commit()
     await session.refresh(row)
+    await campaign_snapshot.refresh(session)
+
+    if settings.AD_EVENTS_RETENTION_DAYS is not None:
+        background_tasks.add_task(retain, session.bind)
 
     return TimeAdvanceResponse(current_date=row.current_date)
 
 
 @router.get("/healthcheck")
 def healthcheck():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@router.get("/readiness")
+async def readiness():
+    """
+    Готов ли воркер принимать трафик: пул создан, база отвечает и занято не больше
+    DB_READINESS_MAX_SATURATION соединений пула. Иначе 503 — балансировщик
+    уводит запросы на другие воркеры, пока этот не разгрузится.
+    """
+    pool = database.status()
+    if pool is None:
+        return JSONResponse({"status": "starting"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    body = {
+        "status": "ready",
+        "pool": {
+            "size": pool.size,
+            "max_overflow": pool.max_overflow,
+            "in_use": pool.in_use,
+            "idle": pool.idle,
+            "overflow": pool.overflow,
+            "saturation": round(pool.saturation, 3),
+        },
+    }
+    if replica_router.replica is not None:
+        # Отставшая или упавшая реплика готовности не снимает: чтение уходит в primary
+        body["replica"] = {
+            "in_use": replica_router.use_replica(),
+            "staleness": None if math.isinf(replica_router.staleness) else round(replica_router.staleness, 3),
+        }
+    if pool.saturation >= settings.DB_READINESS_MAX_SATURATION:
+        # Не занимаем соединение проверкой, когда их и так не хватает
+        body["status"] = "saturated"
+    else:
+        try:
+            await database.ping(settings.DB_READINESS_TIMEOUT)
+        except (asyncio.TimeoutError, OSError, SQLAlchemyError) as e:
+            body["status"] = "database unavailable"
+            body["error"] = str(e) or type(e).__name__
+    return JSONResponse(body, status_code=status.HTTP_200_OK if body["status"] == "ready"
+                        else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from api.utils.upload_file import upload_cdn_fileobj
+from api.utils.images import image_pipeline
+from api.utils.storage import iter_upload
 from api.schemas.upload import UploadResponse
+from app.core.config import settings
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
@@ -10,12 +12,11 @@ async def upload_photo(file: UploadFile = File(...)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Только файлы изображений допускаются")
 
-    filename = file.filename
-    if not filename or '.' not in filename:
-        raise HTTPException(status_code=400, detail="Неверное имя файла или отсутствует расширение")
-    file_extension = filename.rsplit('.', 1)[1].lower()
+    image = await image_pipeline.process(iter_upload(file, settings.UPLOAD_MAX_BYTES))
 
-    file_key = await upload_cdn_fileobj(file.file, file_extension)
-
-    file_url = f"https://prodkekz.storage.yandexcloud.net/files/{file_key}"
-    return UploadResponse(file_url=file_url)
+    return UploadResponse(
+        file_url=image.url,
+        variants=image.variants,
+        content_hash=image.content_hash,
+        deduplicated=image.deduplicated,
+    )
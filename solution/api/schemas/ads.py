@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field
 
@@ -11,6 +11,7 @@ class AdResponse(BaseModel):
     ad_title: str
     ad_text: str
     ad_photo_url: Optional[str]
+    ad_photo_variants: Optional[Dict[str, str]] = None
     advertiser_id: UUID
 
     class Config:
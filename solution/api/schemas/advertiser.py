@@ -38,6 +38,12 @@ class AdvertiserUpsert(BaseModel):
     }
 
 
+class ReachEstimate(BaseModel):
+    clients: int = Field(..., description="Клиенты, подходящие под таргетинг")
+    total: int = Field(..., description="Всего клиентов")
+    share: float = Field(..., description="Доля охвата (в процентах)")
+
+
 class MLScoreSchema(BaseModel):
     client_id: str
     advertiser_id: str
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from urllib.parse import urlparse
 from uuid import UUID
 
@@ -234,8 +234,17 @@ class CampaignUpdate(BaseModel):
 class CampaignResponse(CampaignBase):
     campaign_id: UUID = Field(alias="campaign_id")
     advertiser_id: UUID
+    ad_photo_variants: Optional[Dict[str, str]] = Field(
+        None,
+        description="Уменьшенные копии фото по ширине в пикселях"
+    )
 
     class Config:
         from_attributes = True
         populate_by_name = True
         use_enum_values = True
+
+
+class CampaignPage(BaseModel):
+    total: int = Field(..., description="Всего активных кампаний рекламодателя")
+    items: List[CampaignResponse] = Field(..., description="Кампании на странице")
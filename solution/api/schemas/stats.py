@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
@@ -18,3 +20,8 @@ class DailyStatsResponse(StatsResponse):
 
     class Config:
         from_attributes = True
+
+
+class CampaignStatsOverview(BaseModel):
+    stats: StatsResponse = Field(..., description="Статистика за всё время")
+    daily: List[DailyStatsResponse] = Field(..., description="Статистика по дням")
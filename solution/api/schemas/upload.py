@@ -1,4 +1,9 @@
+from typing import Dict
+
 from pydantic import BaseModel, Field
 
 class UploadResponse(BaseModel):
-    file_url: str = Field(..., description="URL загруженного файла")
\ No newline at end of file
+    file_url: str = Field(..., description="URL загруженного файла (самый крупный вариант)")
+    variants: Dict[str, str] = Field(..., description="URL вариантов по ширине в пикселях")
+    content_hash: str = Field(..., description="sha256 исходного файла")
+    deduplicated: bool = Field(..., description="Такой файл уже загружали, обработка пропущена")
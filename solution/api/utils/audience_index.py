@@ -0,0 +1,240 @@
+"""
+Битовый индекс аудитории: сколько клиентов охватит таргетинг.
+
+Каждому клиенту выдаётся номер бита. На каждый пол и каждый интернированный
+город заведён битсет — numpy-массив uint64, по 64 клиента в слове. Возраст
+закодирован диапазонно: битсет age_le[a] — клиенты не старше a, поэтому любой
+диапазон age_from..age_to — это пересечение двух битсетов,
+age_le[age_to] & ~age_le[age_from - 1]. Оценка охвата — AND битсетов и
+popcount, без обращения к clients.
+
+Память — по N/8 байт на пол, город и значение возраста (N — число клиентов);
+возраст старше MAX_AGE считается равным MAX_AGE.
+
+Индекс целиком загружается при старте API, обновляется в POST /clients/bulk и
+по событиям CLIENT из change feed (записи других воркеров); событие без ключей
+(после переподключения слушателя) перезагружает его целиком.
+"""
+import logging
+from collections import Counter
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.engine import Database, database
+from api.database.models.models import Client
+from app.core.change_feed import ChangeEvent
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WORD_BITS = 64
+# Старше — считаются этого возраста: строк age_le не больше MAX_AGE + 1
+MAX_AGE = 150
+# Пол, возраст и город клиента; NULL-возраст — как 0, так же его видит GET /ads
+Profile = Tuple[Optional[str], int, Optional[str]]
+
+
+def _words(rows: int) -> int:
+    return max(1, -(-rows // WORD_BITS))
+
+
+def _bitset(rows: np.ndarray, words: int) -> np.ndarray:
+    bits = np.zeros(words, dtype=np.uint64)
+    rows = rows.astype(np.uint64)
+    np.bitwise_or.at(bits, (rows >> np.uint64(6)).astype(np.int64), np.uint64(1) << (rows & np.uint64(63)))
+    return bits
+
+
+def _profile(gender, age: Optional[int], location: Optional[str]) -> Profile:
+    if isinstance(gender, Enum):
+        gender = gender.value
+    return gender, min(max(age or 0, 0), MAX_AGE), location or None
+
+
+def _count(counts: Counter, key, delta: int) -> None:
+    counts[key] += delta
+    if counts[key] <= 0:
+        del counts[key]
+
+
+class AudienceIndex:
+    def __init__(self, database: Database):
+        self.database = database
+        self._pending: Optional[List[Tuple[UUID, Profile]]] = None
+        self._load([])
+
+    def _load(self, clients: Sequence[Tuple[UUID, Profile]]) -> None:
+        """Строит структуры по всем клиентам разом, векторно, и подменяет текущие."""
+        n = len(clients)
+        words = _words(n)
+        genders = np.array([profile[0] or "" for _, profile in clients], dtype=object)
+        ages = np.array([profile[1] for _, profile in clients], dtype=np.int64)
+        locations = np.array([profile[2] or "" for _, profile in clients], dtype=object)
+
+        gender_bits, location_bits = {}, {}
+        for values, target in ((genders, gender_bits), (locations, location_bits)):
+            if not n:
+                continue
+            keys, inverse = np.unique(values, return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            groups = np.split(order, np.flatnonzero(np.diff(inverse[order])) + 1)
+            for key, rows in zip(keys, groups):
+                if key:
+                    target[key] = _bitset(rows, words)
+
+        max_age = int(ages.max()) if n else -1
+        age_le = np.zeros((max_age + 1, words), dtype=np.uint64)
+        for age in np.unique(ages):
+            age_le[age] = _bitset(np.flatnonzero(ages == age), words)
+        np.bitwise_or.accumulate(age_le, axis=0, out=age_le)
+
+        self.rows: Dict[UUID, int] = {client_id: row for row, (client_id, _) in enumerate(clients)}
+        self.profiles: List[Profile] = [profile for _, profile in clients]
+        self.words = words
+        self.present = _bitset(np.arange(n), words)
+        self.genders: Dict[str, np.ndarray] = gender_bits
+        self.locations: Dict[str, np.ndarray] = location_bits
+        self.age_le = age_le
+        self.gender_counts = Counter(profile[0] for profile in self.profiles if profile[0])
+        self.age_counts = Counter(profile[1] for profile in self.profiles)
+        self.location_counts = Counter(profile[2] for profile in self.profiles if profile[2])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def upsert(self, client_id: UUID, gender, age: Optional[int], location: Optional[str]) -> None:
+        profile = _profile(gender, age, location)
+        if self._pending is not None:
+            # Идёт перезагрузка: её выборка могла не увидеть эту запись — повторим после подмены
+            self._pending.append((client_id, profile))
+        row = self.rows.get(client_id)
+        if row is None:
+            row = len(self.rows)
+            self.rows[client_id] = row
+            self.profiles.append(profile)
+            self._grow(row)
+            self.present[row >> 6] |= np.uint64(1 << (row & 63))
+        elif self.profiles[row] == profile:
+            return
+        else:
+            self._assign(row, self.profiles[row], False)
+            self.profiles[row] = profile
+        self._assign(row, profile, True)
+
+    def _grow(self, row: int) -> None:
+        if row >> 6 < self.words:
+            return
+        extra = self.words
+        self.words += extra
+        self.present = np.pad(self.present, (0, extra))
+        for bitsets in (self.genders, self.locations):
+            for key, bits in bitsets.items():
+                bitsets[key] = np.pad(bits, (0, extra))
+        self.age_le = np.pad(self.age_le, ((0, 0), (0, extra)))
+
+    def _assign(self, row: int, profile: Profile, on: bool) -> None:
+        word, mask = row >> 6, np.uint64(1 << (row & 63))
+        gender, age, location = profile
+        delta = 1 if on else -1
+
+        def apply(bits: np.ndarray) -> None:
+            bits[word] = bits[word] | mask if on else bits[word] & ~mask
+
+        if gender:
+            apply(self.genders.setdefault(gender, np.zeros(self.words, dtype=np.uint64)))
+            _count(self.gender_counts, gender, delta)
+        if location:
+            apply(self.locations.setdefault(location, np.zeros(self.words, dtype=np.uint64)))
+            _count(self.location_counts, location, delta)
+        if age >= len(self.age_le):
+            # Новые строки age_le[a] для a старше прежнего максимума — все уже известные клиенты
+            top = self.age_le[-1] if len(self.age_le) else np.zeros(self.words, dtype=np.uint64)
+            self.age_le = np.vstack([self.age_le, np.tile(top, (age + 1 - len(self.age_le), 1))])
+        column = self.age_le[age:, word]
+        self.age_le[age:, word] = column | mask if on else column & ~mask
+        _count(self.age_counts, age, delta)
+
+    def _age_at_most(self, age: int) -> np.ndarray:
+        if age < 0 or not len(self.age_le):
+            return np.zeros(self.words, dtype=np.uint64)
+        return self.age_le[min(age, len(self.age_le) - 1)]
+
+    def estimate(self, gender: Optional[str] = None, age_from: Optional[int] = None,
+                 age_to: Optional[int] = None, location: Optional[str] = None) -> int:
+        """Сколько клиентов подходит под таргетинг; правила те же, что при выборе объявления в GET /ads."""
+        bits = self.present.copy()
+        if gender and gender != "ALL":
+            if gender not in self.genders:
+                return 0
+            bits &= self.genders[gender]
+        if location:
+            if location not in self.locations:
+                return 0
+            bits &= self.locations[location]
+        if age_to is not None:
+            bits &= self._age_at_most(age_to)
+        if age_from is not None:
+            bits &= ~self._age_at_most(age_from - 1)
+        return int(np.bitwise_count(bits).sum())
+
+    async def reload(self, session: Optional[AsyncSession] = None) -> None:
+        if session is None:
+            async with self.database.sessionmaker() as own_session:
+                return await self.reload(own_session)
+        self._pending = []
+        try:
+            stmt = select(Client.id, Client.gender, Client.age, Client.location)
+            clients = []
+            result = await session.stream(stmt.execution_options(yield_per=50_000))
+            async for partition in result.partitions():
+                clients.extend((client_id, _profile(gender, age, location))
+                               for client_id, gender, age, location in partition)
+            self._load(clients)
+            pending, self._pending = self._pending, None
+            for client_id, profile in pending:
+                self.upsert(client_id, *profile)
+        finally:
+            self._pending = None
+        logger.info("audience index: %d clients", len(self))
+
+    async def on_change(self, event: ChangeEvent) -> None:
+        if not event.keys:
+            await self.reload()
+            return
+        async with self.database.sessionmaker() as session:
+            rows = await session.execute(
+                select(Client.id, Client.gender, Client.age, Client.location)
+                .where(Client.id.in_([UUID(key) for key in event.keys]))
+            )
+            for client_id, gender, age, location in rows:
+                self.upsert(client_id, gender, age, location)
+
+
+class AudienceCollector:
+    """Демография клиентов для Prometheus и дашборда «Демографический анализ» — из счётчиков индекса."""
+
+    def __init__(self, index: AudienceIndex, top_locations: int):
+        self.index = index
+        self.top_locations = top_locations
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        family = GaugeMetricFamily("audience_clients", "Клиенты по полу, возрасту и городу (топ городов)",
+                                   labels=["dimension", "value"])
+        family.add_metric(["total", ""], len(self.index))
+        for gender, count in self.index.gender_counts.items():
+            family.add_metric(["gender", gender], count)
+        for age, count in sorted(self.index.age_counts.items()):
+            family.add_metric(["age", str(age)], count)
+        for location, count in self.index.location_counts.most_common(self.top_locations):
+            family.add_metric(["location", location], count)
+        yield family
+
+
+audience_index = AudienceIndex(database)
+REGISTRY.register(AudienceCollector(audience_index, settings.AUDIENCE_METRICS_TOP_LOCATIONS))
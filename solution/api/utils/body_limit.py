@@ -0,0 +1,40 @@
+from starlette.responses import JSONResponse
+
+from api.utils.storage import UploadTooLarge
+
+
+class BodySizeLimitMiddleware:
+    """
+    Ограничивает размер тела запросов под path_prefix. Заведомо большие запросы
+    отклоняются по Content-Length сразу, остальные — как только прочитано
+    больше max_bytes, не дожидаясь, пока всё тело ляжет во временный файл.
+    """
+
+    def __init__(self, app, max_bytes: int, path_prefix: str = "/upload"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and int(content_length) > self.max_bytes:
+            error = UploadTooLarge(self.max_bytes)
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise UploadTooLarge(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,230 @@
+"""
+Снимок активных кампаний для GET /ads.
+
+Набор активных кампаний меняется только при /time/advance и при записи
+кампаний, поэтому выбор объявления не перечитывает campaigns на каждый
+запрос: CampaignSnapshotStore держит неизменяемый CampaignSnapshot —
+таргетинг, цены и лимиты кампаний, активных в текущий день, в numpy-массивах.
+Новый снимок строится целиком и подменяется одним присваиванием: читатели не
+берут блокировок и всегда видят согласованный снимок.
+
+Снимок перестраивают маршруты кампаний и /time/advance после коммита, change
+feed — после записи в других воркерах, и, на случай потерянного NOTIFY, фоновое
+обновление снимка старше CAMPAIGN_SNAPSHOT_MAX_AGE. Лимиты, удаление и даты
+кампании при записи показа или клика всё равно проверяются под блокировкой строки.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.engine import Database, database
+from api.database.models.models import Campaign, TargetingGenderEnum
+from api.database.partitions import current_day
+from api.utils.metrics import CAMPAIGN_SNAPSHOT_BUILD_SECONDS, CAMPAIGN_SNAPSHOT_CAMPAIGNS
+from app.core.change_feed import ChangeEvent
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 0 — таргетинга по полу нет (NULL или ALL)
+GENDER_CODES = {TargetingGenderEnum.MALE.value: 1, TargetingGenderEnum.FEMALE.value: 2}
+AGE_MIN, AGE_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+# Вероятность клика по ML-скору: логистическая кривая с центром в M0
+K = 0.001
+M0 = 5000.0
+
+SNAPSHOT_COLUMNS = (
+    Campaign.campaign_id, Campaign.advertiser_id, Campaign.ad_title, Campaign.ad_text,
+    Campaign.ad_photo_url, Campaign.ad_photo_variants, Campaign.first_event_day,
+    Campaign.target_gender, Campaign.target_age_from, Campaign.target_age_to, Campaign.target_location,
+    Campaign.impressions_limit, Campaign.clicks_limit, Campaign.cost_per_impression, Campaign.cost_per_click,
+)
+
+
+@dataclass(frozen=True)
+class SnapshotAd:
+    """Поля кампании, которые нужны для ответа GET /ads."""
+    campaign_id: UUID
+    advertiser_id: UUID
+    ad_title: str
+    ad_text: str
+    ad_photo_url: Optional[str]
+    ad_photo_variants: Optional[Dict[str, Any]]
+
+
+@dataclass(frozen=True, eq=False)
+class CampaignSnapshot:
+    day: int
+    generation: int
+    built_at: float
+    # Раньше первого показа самой старой из кампаний событий нет — граница для отсечения партиций;
+    # не позже day: после отката времени новые события пишутся днём раньше first_event_day
+    events_from: int
+    ads: Tuple[SnapshotAd, ...]
+    gender: np.ndarray
+    age_from: np.ndarray
+    age_to: np.ndarray
+    location: np.ndarray
+    location_codes: Dict[str, int]
+    impressions_limit: np.ndarray
+    clicks_limit: np.ndarray
+    cost_per_impression: np.ndarray
+    cost_per_click: np.ndarray
+
+    @classmethod
+    def from_rows(cls, day: int, generation: int, built_at: float, rows: Sequence[Any]) -> "CampaignSnapshot":
+        """rows — строки с колонками SNAPSHOT_COLUMNS."""
+        location_codes: Dict[str, int] = {}
+        first_days = [row.first_event_day for row in rows if row.first_event_day is not None]
+
+        def gender(value) -> int:
+            return GENDER_CODES.get(value.value, 0) if value is not None else 0
+
+        def location(value: Optional[str]) -> int:
+            # 0 — таргетинга по городу нет (NULL или пустая строка)
+            return location_codes.setdefault(value, len(location_codes) + 1) if value else 0
+
+        return cls(
+            day=day,
+            generation=generation,
+            built_at=built_at,
+            events_from=min([*first_days, day]),
+            ads=tuple(SnapshotAd(row.campaign_id, row.advertiser_id, row.ad_title, row.ad_text,
+                                 row.ad_photo_url, row.ad_photo_variants) for row in rows),
+            gender=np.array([gender(row.target_gender) for row in rows], dtype=np.int8),
+            age_from=np.array([AGE_MIN if row.target_age_from is None else row.target_age_from for row in rows],
+                              dtype=np.int32),
+            age_to=np.array([AGE_MAX if row.target_age_to is None else row.target_age_to for row in rows],
+                            dtype=np.int32),
+            location=np.array([location(row.target_location) for row in rows], dtype=np.int32),
+            location_codes=location_codes,
+            impressions_limit=np.array([row.impressions_limit for row in rows], dtype=np.int64),
+            clicks_limit=np.array([row.clicks_limit for row in rows], dtype=np.int64),
+            cost_per_impression=np.array([row.cost_per_impression for row in rows], dtype=np.float64),
+            cost_per_click=np.array([row.cost_per_click for row in rows], dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ads)
+
+    def candidates(self, gender: Optional[str], age: int, location: Optional[str]) -> np.ndarray:
+        """Индексы кампаний, чей таргетинг подходит клиенту."""
+        ok = self.gender == 0
+        if gender in GENDER_CODES:
+            ok |= self.gender == GENDER_CODES[gender]
+        ok &= (self.age_from <= age) & (self.age_to >= age)
+        code = self.location_codes.get(location) if location else None
+        ok &= (self.location == 0) | (self.location == code) if code else self.location == 0
+        return np.flatnonzero(ok)
+
+    def best(self, candidates: np.ndarray, unique_impressions: np.ndarray, unique_clicks: np.ndarray,
+             has_impression: np.ndarray, has_click: np.ndarray, ml_score: np.ndarray) -> Optional[int]:
+        """
+        Индекс кампании с наибольшей ожидаемой прибылью (при равенстве — с большим
+        ML-скором) среди кандидатов, которые ещё не выбрали лимит и где клиенту
+        можно показать объявление или засчитать клик. Массивы выровнены по candidates.
+        """
+        impressions_left = unique_impressions < self.impressions_limit[candidates]
+        clicks_left = unique_clicks < self.clicks_limit[candidates]
+        ok = (impressions_left | clicks_left) & (has_impression | impressions_left) & (has_click | clicks_left)
+        if not ok.any():
+            return None
+
+        with np.errstate(over="ignore"):
+            p_click = 1.0 / (1.0 + np.exp(-K * (ml_score - M0)))
+        click_profit = self.cost_per_click[candidates] * p_click
+        profit = np.where(
+            has_impression,
+            np.where(has_click, 0.0, click_profit),
+            self.cost_per_impression[candidates] + click_profit,
+        )
+        allowed = np.flatnonzero(ok)
+        # lexsort сортирует по последнему ключу в первую очередь
+        order = np.lexsort((-ml_score[allowed], -profit[allowed]))
+        return int(candidates[allowed[order[0]]])
+
+
+async def build_snapshot(session: AsyncSession, generation: int, built_at: float) -> CampaignSnapshot:
+    day = await current_day(session)
+    rows = (await session.execute(
+        select(*SNAPSHOT_COLUMNS)
+        .where(Campaign.is_deleted == False)
+        .where(Campaign.start_date <= day)
+        .where(Campaign.end_date >= day)
+    )).all()
+    return CampaignSnapshot.from_rows(day, generation, built_at, rows)
+
+
+class CampaignSnapshotStore:
+    """
+    Текущий снимок и его перестроение. Перестроения идут по одному: запрос,
+    пришедший во время построения, дожидается его и, если снимок уже собран
+    после запроса, новый не строит — пачка записей даёт одно-два перестроения.
+    """
+
+    def __init__(self, database: Database, max_age: float, clock: Callable[[], float] = time.monotonic):
+        self.database = database
+        self.max_age = max_age
+        self.clock = clock
+        self.current: Optional[CampaignSnapshot] = None
+        self._requested = 0
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+
+    async def get(self, session: AsyncSession) -> CampaignSnapshot:
+        """Снимок для запроса; строится на session, только если его ещё нет."""
+        snapshot = self.current
+        if snapshot is None:
+            return await self.refresh(session)
+        stale = self.clock() - snapshot.built_at > self.max_age
+        # Без запущенного пула (бенчмарки, тесты) фоновому обновлению не на чем строить
+        if stale and self._background is None and self.database.engine is not None:
+            self._background = asyncio.create_task(self._refresh_in_background())
+        return snapshot
+
+    async def refresh(self, session: Optional[AsyncSession] = None) -> CampaignSnapshot:
+        """
+        Строит снимок, видящий всё, что закоммичено до вызова, и подменяет текущий.
+        Без session строит на своей сессии пула.
+        """
+        self._requested += 1
+        requested = self._requested
+        async with self._lock:
+            if self.current is not None and self.current.generation >= requested:
+                return self.current
+            generation = self._requested
+            with CAMPAIGN_SNAPSHOT_BUILD_SECONDS.time():
+                if session is None:
+                    async with self.database.sessionmaker() as own_session:
+                        snapshot = await build_snapshot(own_session, generation, self.clock())
+                else:
+                    snapshot = await build_snapshot(session, generation, self.clock())
+            self.current = snapshot
+            CAMPAIGN_SNAPSHOT_CAMPAIGNS.set(len(snapshot))
+            return snapshot
+
+    def clear(self) -> None:
+        """Забыть снимок: следующий запрос построит новый (после смены данных в обход API)."""
+        self.current = None
+
+    async def on_change(self, event: ChangeEvent) -> None:
+        await self.refresh()
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("campaign snapshot refresh failed")
+        finally:
+            self._background = None
+
+
+campaign_snapshot = CampaignSnapshotStore(database, max_age=settings.CAMPAIGN_SNAPSHOT_MAX_AGE)
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import re
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from PIL import Image, ImageOps
+
+from api.utils.storage import ObjectStorage, storage
+from app.core.config import settings
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+class InvalidImage(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST,
+                         detail="Не удалось прочитать изображение")
+
+
+def render_variants(data: bytes, widths: Sequence[int], fmt: str, quality: int,
+                    max_pixels: int) -> List[Tuple[int, bytes]]:
+    """
+    Декодирует изображение, поворачивает по EXIF, выбрасывает метаданные и
+    кодирует по варианту на каждую ширину. Картинки уже нужной ширины не
+    растягиваются. Выполняется в отдельном процессе.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha and fmt == "webp" else "RGB")
+
+    variants = []
+    for width in sorted(widths):
+        variant = image
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            variant = image.resize((width, height), Image.Resampling.LANCZOS)
+        # Без info Pillow не допишет в файл ни EXIF, ни ICC, ни комментарии исходника
+        variant.info = {}
+        buf = io.BytesIO()
+        variant.save(buf, format=fmt.upper(), quality=quality, optimize=fmt == "jpeg")
+        variants.append((width, buf.getvalue()))
+    return variants
+
+
+def image_key(content_hash: str, width: int, fmt: str) -> str:
+    return f"img/{content_hash}/{width}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+@dataclass(frozen=True)
+class ProcessedImage:
+    content_hash: str
+    url: str
+    variants: Dict[str, str]
+    deduplicated: bool
+
+
+class ImagePipeline:
+    """
+    Нормализация загруженных фото. Ключ в хранилище — sha256 исходных байтов,
+    поэтому повторная загрузка того же файла не декодируется и не пишется
+    заново. Варианты пишутся по возрастанию ширины: наличие самого широкого
+    означает, что готовы все. Декодирование и кодирование идут в процессном пуле.
+    """
+
+    def __init__(self, storage: ObjectStorage, widths: Sequence[int] = (320, 640, 1280),
+                 fmt: str = "webp", quality: int = 80, max_pixels: int = 40_000_000,
+                 max_workers: int = 2, known_size: int = 4096, executor: Optional[Executor] = None):
+        self.storage = storage
+        self.widths = tuple(sorted(set(widths)))
+        self.fmt = fmt
+        self.quality = quality
+        self.max_pixels = max_pixels
+        self._executor = executor
+        self._max_workers = max_workers
+        self._known: OrderedDict = OrderedDict()
+        self._known_size = known_size
+        self._url_pattern = re.compile(
+            rf"^{re.escape(storage.public_url)}/img/([0-9a-f]{{64}})/\d+\.{FORMAT_EXTENSIONS[fmt]}$"
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def variant_urls(self, content_hash: str) -> Dict[str, str]:
+        return {str(width): self.storage.url(image_key(content_hash, width, self.fmt)) for width in self.widths}
+
+    def variants_for_url(self, url: Optional[str]) -> Optional[Dict[str, str]]:
+        """Варианты для ссылки, выданной этим конвейером; для внешних ссылок — None."""
+        if not url:
+            return None
+        match = self._url_pattern.match(url)
+        return self.variant_urls(match.group(1)) if match else None
+
+    def _result(self, content_hash: str, deduplicated: bool) -> ProcessedImage:
+        variants = self.variant_urls(content_hash)
+        return ProcessedImage(content_hash, variants[str(self.widths[-1])], variants, deduplicated)
+
+    def _remember(self, content_hash: str) -> None:
+        self._known[content_hash] = True
+        self._known.move_to_end(content_hash)
+        if len(self._known) > self._known_size:
+            self._known.popitem(last=False)
+
+    async def _exists(self, content_hash: str) -> bool:
+        if content_hash in self._known:
+            self._known.move_to_end(content_hash)
+            return True
+        if await self.storage.exists(image_key(content_hash, self.widths[-1], self.fmt)):
+            self._remember(content_hash)
+            return True
+        return False
+
+    async def process(self, chunks: AsyncIterator[bytes]) -> ProcessedImage:
+        data = bytearray()
+        async for chunk in chunks:
+            data += chunk
+        content_hash = hashlib.sha256(data).hexdigest()
+        if await self._exists(content_hash):
+            return self._result(content_hash, deduplicated=True)
+
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(
+                self._get_executor(), render_variants,
+                bytes(data), self.widths, self.fmt, self.quality, self.max_pixels,
+            )
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise InvalidImage() from e
+
+        for width, body in rendered:
+            await self.storage.save(image_key(content_hash, width, self.fmt), _once(body), CONTENT_TYPES[self.fmt])
+        self._remember(content_hash)
+        return self._result(content_hash, deduplicated=False)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+async def _once(body: bytes) -> AsyncIterator[bytes]:
+    yield body
+
+
+image_pipeline = ImagePipeline(
+    storage,
+    widths=settings.IMAGE_VARIANT_WIDTHS,
+    fmt=settings.IMAGE_FORMAT,
+    quality=settings.IMAGE_QUALITY,
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+    max_workers=settings.IMAGE_WORKERS,
+)
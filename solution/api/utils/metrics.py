@@ -0,0 +1,149 @@
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_DURATION_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_CONNECTION_HOLD_SECONDS = Histogram(
+    "db_connection_hold_seconds",
+    "Сколько соединение пула занято: от выдачи из пула до возврата, по маршруту",
+    ["pool", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_SESSION_LIFETIME_SECONDS = Histogram(
+    "db_session_lifetime_seconds",
+    "Время жизни сессии запроса от открытия до закрытия; занятость соединения — db_connection_hold_seconds",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание соединения из пула (включая открытие нового соединения)",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Соединения пула по состоянию",
+    ["pool", "state"],
+)
+
+DB_READ_SESSIONS_TOTAL = Counter(
+    "db_read_sessions_total",
+    "Сессии read-only маршрутов по базе, которая их обслужила",
+    ["target"],
+)
+
+DB_REPLICA_STALENESS_SECONDS = Gauge(
+    "db_replica_staleness_seconds",
+    "Насколько реплика может отставать от primary по последней проверке",
+)
+
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request",
+    "Количество SQL-запросов на один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 500),
+)
+
+AD_EVENTS_INSERTED_TOTAL = Counter(
+    "ad_events_inserted_total",
+    "Записанные события показов и кликов",
+    ["event_type"],
+)
+
+AD_SERVING_STAGE_SECONDS = Histogram(
+    "ad_serving_stage_seconds",
+    "Время этапов выбора объявления в GET /ads",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CAMPAIGN_SNAPSHOT_BUILD_SECONDS = Histogram(
+    "campaign_snapshot_build_seconds",
+    "Время построения снимка активных кампаний",
+    buckets=LATENCY_BUCKETS,
+)
+
+CAMPAIGN_SNAPSHOT_CAMPAIGNS = Gauge(
+    "campaign_snapshot_campaigns",
+    "Активных кампаний в текущем снимке",
+)
+
+
+# Маршрут, для которого берётся соединение; выставляет session_scope, вне запросов — "background"
+db_route: ContextVar[str] = ContextVar("db_route", default="background")
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет ожидание при выдаче соединения."""
+
+    label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT_SECONDS.labels(pool=self.label).observe(time.perf_counter() - started)
+
+
+def instrument_pool(engine: AsyncEngine, name: str = "primary") -> None:
+    pool = engine.sync_engine.pool
+    pool.label = name
+    DB_POOL_CONNECTIONS.labels(pool=name, state="in_use").set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels(pool=name, state="idle").set_function(pool.checkedin)
+    DB_POOL_CONNECTIONS.labels(pool=name, state="overflow").set_function(lambda: max(pool.overflow(), 0))
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["hold_started"] = (time.perf_counter(), db_route.get())
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("hold_started", None)
+        if started is not None:
+            DB_CONNECTION_HOLD_SECONDS.labels(pool=name, route=started[1]).observe(time.perf_counter() - started[0])
+
+
+class PrometheusMiddleware:
+    """ASGI-middleware: гистограмма латентности по шаблону маршрута и статусу."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION_SECONDS.labels(
+                method=scope["method"], route=route, status=str(status_code)
+            ).observe(time.perf_counter() - started)
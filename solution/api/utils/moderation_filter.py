@@ -0,0 +1,155 @@
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WORD_CHARS = re.compile(r"\w")
+_SPACES = re.compile(r"\s+")
+
+
+class PrefilterVerdict(str, Enum):
+    REJECT = "REJECT"
+    ACCEPT = "ACCEPT"
+    UNKNOWN = "UNKNOWN"
+
+
+@dataclass(frozen=True)
+class PrefilterDecision:
+    verdict: PrefilterVerdict
+    blocked: Tuple[str, ...] = field(default_factory=tuple)
+    allowed: Tuple[str, ...] = field(default_factory=tuple)
+    coverage: float = 0.0
+
+
+class AhoCorasick:
+    """Автомат Ахо–Корасик: один проход по тексту находит вхождения всех паттернов."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def _add(self, pattern: str) -> None:
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        if pattern not in self._out[node]:
+            self._out[node] = self._out[node] + (pattern,)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Выдаёт (start, end, pattern) для каждого вхождения; end не включается."""
+        node = 0
+        for pos, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern in self._out[node]:
+                yield pos - len(pattern) + 1, pos + 1, pattern
+
+
+def normalize_text(text: str) -> str:
+    return _SPACES.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def _is_word_boundary(text: str, start: int, end: int) -> bool:
+    before = start == 0 or not _WORD_CHARS.match(text[start - 1])
+    after = end == len(text) or not _WORD_CHARS.match(text[end])
+    return before and after
+
+
+class ModerationPrefilter:
+    """
+    Локальная проверка объявления до обращения к LLM.
+
+    Любое слово из блок-листа — отказ. Если текст целиком (с долей не меньше
+    accept_coverage) состоит из фраз allow-листа — одобрение. Остальное уходит в LLM.
+    Блок-лист матчится по подстроке (ловит словоформы), allow-лист — только целыми словами.
+    """
+
+    def __init__(self, blocklist: Iterable[str], allowlist: Iterable[str], accept_coverage: float = 1.0):
+        self._blocked = AhoCorasick(normalize_text(w) for w in blocklist)
+        self._allowed = AhoCorasick(normalize_text(w) for w in allowlist)
+        self.accept_coverage = accept_coverage
+
+    def check(self, *parts: Optional[str]) -> PrefilterDecision:
+        text = normalize_text(" ".join(p for p in parts if p))
+        if not text:
+            return PrefilterDecision(PrefilterVerdict.UNKNOWN)
+
+        blocked = tuple(sorted({p for _, _, p in self._blocked.iter_matches(text)}))
+        if blocked:
+            return PrefilterDecision(PrefilterVerdict.REJECT, blocked=blocked)
+
+        if not self._allowed:
+            return PrefilterDecision(PrefilterVerdict.UNKNOWN)
+
+        covered = bytearray(len(text))
+        allowed = set()
+        for start, end, pattern in self._allowed.iter_matches(text):
+            if _is_word_boundary(text, start, end):
+                covered[start:end] = b"\x01" * (end - start)
+                allowed.add(pattern)
+
+        significant = [i for i, char in enumerate(text) if _WORD_CHARS.match(char)]
+        coverage = sum(covered[i] for i in significant) / len(significant) if significant else 0.0
+        verdict = PrefilterVerdict.ACCEPT if coverage >= self.accept_coverage else PrefilterVerdict.UNKNOWN
+        return PrefilterDecision(verdict, allowed=tuple(sorted(allowed)), coverage=coverage)
+
+
+def _read_wordlist(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+@lru_cache(maxsize=1)
+def get_prefilter() -> ModerationPrefilter:
+    blocklist = list(settings.MODERATION_BLOCKLIST) + _read_wordlist(settings.MODERATION_BLOCKLIST_FILE)
+    allowlist = list(settings.MODERATION_ALLOWLIST) + _read_wordlist(settings.MODERATION_ALLOWLIST_FILE)
+    return ModerationPrefilter(blocklist, allowlist, settings.MODERATION_ACCEPT_COVERAGE)
+
+
+def prefilter_ad(title: Optional[str], text: Optional[str]) -> PrefilterDecision:
+    decision = get_prefilter().check(title, text)
+    logger.info(
+        "moderation prefilter: verdict=%s blocked=%s allowed=%s coverage=%.2f",
+        decision.verdict.value, list(decision.blocked), list(decision.allowed), decision.coverage,
+    )
+    return decision
@@ -0,0 +1,89 @@
+import hashlib
+import html
+from collections import defaultdict
+from enum import Enum
+from uuid import UUID
+
+from sqlalchemy import case, func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.models.models import AdEvent, AdEventTypeEnum, BotNotification, BotUser, Campaign
+from app.core.change_feed import ChangeEntity, ChangeEvent, publish_changes
+
+
+class NotificationKind(str, Enum):
+    DAILY_DIGEST = "daily_digest"
+    LIMIT_REACHED = "limit_reached"
+    MODERATION_REJECTED = "moderation_rejected"
+
+
+async def notify_advertiser(session: AsyncSession, advertiser_id: UUID, kind: NotificationKind,
+                            dedupe_key: str, body: str) -> None:
+    """
+    Кладёт уведомление в outbox для всех чатов, привязанных к рекламодателю,
+    в транзакции вызывающего. Неотправленное уведомление с тем же dedupe_key
+    не дублируется, а заменяется новым текстом. Бот будится через change feed.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+
+    recipients = select(
+        BotUser.user_id, literal(kind.value), literal(dedupe_key), literal(body)
+    ).where(BotUser.advertiser_id == advertiser_id)
+    stmt = insert(BotNotification).from_select(["chat_id", "kind", "dedupe_key", "body"], recipients)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BotNotification.chat_id, BotNotification.dedupe_key],
+        # Предикат частичного индекса — литералом: с параметром вместо 'pending' общий план
+        # подготовленного запроса (с шестого выполнения) не сопоставится с uq_bot_notifications_pending
+        index_where=text("status = 'pending'"),
+        set_={"body": stmt.excluded.body, "coalesced": BotNotification.coalesced + 1},
+    )
+    await session.execute(stmt)
+    await publish_changes(session, ChangeEvent(ChangeEntity.NOTIFICATION))
+
+
+async def notify_limit_reached(session: AsyncSession, campaign: Campaign) -> None:
+    await notify_advertiser(
+        session, campaign.advertiser_id, NotificationKind.LIMIT_REACHED,
+        f"limit:{campaign.campaign_id}",
+        f"🏁 Кампания «{html.escape(campaign.ad_title)}» набрала лимит показов ({campaign.impressions_limit}).",
+    )
+
+
+async def notify_moderation_rejected(session: AsyncSession, advertiser_id: UUID, ad_title: str) -> None:
+    digest = hashlib.blake2b(ad_title.encode(), digest_size=8).hexdigest()
+    await notify_advertiser(
+        session, advertiser_id, NotificationKind.MODERATION_REJECTED,
+        f"moderation:{digest}",
+        f"🚫 Объявление «{html.escape(ad_title)}» не прошло модерацию.",
+    )
+
+
+async def notify_daily_digests(session: AsyncSession, day: int) -> None:
+    """Сводка за закончившийся день для рекламодателей, у которых есть чаты с ботом."""
+    cost = case(
+        (AdEvent.event_type == AdEventTypeEnum.IMPRESSION, Campaign.cost_per_impression),
+        else_=Campaign.cost_per_click,
+    )
+    stmt = (
+        select(Campaign.advertiser_id, AdEvent.event_type, func.count(), func.sum(cost))
+        .join(Campaign, Campaign.campaign_id == AdEvent.campaign_id)
+        .where(AdEvent.event_day == day)
+        .where(Campaign.advertiser_id.in_(select(BotUser.advertiser_id).where(BotUser.advertiser_id.is_not(None))))
+        .group_by(Campaign.advertiser_id, AdEvent.event_type)
+    )
+    totals = defaultdict(lambda: {AdEventTypeEnum.IMPRESSION: (0, 0.0), AdEventTypeEnum.CLICK: (0, 0.0)})
+    for advertiser_id, event_type, count, spent in (await session.execute(stmt)).all():
+        totals[advertiser_id][event_type] = (count, spent or 0.0)
+
+    for advertiser_id, by_type in totals.items():
+        impressions, spent_impressions = by_type[AdEventTypeEnum.IMPRESSION]
+        clicks, spent_clicks = by_type[AdEventTypeEnum.CLICK]
+        await notify_advertiser(
+            session, advertiser_id, NotificationKind.DAILY_DIGEST, f"digest:{day}",
+            f"📊 Итоги дня {day}\n"
+            f"└ Показы: {impressions:,}\n"
+            f"└ Клики: {clicks:,}\n"
+            f"└ Затраты: {spent_impressions + spent_clicks:,.2f} ₽",
+        )
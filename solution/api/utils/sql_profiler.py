@@ -0,0 +1,125 @@
+import logging
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from api.utils.metrics import DB_STATEMENTS_PER_REQUEST
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_PARAMS_CHARS = 1000
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    db_time: float = 0.0
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("sql_query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+# Блокирующие чтения и функции с побочными эффектами нельзя выполнять повторно ради EXPLAIN ANALYZE
+_SIDE_EFFECTS = re.compile(
+    r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b"
+    r"|\b(pg_notify|nextval|setval|pg_advisory_\w+|pg_logical_emit_message)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def explain_prefix(statement: str) -> Optional[str]:
+    """
+    EXPLAIN ANALYZE выполняет запрос ещё раз, поэтому — только для чтений без
+    побочных эффектов; остальным SELECT достаётся план без выполнения.
+    """
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    if _SIDE_EFFECTS.search(statement):
+        return "EXPLAIN"
+    return "EXPLAIN (ANALYZE, BUFFERS)"
+
+
+def _explain(conn, prefix: str, statement, parameters) -> str:
+    # Отдельный курсор: результат исходного запроса ещё не прочитан SQLAlchemy
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"{prefix} {statement}", parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время старта — на контексте выполнения: упавший запрос не оставит его висеть на соединении
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+
+    if elapsed * 1000 < settings.SQL_SLOW_QUERY_MS:
+        return
+
+    logger.warning(
+        "slow query %.1f ms: %s | params=%.*r",
+        elapsed * 1000, statement, MAX_LOGGED_PARAMS_CHARS, parameters,
+    )
+    prefix = explain_prefix(statement)
+    if settings.SQL_SLOW_QUERY_EXPLAIN and not executemany and prefix is not None:
+        try:
+            logger.warning("slow query plan:\n%s", _explain(conn, prefix, statement, parameters))
+        except Exception as e:
+            logger.warning("slow query plan unavailable: %s", e)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLProfilerMiddleware:
+    """
+    Считает SQL-запросы и время в БД на каждый HTTP-запрос.
+    При SQL_DEBUG_HEADERS отдаёт их в заголовках X-DB-Statements и X-DB-Time-Ms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-statements", str(stats.statements).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.db_time * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            DB_STATEMENTS_PER_REQUEST.labels(route=route).observe(stats.statements)
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import secrets
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import aioboto3
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, UploadFile, status
+
+from app.core.config import settings
+
+READ_CHUNK_BYTES = 1024 * 1024
+# S3 не принимает части multipart меньше 5 МБ (кроме последней)
+MIN_MULTIPART_PART_BYTES = 5 * 1024 * 1024
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         detail=f"Файл больше {max_bytes} байт")
+
+
+async def iter_upload(file: UploadFile, max_bytes: int, chunk_size: int = READ_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Читает загруженный файл кусками и обрывает чтение, как только превышен max_bytes."""
+    total = 0
+    while chunk := await file.read(chunk_size):
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        yield chunk
+
+
+def new_object_key(extension: str) -> str:
+    return f"{secrets.token_hex(7)}.{extension.lower()}"
+
+
+class ObjectStorage(ABC):
+    """Хранилище загруженных файлов. Клиент создаётся один раз в start() и живёт до close()."""
+
+    def __init__(self, public_url: str):
+        self.public_url = public_url.rstrip("/")
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Есть ли уже объект под ключом key."""
+
+    @abstractmethod
+    async def save(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        """Сохраняет поток байтов под ключом key и возвращает его размер."""
+
+
+class S3Storage(ObjectStorage):
+    """
+    S3-совместимое хранилище. Маленькие файлы уходят одним put_object,
+    большие — multipart-загрузкой частями по part_size без буферизации всего файла.
+    """
+
+    def __init__(self, bucket: str, public_url: str, endpoint_url: Optional[str] = None,
+                 key_id: Optional[str] = None, secret: Optional[str] = None,
+                 part_size: int = 8 * 1024 * 1024):
+        super().__init__(public_url)
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.key_id = key_id
+        self.secret = secret
+        self.part_size = max(part_size, MIN_MULTIPART_PART_BYTES)
+        self._stack: Optional[AsyncExitStack] = None
+        self._client = None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._stack = AsyncExitStack()
+        self._client = await self._stack.enter_async_context(aioboto3.Session().client(
+            service_name="s3",
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=self.key_id,
+            aws_secret_access_key=self.secret,
+        ))
+
+    async def close(self) -> None:
+        if self._stack is not None:
+            await self._stack.aclose()
+        self._stack = None
+        self._client = None
+
+    async def exists(self, key: str) -> bool:
+        if self._client is None:
+            await self.start()
+        try:
+            await self._client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        if self._client is None:
+            await self.start()
+        extra = {"ContentType": content_type} if content_type else {}
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts = []
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                if len(buffer) < self.part_size:
+                    continue
+                if upload_id is None:
+                    created = await self._client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)
+                    upload_id = created["UploadId"]
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                buffer.clear()
+
+            if upload_id is None:
+                await self._client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra)
+                return size
+
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+            return size
+        except BaseException:
+            if upload_id is not None:
+                await self._client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, body: bytes) -> dict:
+        part = await self._client.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body,
+        )
+        return {"ETag": part["ETag"], "PartNumber": number}
+
+
+class LocalStorage(ObjectStorage):
+    """Файлы на локальном диске — для разработки и тестов."""
+
+    def __init__(self, root: str, public_url: str):
+        super().__init__(public_url)
+        self.root = Path(root)
+
+    async def start(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).is_file)
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None) -> int:
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+        size = 0
+        handle = await asyncio.to_thread(open, tmp, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+                size += len(chunk)
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(os.replace, tmp, target)
+        except BaseException:
+            handle.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        return size
+
+
+def create_storage() -> ObjectStorage:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_LOCAL_DIR, settings.STORAGE_PUBLIC_URL)
+    return S3Storage(
+        bucket=settings.S3_BUCKET,
+        public_url=settings.STORAGE_PUBLIC_URL,
+        endpoint_url=settings.AWS_ENDPOINT_URL,
+        key_id=settings.AWS_KEY_ID,
+        secret=settings.AWS_ACCESS_KEY,
+        part_size=settings.S3_MULTIPART_PART_BYTES,
+    )
+
+
+storage = create_storage()
@@ -0,0 +1,181 @@
+"""
+Change feed на LISTEN/NOTIFY: общий контракт событий для API и бота.
+"""
+import asyncio
+import inspect
+import json
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Union
+
+import asyncpg
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "adv_changes"
+# NOTIFY принимает payload до 8000 байт — режем ключи на пачки с запасом
+MAX_PAYLOAD_BYTES = 7000
+
+
+class ChangeEntity(str, Enum):
+    CAMPAIGN = "campaign"
+    CLIENT = "client"
+    ADVERTISER = "advertiser"
+    # Ключ — "client_id:advertiser_id"
+    ML_SCORE = "ml_score"
+    TIME = "time"
+    NOTIFICATION = "notification"
+
+
+class ChangeOp(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """
+    Событие изменения сущности. Пустой keys означает «изменилось всё»
+    (так приходит событие после переподключения слушателя — могли пропустить NOTIFY).
+    """
+    entity: ChangeEntity
+    keys: tuple = ()
+    op: ChangeOp = ChangeOp.UPSERT
+
+    def to_payload(self) -> str:
+        return json.dumps({"e": self.entity.value, "o": self.op.value, "k": list(self.keys)},
+                          separators=(",", ":"))
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "ChangeEvent":
+        data = json.loads(payload)
+        return cls(entity=ChangeEntity(data["e"]), keys=tuple(data["k"]), op=ChangeOp(data["o"]))
+
+    def split(self) -> List["ChangeEvent"]:
+        """Делит событие на несколько, чтобы каждый payload влез в лимит NOTIFY."""
+        chunks, current, size = [], [], 0
+        for key in self.keys:
+            key_size = len(json.dumps(key)) + 1
+            if current and size + key_size > MAX_PAYLOAD_BYTES:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(key)
+            size += key_size
+        if current or not chunks:
+            chunks.append(current)
+        return [ChangeEvent(self.entity, tuple(chunk), self.op) for chunk in chunks]
+
+
+async def publish_changes(session: AsyncSession, *events: ChangeEvent) -> None:
+    """
+    Публикует события в той же транзакции, что и запись: Postgres доставит
+    NOTIFY подписчикам только после COMMIT и не доставит при ROLLBACK.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for event in events:
+        for part in event.split():
+            await session.execute(select(func.pg_notify(CHANNEL, part.to_payload())))
+
+
+Subscriber = Callable[[ChangeEvent], Union[None, Awaitable[None]]]
+
+
+class ChangeFeedListener:
+    """Держит отдельное соединение с LISTEN и переподключается с экспоненциальной задержкой."""
+
+    def __init__(self, dsn: str, channel: str = CHANNEL,
+                 min_backoff: float = 0.5, max_backoff: float = 30.0, ping_interval: float = 15.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.ping_interval = ping_interval
+        self._subscribers: Dict[ChangeEntity, List[Subscriber]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+        # Ссылки на задачи рассылки: без них незавершённую задачу может собрать GC
+        self._dispatches: Set[asyncio.Task] = set()
+
+    def subscribe(self, entities: Union[ChangeEntity, Iterable[ChangeEntity]], callback: Subscriber) -> None:
+        if isinstance(entities, ChangeEntity):
+            entities = [entities]
+        for entity in entities:
+            self._subscribers[entity].append(callback)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="change-feed-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._dispatches):
+            task.cancel()
+        await asyncio.gather(*self._dispatches, return_exceptions=True)
+
+    async def dispatch(self, event: ChangeEvent) -> None:
+        for callback in self._subscribers.get(event.entity, ()):
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("change feed subscriber failed on %s", event)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            event = ChangeEvent.from_payload(payload)
+        except (ValueError, KeyError):
+            logger.warning("change feed: malformed payload %r", payload)
+            return
+        task = asyncio.get_running_loop().create_task(self.dispatch(event))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatch_done)
+
+    def _dispatch_done(self, task: asyncio.Task) -> None:
+        self._dispatches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("change feed dispatch failed", exc_info=task.exception())
+
+    async def _resync_all(self) -> None:
+        for entity in list(self._subscribers):
+            await self.dispatch(ChangeEvent(entity))
+
+    async def _run(self) -> None:
+        backoff = self.min_backoff
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                logger.info("change feed: listening on %s", self.channel)
+                backoff = self.min_backoff
+                await self._resync_all()
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.ping_interval)
+                    except asyncio.TimeoutError:
+                        await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("change feed: connection failed (%s), retry in %.1fs", e, backoff)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
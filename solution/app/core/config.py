@@ -1,5 +1,6 @@
 from typing import Any, Literal, Optional
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -25,18 +26,109 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: Optional[str] = 'Version20'
     POSTGRES_DATABASE: Optional[str] = 'prod2'
 
+    # Один пул на процесс; API_WORKERS — сколько процессов uvicorn (--workers) делят max_connections
+    API_WORKERS: int = 1
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_CONNECT_TIMEOUT: float = 5.0
+    DB_POOL_WARMUP: Optional[int] = None
+    DB_RESERVED_CONNECTIONS: int = 20
+    DB_READINESS_TIMEOUT: float = 1.0
+    DB_READINESS_MAX_SATURATION: float = 0.9
+
+    # Реплика для read-only маршрутов (статистика, GET клиентов, рекламодателей, кампаний); без хоста всё идёт в primary
+    POSTGRES_REPLICA_HOST: Optional[str] = None
+    POSTGRES_REPLICA_PORT: Optional[int] = None
+    DB_REPLICA_POOL_SIZE: int = 20
+    DB_REPLICA_MAX_OVERFLOW: int = 10
+    REPLICA_MAX_STALENESS_SECONDS: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 1.0
+
+    CHANGE_FEED_ENABLED: bool = True
+    # Снимок активных кампаний для GET /ads перестраивается при записи; это — страховка от потерянных NOTIFY
+    CAMPAIGN_SNAPSHOT_MAX_AGE: float = 30.0
+    # Сколько самых населённых городов индекс аудитории отдаёт в метрику audience_clients
+    AUDIENCE_METRICS_TOP_LOCATIONS: int = 30
+
+    SQL_DEBUG_HEADERS: bool = False
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_SLOW_QUERY_EXPLAIN: bool = False
+
     GPT_BASE: Optional[str] = 'REDACTED'
     GPT_API_KEY: Optional[str] = 'REDACTED'
     MODERATE_ADS: Optional[bool] = True
+    MODERATION_BLOCKLIST: list[str] = []
+    MODERATION_ALLOWLIST: list[str] = []
+    MODERATION_BLOCKLIST_FILE: Optional[str] = None
+    MODERATION_ALLOWLIST_FILE: Optional[str] = None
+    MODERATION_ACCEPT_COVERAGE: float = 1.0
 
     AWS_KEY_ID: Optional[str] = 'REDACTED'
     AWS_ACCESS_KEY: Optional[str] = 'REDACTED'
     AWS_ENDPOINT_URL: Optional[str] = 'REDACTED'
+    STORAGE_BACKEND: Literal["s3", "local"] = "s3"
+    STORAGE_PUBLIC_URL: str = "https://prodkekz.storage.yandexcloud.net/files"
+    STORAGE_LOCAL_DIR: str = "media"
+    S3_BUCKET: str = "files"
+    S3_MULTIPART_PART_BYTES: int = 8 * 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_VARIANT_WIDTHS: list[int] = [320, 640, 1280]
+    IMAGE_FORMAT: Literal["webp", "jpeg"] = "webp"
+    IMAGE_QUALITY: int = 80
+    IMAGE_MAX_PIXELS: int = 40_000_000
+    IMAGE_WORKERS: int = 2
+
+    AD_EVENTS_PARTITION_DAYS: int = 7
+    AD_EVENTS_PARTITIONS_AHEAD: int = 2
+    AD_EVENTS_RETENTION_DAYS: Optional[int] = None
+    AD_EVENTS_ARCHIVE_DIR: str = "archive"
 
     BOT_TOKEN: Optional[str] = 'REDACTED'
+    BOT_API_BASE_URL: str = 'http://backend:8080'
+    BOT_DB_POOL_SIZE: int = 10
+    BOT_DB_MAX_OVERFLOW: int = 5
+    BOT_API_CONNECTION_LIMIT: int = 100
+    BOT_API_CONNECTION_LIMIT_PER_HOST: int = 50
+    BOT_API_TIMEOUT: float = 10.0
+    BOT_API_CONNECT_TIMEOUT: float = 3.0
+    BOT_API_KEEPALIVE_TIMEOUT: float = 30.0
+    BOT_API_RETRIES: int = 3
+    BOT_API_RETRY_BACKOFF: float = 0.2
+    BOT_CHART_WORKERS: int = 2
+    BOT_CHART_MAX_PENDING: int = 4
+    BOT_CHART_CACHE_SIZE: int = 256
+    BOT_FSM_STORAGE: Literal["memory", "redis", "postgres"] = "memory"
+    BOT_FSM_TTL_SECONDS: int = 7 * 24 * 3600
+    BOT_FSM_FLUSH_INTERVAL: float = 0.05
+    BOT_FSM_REDIS_DB: int = 0
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    BOT_WEBHOOK_URL: Optional[str] = None
+    BOT_WEBHOOK_PATH: str = "/webhook"
+    BOT_WEBHOOK_SECRET: Optional[str] = None
+    BOT_WEBHOOK_HOST: str = "0.0.0.0"
+    BOT_WEBHOOK_PORT: int = 8081
+    BOT_UPDATE_WORKERS: int = 16
+    BOT_UPDATE_QUEUE_SIZE: int = 1000
+    BOT_USER_CACHE_TTL: float = 60.0
+    BOT_USER_CACHE_SIZE: int = 10000
+    BOT_NOTIFICATIONS_ENABLED: bool = True
+    BOT_NOTIFY_GLOBAL_RATE: float = 25.0
+    BOT_NOTIFY_PER_CHAT_RATE: float = 1.0
+    BOT_NOTIFY_BATCH_SIZE: int = 100
+    BOT_NOTIFY_POLL_INTERVAL: float = 5.0
+    BOT_NOTIFY_MAX_ATTEMPTS: int = 5
 
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
+    @model_validator(mode="after")
+    def _check_bot_webhook(self) -> "Settings":
+        if self.BOT_MODE == "webhook" and not self.BOT_WEBHOOK_URL:
+            raise ValueError("BOT_MODE=webhook требует BOT_WEBHOOK_URL: публичный адрес, "
+                             "на который Telegram будет слать апдейты")
+        return self
+
     class Config:
         extra = "allow"
 
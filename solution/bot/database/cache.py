@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from bot.database.models.models import BotUser
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Снимок BotUser, который безопасно отдавать из кеша между апдейтами."""
+
+    user_id: int
+    advertiser_id: Optional[object]
+    advertiser_name: Optional[str]
+
+    @classmethod
+    def from_model(cls, user: BotUser) -> "CachedUser":
+        return cls(user_id=user.user_id, advertiser_id=user.advertiser_id, advertiser_name=user.advertiser_name)
+
+
+class UserCache:
+    """
+    TTL-кеш привязки пользователя Telegram к рекламодателю (LRU по max_size).
+    Кеш локален для процесса: изменения с других воркеров видны не позже, чем через ttl.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._items: OrderedDict = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        item = self._items.get(user_id)
+        if item is None:
+            return None
+        expires_at, user = item
+        if expires_at <= self._clock():
+            del self._items[user_id]
+            return None
+        self._items.move_to_end(user_id)
+        return user
+
+    def put(self, user: CachedUser) -> None:
+        self._items[user.user_id] = (self._clock() + self.ttl, user)
+        self._items.move_to_end(user.user_id)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._items.pop(user_id, None)
@@ -10,9 +10,9 @@ from sqlalchemy import (
     ForeignKey,
     Text,
     Enum,
-    Float, TIMESTAMP, func, BigInteger, Boolean,
+    Float, TIMESTAMP, func, BigInteger, Boolean, Identity, Index, text,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -79,6 +79,9 @@ class Campaign(Base):
     cost_per_click = Column(Float, nullable=False, index=True)
     ad_title = Column(String, nullable=False)
     ad_photo_url = Column(String)
+    ad_photo_variants = Column(JSONB, nullable=True)
+    # День первого показа: раньше него событий кампании нет — граница для отсечения партиций
+    first_event_day = Column(Integer, nullable=True)
     ad_text = Column(Text, nullable=False)
     start_date = Column(Integer, nullable=False, index=True)
     end_date = Column(Integer, nullable=False, index=True)
@@ -105,17 +108,39 @@ class Campaign(Base):
 
 class AdEvent(Base):
     __tablename__ = "ad_events"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.campaign_id"), nullable=False, index=True)
+    __table_args__ = (
+        # Один индекс на все чтения по кампании: проверка «уже показывали», count(DISTINCT client_id)
+        # для лимитов и статистики, дневная статистика — всё без чтения таблицы. Ключ партиционирования
+        # обязан входить в уникальный индекс, поэтому повтор события запрещён в пределах партиции.
+        Index("uq_ad_events_campaign_type_client_day", "campaign_id", "event_type", "client_id", "event_day",
+              unique=True),
+        # Партиции и их архивация — api/database/partitions.py
+        {"postgresql_partition_by": "RANGE (event_day)"},
+    )
+
+    # Порядок колонок — по выравниванию: сначала 8-байтовые, затем uuid, затем 4-байтовые
+    id = Column(BigInteger, Identity(), primary_key=True)
+    event_timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.campaign_id"), nullable=False)
+    # События клиента при подборе объявления; он же нужен внешнему ключу при удалении клиентов
     client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=False, index=True)
-    event_type = Column(Enum(AdEventTypeEnum), nullable=False, index=True)
-    event_timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    event_day = Column(Integer, primary_key=True)
+    event_type = Column(Enum(AdEventTypeEnum), nullable=False)
 
     campaign = relationship("Campaign", back_populates="ad_events")
     client = relationship("Client", back_populates="ad_events")
 
 
+class AdEventRollup(Base):
+    # Дневные итоги архивированных партиций ad_events; статистика складывает их с живыми событиями
+    __tablename__ = "ad_event_rollups"
+
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.campaign_id"), primary_key=True)
+    event_day = Column(Integer, primary_key=True)
+    event_type = Column(Enum(AdEventTypeEnum), primary_key=True)
+    events = Column(Integer, nullable=False)
+
+
 class SystemTime(Base):
     __tablename__ = "system_time"
 
@@ -126,7 +151,39 @@ class SystemTime(Base):
 class BotUser(Base):
     __tablename__ = "bot_users"
 
-    user_id = Column(BigInteger, primary_key=True, unique=True)
+    user_id = Column(BigInteger, primary_key=True)
     date = Column(TIMESTAMP(timezone=True), default=func.now())
     advertiser_id = Column(UUID(as_uuid=True), ForeignKey("advertisers.advertiser_id"))
     advertiser_name = Column(String)
+
+
+class BotFSMState(Base):
+    __tablename__ = "bot_fsm_states"
+
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(JSONB, nullable=False, server_default="{}")
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=True, index=True)
+
+
+class BotNotification(Base):
+    __tablename__ = "bot_notifications"
+    __table_args__ = (
+        # Одинаковые неотправленные уведомления одному чату схлопываются в одну строку
+        Index("uq_bot_notifications_pending", "chat_id", "dedupe_key", unique=True,
+              postgresql_where=text("status = 'pending'")),
+        Index("ix_bot_notifications_due", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False)
+    kind = Column(String(32), nullable=False)
+    dedupe_key = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, server_default="pending")
+    coalesced = Column(Integer, nullable=False, server_default="0")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -1,20 +1,51 @@
-from typing import Union, Type, Any
+from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
+from bot.database.cache import CachedUser, UserCache
 from bot.database.models.models import *
+from bot.utils.metrics import BOT_DB_SESSIONS_OPENED_TOTAL, BOT_USER_CACHE_REQUESTS_TOTAL
 
 
 class Repo:
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    """Сессия открывается при первом обращении к БД и закрывается в close()."""
 
-    async def get_user(self, user_id: int) -> Union[Type[BotUser], None]:
-        return await self.session.get(BotUser, user_id)
+    def __init__(self, sessionmaker: sessionmaker, user_cache: Optional[UserCache] = None):
+        self.sessionmaker = sessionmaker
+        self.user_cache = user_cache
+        self._session: Optional[AsyncSession] = None
 
-    async def create_user(self, user_id: int) -> Type[BotUser] | Any:
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self.sessionmaker()
+            BOT_DB_SESSIONS_OPENED_TOTAL.inc()
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_user(self, user_id: int) -> Optional[CachedUser]:
+        if self.user_cache is not None:
+            cached = self.user_cache.get(user_id)
+            BOT_USER_CACHE_REQUESTS_TOTAL.labels(result="hit" if cached else "miss").inc()
+            if cached is not None:
+                return cached
+
+        user = await self.session.get(BotUser, user_id)
+        if user is None:
+            return None
+        snapshot = CachedUser.from_model(user)
+        if self.user_cache is not None:
+            self.user_cache.put(snapshot)
+        return snapshot
+
+    async def create_user(self, user_id: int) -> CachedUser:
         existing_user = await self.get_user(user_id)
 
         if existing_user:
@@ -28,14 +59,24 @@ class Repo:
         except IntegrityError:
             await self.session.rollback()
 
-        return user
+        return CachedUser(user_id=user_id, advertiser_id=None, advertiser_name=None)
 
-    async def get_campaign_count_by_advertiser_id(self, advertiser_id: str) -> int:
-        stmt = (
-            select(func.count())
-            .select_from(Campaign)
-            .where(Campaign.advertiser_id == advertiser_id)
-            .where(Campaign.is_deleted == False)
-        )
+    async def set_advertiser(self, user_id: int, advertiser_id, advertiser_name: Optional[str]) -> CachedUser:
+        """Привязывает (или отвязывает при None) рекламодателя и сбрасывает кеш пользователя."""
+        values = {"advertiser_id": advertiser_id, "advertiser_name": advertiser_name}
+        stmt = update(BotUser).where(BotUser.user_id == user_id).values(**values)
         result = await self.session.execute(stmt)
-        return result.scalar_one() or 0
\ No newline at end of file
+        if result.rowcount == 0:
+            # Строки пользователя нет (удалена, /start пропущен) — создаём, иначе привязка молча потеряется
+            self.session.add(BotUser(user_id=user_id, **values))
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # Строку параллельно создал /start — достаточно обновить её
+            await self.session.rollback()
+            await self.session.execute(stmt)
+            await self.session.commit()
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id)
+        return CachedUser(user_id=user_id, advertiser_id=advertiser_id, advertiser_name=advertiser_name)
+
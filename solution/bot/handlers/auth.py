@@ -39,10 +39,7 @@ async def callback_auth(callback: CallbackQuery,
                         repo: Repo,
                         state: FSMContext):
     await callback.answer('Вы вышли из системы', show_alert=True)
-    user = await repo.get_user(user_id=callback.from_user.id)
-    user.advertiser_id = None
-    user.advertiser_name = None
-    await repo.session.commit()
+    user = await repo.set_advertiser(callback.from_user.id, advertiser_id=None, advertiser_name=None)
     await callback.message.edit_text("""⚡️ <b>PROD ADS – инновационная рекламная платформа,
     которая изменит ваше представление о конверсиях раз и навсегда.</b>
 
@@ -73,11 +70,9 @@ async def message_uuid_auth(message: Message, repo: Repo,
             await message.answer(f"❌ Возникла неизвестная ошибка", reply_markup=back_keyboard())
             return
         else:
-            user = await repo.get_user(user_id=message.from_user.id)
             print(advertiser)
-            user.advertiser_id = advertiser.advertiser_id
-            user.advertiser_name = advertiser.name
-            await repo.session.commit()
+            user = await repo.set_advertiser(message.from_user.id, advertiser_id=advertiser.advertiser_id,
+                                             advertiser_name=advertiser.name)
             await message.answer(f"✅ Вы успешно вошли в систему как {advertiser.name}")
             await message.answer("""⚡️ <b>PROD ADS – инновационная рекламная платформа,
 которая изменит ваше представление о конверсиях раз и навсегда.</b>
@@ -101,11 +96,8 @@ async def message_uuid_auth(message: Message, repo: Repo,
             await message.answer(f"❌ Возникла неизвестная ошибка", reply_markup=back_keyboard())
             return
         else:
-            user = await repo.get_user(user_id=message.from_user.id)
             print(advertiser)
-            user.advertiser_id = adv_id
-            user.advertiser_name = name
-            await repo.session.commit()
+            user = await repo.set_advertiser(message.from_user.id, advertiser_id=adv_id, advertiser_name=name)
             await message.answer(f"✅ Вы успешно вошли в систему как {advertiser.name}")
             await message.answer("""⚡️ <b>PROD ADS – инновационная рекламная платформа,
 которая изменит ваше представление о конверсиях раз и навсегда.</b>
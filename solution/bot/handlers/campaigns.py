@@ -1,17 +1,14 @@
-import io
+import mimetypes
 import os
 import traceback
 from datetime import datetime
 
 import aiohttp
-import matplotlib.pyplot as plt
-import numpy as np
 from aiogram import Router, F
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message, FSInputFile, InputFile, BufferedInputFile
 
-from api.utils.upload_file import upload_cdn_fileobj
 from bot.database import Repo
 from bot.keyboards.back import campaign_back_keyboard, back_keyboard
 from bot.keyboards.campaigns import get_navigation_keyboard, CampaignPageCallbackData, CampaignCallbackData, \
@@ -20,6 +17,7 @@ from bot.states.auth import AuthState
 from bot.states.campaign_edit import CampaignEditState
 from bot.utils.api_sdk import AdvertisingPlatformClient, CampaignUpdate, CampaignResponse
 from bot.utils.campaigns import PARAM_EDIT_INSTRUCTIONS, VALIDATION_MESSAGES, format_campaign_message, get_param_name
+from bot.utils.charts import ChartRenderer
 
 campaigns_router = Router()
 
@@ -30,17 +28,16 @@ async def callback_auth(callback: CallbackQuery,
                         state: FSMContext, api_client: AdvertisingPlatformClient):
     await callback.answer()
     user = await repo.get_user(user_id=callback.from_user.id)
-    cmpg_count = await repo.get_campaign_count_by_advertiser_id(user.advertiser_id)
     async with api_client as client:
-        campaigns = await client.list_campaigns(user.advertiser_id)
+        campaigns = await client.list_campaigns_page(user.advertiser_id)
 
     await callback.message.edit_text(
         f"""
 <b>🪙  Рекламные кампании</b>
 
-Найдено кампаний: {cmpg_count}
+Найдено кампаний: {campaigns.total}
 """,
-        reply_markup=get_navigation_keyboard(0, cmpg_count, campaigns)
+        reply_markup=get_navigation_keyboard(0, campaigns.total, campaigns.items)
     )
     await state.set_state(AuthState.waiting_for_uuid)
 
@@ -85,17 +82,16 @@ async def callback_auth(callback: CallbackQuery,
     await callback.answer()
     offset = callback_data.offset
     user = await repo.get_user(user_id=callback.from_user.id)
-    cmpg_count = await repo.get_campaign_count_by_advertiser_id(user.advertiser_id)
     async with api_client as client:
-        campaigns = await client.list_campaigns(user.advertiser_id, page=offset + 1)
+        campaigns = await client.list_campaigns_page(user.advertiser_id, page=offset + 1)
 
     await callback.message.edit_text(
         f"""
 <b>🪙  Рекламные кампании</b>
 
-Найдено кампаний: {cmpg_count}
+Найдено кампаний: {campaigns.total}
 """,
-        reply_markup=get_navigation_keyboard(offset, cmpg_count, campaigns)
+        reply_markup=get_navigation_keyboard(offset, campaigns.total, campaigns.items)
     )
     await state.set_state(AuthState.waiting_for_uuid)
 
@@ -237,15 +233,11 @@ async def process_campaign_edit_value(
 
     try:
         async with api_client as client:
-            await client.update_campaign(
+            updated_campaign = await client.update_campaign(
                 advertiser_id=user.advertiser_id,
                 campaign_id=campaign_id,
                 data=CampaignUpdate.model_validate(update_data)
             )
-            updated_campaign = await client.get_campaign(
-                advertiser_id=user.advertiser_id,
-                campaign_id=campaign_id
-            )
     except Exception as e:
         print(traceback.format_exc())
         await message.answer("❌ Ошибка при обновлении кампании",
@@ -278,10 +270,13 @@ async def process_campaign_edit_photo(message: Message, state: FSMContext, repo:
 
     file_extension = os.path.splitext(file_info.file_path)[1].lstrip('.')
 
-    file_key = await upload_cdn_fileobj(downloaded_file, file_extension)
-    new_url = f"https://prodkekz.storage.yandexcloud.net/files/{file_key}"
+    async with api_client as client:
+        uploaded = await client.upload_photo_fileobj(
+            downloaded_file, f"photo.{file_extension}",
+            mimetypes.guess_type(file_info.file_path)[0] or "image/jpeg",
+        )
 
-    update_data = {"ad_photo_url": new_url}
+    update_data = {"ad_photo_url": uploaded.file_url}
 
     user = await repo.get_user(user_id=message.from_user.id)
     if not user or not user.advertiser_id:
@@ -292,15 +287,11 @@ async def process_campaign_edit_photo(message: Message, state: FSMContext, repo:
 
     try:
         async with api_client as client:
-            await client.update_campaign(
+            updated_campaign = await client.update_campaign(
                 advertiser_id=user.advertiser_id,
                 campaign_id=campaign_id,
                 data=CampaignUpdate.model_validate(update_data)
             )
-            updated_campaign = await client.get_campaign(
-                advertiser_id=user.advertiser_id,
-                campaign_id=campaign_id
-            )
     except Exception as e:
         await message.answer("❌ Ошибка при обновлении кампании",
                              reply_markup=campaign_back_keyboard(offset=offset, campaign_id=campaign_id))
@@ -321,7 +312,8 @@ async def campaign_stats_handler(
         callback_data: CampaignStatsCallbackData,
         repo: "Repo",
         state: "FSMContext",
-        api_client: "AdvertisingPlatformClient"
+        api_client: "AdvertisingPlatformClient",
+        chart_renderer: ChartRenderer
 ):
     await callback.answer()
     campaign_id = callback_data.campaign_id
@@ -330,11 +322,11 @@ async def campaign_stats_handler(
     user = await repo.get_user(user_id=callback.from_user.id)
     async with api_client as client:
         try:
-            aggregated_stats = await client.get_campaign_stats(campaign_id)
-            daily_stats = await client.get_campaign_daily_stats(campaign_id)
+            overview = await client.get_campaign_stats_overview(campaign_id)
         except Exception as e:
             await callback.message.answer("Ошибка при получении статистики кампании")
             return
+    aggregated_stats, daily_stats = overview.stats, overview.daily
 
     stats_text = f"""
 <b>📊 Статистика кампании</b>
@@ -349,36 +341,16 @@ ID: <code>{campaign_id}</code>
 └ Общие затраты: {aggregated_stats.spent_total:,.2f} ₽
 """
 
+    chart = None
     if daily_stats:
-        days = [ds.date for ds in daily_stats]
-        impressions = [ds.impressions_count for ds in daily_stats]
-        clicks = [ds.clicks_count for ds in daily_stats]
-
-        bar_width = 0.35
-        index = np.arange(len(days))
-        fig, ax = plt.subplots()
-        ax.bar(index, impressions, bar_width, label='Показы')
-        ax.bar(index + bar_width, clicks, bar_width, label='Клики')
-        ax.set_xlabel('День')
-        ax.set_ylabel('Количество')
-        ax.set_title('Дневная статистика')
-        ax.set_xticks(index + bar_width / 2)
-        ax.set_xticklabels([str(day) for day in days])
-        ax.legend()
-        plt.tight_layout()
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        buf.seek(0)
-        plt.close(fig)
-    else:
-        buf = None
+        chart = await chart_renderer.render(campaign_id, daily_stats)
+        if chart is None:
+            stats_text += "\n" + chart_renderer.text_fallback(daily_stats)
 
     back_markup = campaign_back_keyboard(campaign_id, offset)
 
-    if buf:
-        buf_value = buf.getvalue()
-        photo_input = BufferedInputFile(buf_value, filename="chart.png")
+    if chart:
+        photo_input = BufferedInputFile(chart, filename="chart.png")
         await callback.message.answer_photo(
             photo=photo_input,
             caption=stats_text,
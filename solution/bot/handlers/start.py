@@ -20,7 +20,7 @@ async def message_start(message: Message,
     user = await repo.get_user(user_id=from_user.id)
     if not user:
         try:
-            await repo.create_user(user_id=from_user.id)
+            user = await repo.create_user(user_id=from_user.id)
         except:
             pass
 
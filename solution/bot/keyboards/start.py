@@ -3,11 +3,11 @@ from typing import Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
-from bot.database.models import BotUser
+from bot.database.cache import CachedUser
 from bot.keyboards.campaigns import CampaignPageCallbackData
 
 
-def get_start_keyboard(user: BotUser) -> InlineKeyboardMarkup:
+def get_start_keyboard(user: CachedUser) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     if user.advertiser_id is not None:
         builder.row(InlineKeyboardButton(text="🪙 Рекламные кампании", callback_data=CampaignPageCallbackData(offset=0).pack()))
@@ -1,6 +1,4 @@
-import os
-import sys
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import Update
@@ -8,11 +6,13 @@ from aiogram.types import Update
 from sqlalchemy.orm import sessionmaker
 
 from bot.database import Repo
+from bot.database.cache import UserCache
 
 
 class DBMiddleware(BaseMiddleware):
-    def __init__(self, sessionmaker: sessionmaker) -> None:
+    def __init__(self, sessionmaker: sessionmaker, user_cache: Optional[UserCache] = None) -> None:
         self.sessionmaker = sessionmaker
+        self.user_cache = user_cache
 
     async def __call__(
             self,
@@ -20,6 +20,9 @@ class DBMiddleware(BaseMiddleware):
             event: Update,
             data: Dict[str, Any],
     ) -> Any:
-        async with self.sessionmaker() as session:
-            data["repo"] = Repo(session)
+        repo = Repo(self.sessionmaker, self.user_cache)
+        data["repo"] = repo
+        try:
             return await handler(event, data)
+        finally:
+            await repo.close()
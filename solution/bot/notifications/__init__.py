@@ -0,0 +1,6 @@
+__all__ = ["ChatRateLimiter", "NotificationSender", "OutboxMessage", "PostgresOutbox", "TokenBucket"]
+
+
+from bot.notifications.outbox import OutboxMessage, PostgresOutbox
+from bot.notifications.rate_limit import ChatRateLimiter, TokenBucket
+from bot.notifications.sender import NotificationSender
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from bot.database.models import BotNotification
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    id: int
+    chat_id: int
+    kind: str
+    body: str
+    attempts: int
+    coalesced: int
+    created_at: datetime
+
+
+class PostgresOutbox:
+    """
+    Таблица bot_notifications как очередь. claim() берёт пачку через
+    FOR UPDATE SKIP LOCKED и сдвигает next_attempt_at на lease секунд:
+    несколько воркеров бота не отправят одно сообщение дважды, а если воркер
+    упал посреди отправки, сообщение снова станет доступно после lease.
+    """
+
+    def __init__(self, sessionmaker: sessionmaker, lease: float = 60.0):
+        self.sessionmaker = sessionmaker
+        self.lease = lease
+
+    async def claim(self, limit: int) -> List[OutboxMessage]:
+        due = (
+            select(BotNotification.id)
+            .where(BotNotification.status == "pending", BotNotification.next_attempt_at <= func.now())
+            .order_by(BotNotification.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(BotNotification)
+            .where(BotNotification.id.in_(due.scalar_subquery()))
+            .values(
+                attempts=BotNotification.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=self.lease),
+            )
+            .returning(
+                BotNotification.id, BotNotification.chat_id, BotNotification.kind, BotNotification.body,
+                BotNotification.attempts, BotNotification.coalesced, BotNotification.created_at,
+            )
+        )
+        async with self.sessionmaker() as session:
+            rows = (await session.execute(stmt)).all()
+            await session.commit()
+        return sorted((OutboxMessage(*row) for row in rows), key=lambda message: message.id)
+
+    async def _update(self, ids: Sequence[int], **values) -> None:
+        if not ids:
+            return
+        async with self.sessionmaker() as session:
+            await session.execute(update(BotNotification).where(BotNotification.id.in_(ids)).values(**values))
+            await session.commit()
+
+    async def mark_sent(self, ids: Sequence[int]) -> None:
+        await self._update(ids, status="sent", sent_at=func.now())
+
+    async def defer(self, ids: Sequence[int], delay: float) -> None:
+        """Возвращает сообщения в очередь, не засчитывая попытку (упёрлись в лимит частоты)."""
+        await self._update(
+            ids,
+            attempts=BotNotification.attempts - 1,
+            next_attempt_at=func.now() + timedelta(seconds=delay),
+        )
+
+    async def retry(self, message_id: int, delay: float, error: str) -> None:
+        await self._update([message_id], next_attempt_at=func.now() + timedelta(seconds=delay), last_error=error)
+
+    async def fail(self, message_id: int, error: str) -> None:
+        await self._update([message_id], status="failed", last_error=error)
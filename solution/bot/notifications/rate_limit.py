@@ -0,0 +1,48 @@
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Забирает токен и возвращает 0, либо возвращает, сколько ждать до следующего токена."""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class ChatRateLimiter:
+    """Отдельный bucket на каждый чат; давно неактивные чаты вытесняются по LRU."""
+
+    def __init__(self, rate: float, capacity: float, max_chats: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_chats = max_chats
+        self._clock = clock
+        self._buckets: OrderedDict = OrderedDict()
+
+    def try_acquire(self, chat_id: int) -> float:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.rate, self.capacity, self._clock)
+            if len(self._buckets) > self.max_chats:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(chat_id)
+        return bucket.try_acquire()
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from bot.notifications.outbox import OutboxMessage, PostgresOutbox
+from bot.notifications.rate_limit import ChatRateLimiter, TokenBucket
+from bot.utils.metrics import (
+    BOT_NOTIFICATION_DELIVERY_SECONDS,
+    BOT_NOTIFICATION_THROTTLE_SECONDS,
+    BOT_NOTIFICATIONS_COALESCED_TOTAL,
+    BOT_NOTIFICATIONS_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationSender:
+    """
+    Разбирает outbox и отправляет уведомления с учётом лимитов Telegram:
+    общий token bucket на бота и отдельный на каждый чат. Сообщение в чат,
+    который упёрся в свой лимит, откладывается без траты попытки, остальные
+    чаты при этом не ждут. Доставка «хотя бы один раз»: если отметить отправку
+    не удалось, сообщение уйдёт повторно после lease.
+    """
+
+    def __init__(self, bot: Bot, outbox: PostgresOutbox,
+                 global_rate: float = 25.0, global_burst: float = 5.0,
+                 per_chat_rate: float = 1.0, per_chat_burst: float = 1.0,
+                 batch_size: int = 100, poll_interval: float = 5.0,
+                 max_attempts: int = 5, retry_backoff: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.bot = bot
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.chat_delay = 1 / per_chat_rate
+        self._global = TokenBucket(global_rate, global_burst, clock)
+        self._chats = ChatRateLimiter(per_chat_rate, per_chat_burst, clock=clock)
+        self._sleep = sleep
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._throttled = 0
+
+    def wake(self, *_) -> None:
+        self._wakeup.set()
+
+    async def _acquire_global(self) -> None:
+        wait = self._global.try_acquire()
+        while wait > 0:
+            BOT_NOTIFICATION_THROTTLE_SECONDS.observe(wait)
+            await self._sleep(wait)
+            wait = self._global.try_acquire()
+
+    def _record(self, message: OutboxMessage, result: str) -> None:
+        BOT_NOTIFICATIONS_TOTAL.labels(kind=message.kind, result=result).inc()
+        if result == "sent":
+            BOT_NOTIFICATIONS_COALESCED_TOTAL.labels(kind=message.kind).inc(message.coalesced)
+            lag = (datetime.now(timezone.utc) - message.created_at).total_seconds()
+            BOT_NOTIFICATION_DELIVERY_SECONDS.labels(kind=message.kind).observe(max(lag, 0.0))
+
+    async def run_once(self) -> int:
+        """Отправляет одну пачку из outbox и возвращает, сколько сообщений было взято."""
+        messages = await self.outbox.claim(self.batch_size)
+        sent: List[int] = []
+        throttled: List[int] = []
+        flood_wait = 0.0
+        try:
+            for i, message in enumerate(messages):
+                if self._chats.try_acquire(message.chat_id) > 0:
+                    throttled.append(message.id)
+                    self._record(message, "throttled")
+                    continue
+
+                await self._acquire_global()
+                try:
+                    await self.bot.send_message(message.chat_id, message.body)
+                except TelegramRetryAfter as e:
+                    flood_wait = e.retry_after
+                    await self.outbox.defer([m.id for m in messages[i:]], flood_wait)
+                    self._record(message, "flood_wait")
+                    break
+                except (TelegramForbiddenError, TelegramBadRequest) as e:
+                    await self.outbox.fail(message.id, str(e))
+                    self._record(message, "failed")
+                except Exception as e:
+                    if message.attempts >= self.max_attempts:
+                        await self.outbox.fail(message.id, str(e))
+                        self._record(message, "failed")
+                    else:
+                        delay = self.retry_backoff * 2 ** (message.attempts - 1)
+                        await self.outbox.retry(message.id, delay, str(e))
+                        self._record(message, "retry")
+                else:
+                    sent.append(message.id)
+                    self._record(message, "sent")
+        finally:
+            await self.outbox.mark_sent(sent)
+            await self.outbox.defer(throttled, self.chat_delay)
+
+        self._throttled = len(throttled)
+        if flood_wait:
+            logger.warning("Telegram flood control, notifications paused for %ss", flood_wait)
+            await self._sleep(flood_wait)
+        return len(messages)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification sender failed")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            timeout = min(self.poll_interval, self.chat_delay) if self._throttled else self.poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="notification-sender")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,31 @@
+__all__ = ["BatchingStorage", "PostgresStorage", "create_fsm_storage"]
+
+
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from bot.storage.batching import BatchingStorage
+from bot.storage.postgres import PostgresStorage
+
+
+def create_fsm_storage(sessionmaker: sessionmaker) -> BaseStorage:
+    """Хранилище FSM по BOT_FSM_STORAGE: memory (один процесс), redis или postgres."""
+    if settings.BOT_FSM_STORAGE == "memory":
+        return MemoryStorage()
+
+    key_builder = DefaultKeyBuilder(with_destiny=True)
+    if settings.BOT_FSM_STORAGE == "redis":
+        from bot.storage.redis_storage import BatchedRedisStorage
+
+        backend = BatchedRedisStorage.from_url(
+            f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.BOT_FSM_REDIS_DB}",
+            key_builder=key_builder,
+            state_ttl=settings.BOT_FSM_TTL_SECONDS,
+            data_ttl=settings.BOT_FSM_TTL_SECONDS,
+        )
+    else:
+        backend = PostgresStorage(sessionmaker, ttl=settings.BOT_FSM_TTL_SECONDS, key_builder=key_builder)
+
+    return BatchingStorage(backend, flush_interval=settings.BOT_FSM_FLUSH_INTERVAL)
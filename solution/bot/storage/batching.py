@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+UNSET: Any = object()
+
+
+@dataclass
+class PendingWrite:
+    """Отложенная запись одного ключа; поля со значением UNSET не менялись."""
+
+    key: StorageKey
+    state: Any = UNSET
+    data: Any = UNSET
+
+
+class BatchingStorage(BaseStorage):
+    """
+    Обёртка над хранилищем FSM, которая копит записи и сбрасывает их пачкой
+    раз в flush_interval (или сразу, когда накопилось max_batch ключей).
+    Несколько записей одного ключа между сбросами схлопываются в одну.
+    Чтения сначала смотрят в ещё не записанные изменения, поэтому воркер
+    всегда видит свои записи. Бэкенд с методом write_many(records) получает
+    пачку целиком, иначе записи уходят по одной через set_state/set_data.
+    """
+
+    def __init__(self, backend: BaseStorage, flush_interval: float = 0.05, max_batch: int = 500):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: Dict[StorageKey, PendingWrite] = {}
+        self._inflight: Dict[StorageKey, PendingWrite] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def _entry(self, key: StorageKey) -> PendingWrite:
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = PendingWrite(key)
+        return entry
+
+    def _schedule(self) -> None:
+        if self._closed:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def _lookup(self, key: StorageKey, field: str) -> Any:
+        for source in (self._pending, self._inflight):
+            entry = source.get(key)
+            if entry is not None and getattr(entry, field) is not UNSET:
+                return getattr(entry, field)
+        return UNSET
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._entry(key).state = state.state if isinstance(state, State) else state
+        self._schedule()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state = self._lookup(key, "state")
+        if state is UNSET:
+            return await self.backend.get_state(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        self._entry(key).data = data.copy()
+        self._schedule()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = self._lookup(key, "data")
+        if data is UNSET:
+            return await self.backend.get_data(key)
+        return data.copy()
+
+    async def _write(self, records: List[PendingWrite]) -> None:
+        write_many = getattr(self.backend, "write_many", None)
+        if write_many is not None:
+            await write_many(records)
+            return
+        for record in records:
+            if record.state is not UNSET:
+                await self.backend.set_state(record.key, record.state)
+            if record.data is not UNSET:
+                await self.backend.set_data(record.key, record.data)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            try:
+                await self._write(list(self._inflight.values()))
+            except BaseException:
+                logger.exception("FSM storage flush failed, %d keys re-queued", len(self._inflight))
+                # Более свежие записи из _pending важнее неудавшихся
+                for key, failed in self._inflight.items():
+                    entry = self._entry(key)
+                    if entry.state is UNSET:
+                        entry.state = failed.state
+                    if entry.data is UNSET:
+                        entry.data = failed.data
+                raise
+            finally:
+                self._inflight = {}
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(self.flush_interval)
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        finally:
+            await self.backend.close()
@@ -0,0 +1,96 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import case, delete, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import sessionmaker
+
+from bot.database.models import BotFSMState
+from bot.storage.batching import UNSET, PendingWrite
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM в таблице bot_fsm_states: общее состояние для всех воркеров бота.
+    Каждая запись продлевает expires_at на ttl; просроченные строки не читаются
+    и раз в purge_interval удаляются при очередной записи.
+    """
+
+    def __init__(self, sessionmaker: sessionmaker, ttl: Optional[float] = None,
+                 key_builder: Optional[KeyBuilder] = None, purge_interval: float = 300.0):
+        self.sessionmaker = sessionmaker
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+
+    def _expires_at(self) -> Optional[datetime]:
+        if not self.ttl:
+            return None
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    async def _get_row(self, key: StorageKey) -> Optional[BotFSMState]:
+        async with self.sessionmaker() as session:
+            return await session.scalar(
+                select(BotFSMState).where(
+                    BotFSMState.key == self.key_builder.build(key),
+                    or_(BotFSMState.expires_at.is_(None), BotFSMState.expires_at > datetime.now(timezone.utc)),
+                )
+            )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self.write_many([PendingWrite(key, state=state.state if isinstance(state, State) else state)])
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        row = await self._get_row(key)
+        return row.state if row is not None else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self.write_many([PendingWrite(key, data=data)])
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        row = await self._get_row(key)
+        return dict(row.data) if row is not None and row.data else {}
+
+    def _upsert(self, rows: List[dict], columns: Iterable[str]):
+        stmt = insert(BotFSMState).values(rows)
+        set_ = {column: stmt.excluded[column] for column in (*columns, "expires_at")}
+        # Строка просрочена, но ещё не удалена: незаписанное поле не должно ожить с новым expires_at
+        expired = BotFSMState.expires_at <= datetime.now(timezone.utc)
+        if "state" not in set_:
+            set_["state"] = case((expired, None), else_=BotFSMState.state)
+        if "data" not in set_:
+            set_["data"] = case((expired, literal({}, BotFSMState.data.type)), else_=BotFSMState.data)
+        return stmt.on_conflict_do_update(index_elements=[BotFSMState.key], set_=set_)
+
+    async def write_many(self, records: List[PendingWrite]) -> None:
+        """Пишет пачку: по одному upsert на каждый набор изменённых полей."""
+        expires_at = self._expires_at()
+        groups: Dict[tuple, List[dict]] = {}
+        for record in records:
+            row = {"key": self.key_builder.build(record.key), "expires_at": expires_at}
+            columns = []
+            if record.state is not UNSET:
+                row["state"] = record.state
+                columns.append("state")
+            if record.data is not UNSET:
+                row["data"] = record.data
+                columns.append("data")
+            if columns:
+                groups.setdefault(tuple(columns), []).append(row)
+
+        async with self.sessionmaker() as session:
+            for columns, rows in groups.items():
+                await session.execute(self._upsert(rows, columns))
+            if self.ttl and time.monotonic() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.monotonic()
+                await session.execute(
+                    delete(BotFSMState).where(BotFSMState.expires_at <= datetime.now(timezone.utc))
+                )
+            await session.commit()
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,26 @@
+from typing import List
+
+from aiogram.fsm.storage.redis import RedisStorage
+
+from bot.storage.batching import UNSET, PendingWrite
+
+
+class BatchedRedisStorage(RedisStorage):
+    """RedisStorage, который принимает пачку записей одним pipeline."""
+
+    async def write_many(self, records: List[PendingWrite]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for record in records:
+                if record.state is not UNSET:
+                    state_key = self.key_builder.build(record.key, "state")
+                    if record.state is None:
+                        pipe.delete(state_key)
+                    else:
+                        pipe.set(state_key, record.state, ex=self.state_ttl)
+                if record.data is not UNSET:
+                    data_key = self.key_builder.build(record.key, "data")
+                    if not record.data:
+                        pipe.delete(data_key)
+                    else:
+                        pipe.set(data_key, self.json_dumps(record.data), ex=self.data_ttl)
+            await pipe.execute()
@@ -1,6 +1,10 @@
+import asyncio
+import mimetypes
+import os
+
 import aiohttp
 from pydantic import BaseModel, validator, field_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 from sqlalchemy.util import await_only
@@ -20,6 +24,7 @@ class AdResponse(BaseModel):
     ad_title: str
     ad_text: str
     ad_photo_url: Optional[str]
+    ad_photo_variants: Optional[Dict[str, str]] = None
     advertiser_id: str
 
 
@@ -105,6 +110,7 @@ class CampaignResponse(BaseModel):
     ad_title: str
     ad_text: str
     ad_photo_url: Optional[str]
+    ad_photo_variants: Optional[Dict[str, str]] = None
     start_date: int
     end_date: int
 
@@ -117,6 +123,11 @@ class CampaignResponse(BaseModel):
     targeting: Targeting
 
 
+class CampaignPage(BaseModel):
+    total: int
+    items: List[CampaignResponse]
+
+
 class StatsResponse(BaseModel):
     impressions_count: int
     clicks_count: int
@@ -136,6 +147,11 @@ class DailyStatsResponse(BaseModel):
     date: int
 
 
+class CampaignStatsOverview(BaseModel):
+    stats: StatsResponse
+    daily: List[DailyStatsResponse]
+
+
 class MLScoreSchema(BaseModel):
     client_id: str
     advertiser_id: str
@@ -152,22 +168,55 @@ class TimeAdvanceResponse(BaseModel):
 
 class UploadResponse(BaseModel):
     file_url: str
+    variants: Dict[str, str] = {}
+    content_hash: Optional[str] = None
+    deduplicated: bool = False
 
 
 class AdvertisingPlatformClient:
-    def __init__(self, base_url: str):
+    """
+    Клиент API платформы с одним долгоживущим пулом keep-alive соединений.
+
+    Сессия создаётся в start() и закрывается в close() — их вызывает bot_cli.py
+    на старте и остановке бота. `async with client` оставлен для обратной
+    совместимости хендлеров и пул не закрывает.
+    """
+
+    RETRY_STATUSES = frozenset({502, 503, 504})
+
+    def __init__(self, base_url: str, limit: int = 100, limit_per_host: int = 50,
+                 timeout: float = 10.0, connect_timeout: float = 3.0,
+                 keepalive_timeout: float = 30.0, retries: int = 3, retry_backoff: float = 0.2):
         self.base_url = base_url.rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.keepalive_timeout = keepalive_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
         self._session: Optional[aiohttp.ClientSession] = None
 
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
     async def __aenter__(self):
-        if self._session is None:
-            self._session = aiohttp.ClientSession()
+        await self.start()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._session:
-            await self._session.close()
-            self._session = None
+        pass
 
     @property
     def session(self) -> aiohttp.ClientSession:
@@ -175,12 +224,27 @@ class AdvertisingPlatformClient:
             raise RuntimeError("Client session is not initialized.")
         return self._session
 
+    async def _get_json(self, url: str, params: Optional[dict] = None, retry: bool = True):
+        """GET с повтором и экспоненциальной задержкой на сетевых ошибках и 502/503/504."""
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                async with self.session.get(url, params=params) as resp:
+                    if resp.status in self.RETRY_STATUSES and not last:
+                        await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+                        continue
+                    resp.raise_for_status()
+                    return await resp.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last:
+                    raise
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
     async def get_client_by_id(self, client_id: str) -> ClientResponse:
         url = f"{self.base_url}/clients/{client_id}"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return ClientResponse(**data)
+        data = await self._get_json(url)
+        return ClientResponse(**data)
 
     async def upsert_clients(self, clients: List[ClientUpsert]) -> List[ClientResponse]:
         url = f"{self.base_url}/clients/bulk"
@@ -192,10 +256,8 @@ class AdvertisingPlatformClient:
 
     async def get_advertiser_by_id(self, advertiser_id: str) -> AdvertiserResponse:
         url = f"{self.base_url}/advertisers/{advertiser_id}"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return AdvertiserResponse(**data)
+        data = await self._get_json(url)
+        return AdvertiserResponse(**data)
 
     async def upsert_advertisers(self, advertisers: List[AdvertiserUpsert]) -> List[AdvertiserResponse]:
         url = f"{self.base_url}/advertisers/bulk"
@@ -215,10 +277,9 @@ class AdvertisingPlatformClient:
     async def get_ad_for_client(self, client_id: str) -> AdResponse:
         url = f"{self.base_url}/ads"
         params = {"client_id": client_id}
-        async with self.session.get(url, params=params) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return AdResponse(**data)
+        # показ фиксируется на сервере — без повторов
+        data = await self._get_json(url, params, retry=False)
+        return AdResponse(**data)
 
     async def record_ad_click(self, ad_id: str, request: AdClickRequest) -> None:
         url = f"{self.base_url}/ads/{ad_id}/click"
@@ -226,14 +287,18 @@ class AdvertisingPlatformClient:
             resp.raise_for_status()
 
     async def upload_photo(self, file_path: str) -> UploadResponse:
-        url = f"{self.base_url}/upload/photo"
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
         with open(file_path, "rb") as f:
-            form_data = aiohttp.FormData()
-            form_data.add_field("file", f, filename=file_path, content_type="application/octet-stream")
-            async with self.session.post(url, data=form_data) as resp:
-                resp.raise_for_status()
-                data = await resp.json()
-                return UploadResponse(**data)
+            return await self.upload_photo_fileobj(f, os.path.basename(file_path), content_type)
+
+    async def upload_photo_fileobj(self, fileobj, filename: str, content_type: str = "image/jpeg") -> UploadResponse:
+        url = f"{self.base_url}/upload/photo"
+        form_data = aiohttp.FormData()
+        form_data.add_field("file", fileobj, filename=filename, content_type=content_type)
+        async with self.session.post(url, data=form_data) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+            return UploadResponse(**data)
 
     async def create_campaign(self, advertiser_id: str, campaign_data: CampaignCreate,
                               generate_text: Optional[bool] = False) -> CampaignResponse:
@@ -249,18 +314,19 @@ class AdvertisingPlatformClient:
     async def list_campaigns(self, advertiser_id: str, page: int = 1, size: int = 10) -> List[CampaignResponse]:
         url = f"{self.base_url}/advertisers/{advertiser_id}/campaigns"
         params = {"page": page, "size": size}
-        async with self.session.get(url, params=params) as resp:
-            print(await resp.text())
-            resp.raise_for_status()
-            data = await resp.json()
-            return [CampaignResponse(**item) for item in data]
+        data = await self._get_json(url, params)
+        return [CampaignResponse(**item) for item in data]
+
+    async def list_campaigns_page(self, advertiser_id: str, page: int = 1, size: int = 10) -> CampaignPage:
+        url = f"{self.base_url}/advertisers/{advertiser_id}/campaigns/page"
+        params = {"page": page, "size": size}
+        data = await self._get_json(url, params)
+        return CampaignPage(**data)
 
     async def get_campaign(self, advertiser_id: str, campaign_id: str) -> CampaignResponse:
         url = f"{self.base_url}/advertisers/{advertiser_id}/campaigns/{campaign_id}"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return CampaignResponse(**data)
+        data = await self._get_json(url)
+        return CampaignResponse(**data)
 
     async def update_campaign(self, advertiser_id: str, campaign_id: str, data: CampaignUpdate) -> CampaignResponse:
         url = f"{self.base_url}/advertisers/{advertiser_id}/campaigns/{campaign_id}"
@@ -277,31 +343,28 @@ class AdvertisingPlatformClient:
 
     async def get_campaign_stats(self, campaign_id: str) -> StatsResponse:
         url = f"{self.base_url}/stats/campaigns/{campaign_id}"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return StatsResponse(**data)
+        data = await self._get_json(url)
+        return StatsResponse(**data)
+
+    async def get_campaign_stats_overview(self, campaign_id: str) -> CampaignStatsOverview:
+        url = f"{self.base_url}/stats/campaigns/{campaign_id}/overview"
+        data = await self._get_json(url)
+        return CampaignStatsOverview(**data)
 
     async def get_advertiser_campaigns_stats(self, advertiser_id: str) -> StatsResponse:
         url = f"{self.base_url}/stats/advertisers/{advertiser_id}/campaigns"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return StatsResponse(**data)
+        data = await self._get_json(url)
+        return StatsResponse(**data)
 
     async def get_campaign_daily_stats(self, campaign_id: str) -> List[DailyStatsResponse]:
         url = f"{self.base_url}/stats/campaigns/{campaign_id}/daily"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return [DailyStatsResponse(**item) for item in data]
+        data = await self._get_json(url)
+        return [DailyStatsResponse(**item) for item in data]
 
     async def get_advertiser_daily_stats(self, advertiser_id: str) -> List[DailyStatsResponse]:
         url = f"{self.base_url}/stats/advertisers/{advertiser_id}/campaigns/daily"
-        async with self.session.get(url) as resp:
-            resp.raise_for_status()
-            data = await resp.json()
-            return [DailyStatsResponse(**item) for item in data]
+        data = await self._get_json(url)
+        return [DailyStatsResponse(**item) for item in data]
 
     async def advance_day(self, request_data: TimeAdvanceRequest) -> TimeAdvanceResponse:
         url = f"{self.base_url}/time/advance"
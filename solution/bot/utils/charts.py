@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def render_daily_chart(days: Sequence[int], impressions: Sequence[int], clicks: Sequence[int]) -> bytes:
+    """Рисует столбчатую диаграмму по дням. Выполняется в отдельном процессе."""
+    import io
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    bar_width = 0.35
+    index = np.arange(len(days))
+    fig, ax = plt.subplots()
+    try:
+        ax.bar(index, impressions, bar_width, label='Показы')
+        ax.bar(index + bar_width, clicks, bar_width, label='Клики')
+        ax.set_xlabel('День')
+        ax.set_ylabel('Количество')
+        ax.set_title('Дневная статистика')
+        ax.set_xticks(index + bar_width / 2)
+        ax.set_xticklabels([str(day) for day in days])
+        ax.legend()
+        fig.tight_layout()
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png')
+        return buf.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def sparkline(values: Sequence[int]) -> str:
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_CHARS[0] * len(values)
+    scale = (len(SPARK_CHARS) - 1) / (high - low)
+    return "".join(SPARK_CHARS[round((v - low) * scale)] for v in values)
+
+
+def _series(daily_stats) -> Tuple[List[int], List[int], List[int]]:
+    days = [ds.date for ds in daily_stats]
+    impressions = [ds.impressions_count for ds in daily_stats]
+    clicks = [ds.clicks_count for ds in daily_stats]
+    return days, impressions, clicks
+
+
+class ChartRenderer:
+    """
+    Рендер графиков вне event loop: процессный пул, не больше max_pending
+    рендеров одновременно и LRU-кеш PNG по (campaign_id, последний день, хеш данных).
+    Если пул занят, render() возвращает None — вызывающий показывает спарклайн.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 4, cache_size: int = 256,
+                 executor: Optional[Executor] = None):
+        self._executor = executor
+        self._max_workers = max_workers
+        self._semaphore = asyncio.Semaphore(max_pending)
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @staticmethod
+    def cache_key(campaign_id: str, daily_stats) -> tuple:
+        days, impressions, clicks = _series(daily_stats)
+        digest = hashlib.blake2b(repr((days, impressions, clicks)).encode(), digest_size=16).hexdigest()
+        return campaign_id, days[-1] if days else None, digest
+
+    async def render(self, campaign_id: str, daily_stats) -> Optional[bytes]:
+        key = self.cache_key(campaign_id, daily_stats)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        if self._semaphore.locked():
+            return None
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self._get_executor(), render_daily_chart, *_series(daily_stats))
+
+        self._cache[key] = png
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return png
+
+    def text_fallback(self, daily_stats) -> str:
+        days, impressions, clicks = _series(daily_stats)
+        return (
+            f"<b>По дням ({days[0]}–{days[-1]}):</b>\n"
+            f"└ Показы: <code>{sparkline(impressions)}</code>\n"
+            f"└ Клики: <code>{sparkline(clicks)}</code>\n"
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
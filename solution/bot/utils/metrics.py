@@ -0,0 +1,67 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+BOT_UPDATE_QUEUE_DEPTH = Gauge(
+    "bot_update_queue_depth",
+    "Апдейты в очереди, ещё не взятые воркером",
+)
+
+BOT_UPDATES_IN_PROGRESS = Gauge(
+    "bot_updates_in_progress",
+    "Апдейты, которые сейчас обрабатываются",
+)
+
+BOT_UPDATE_QUEUE_WAIT_SECONDS = Histogram(
+    "bot_update_queue_wait_seconds",
+    "Время от приёма вебхука до начала обработки апдейта",
+    buckets=LATENCY_BUCKETS,
+)
+
+BOT_UPDATE_PROCESSING_SECONDS = Histogram(
+    "bot_update_processing_seconds",
+    "Время обработки апдейта диспетчером",
+    ["event_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+BOT_UPDATES_REJECTED_TOTAL = Counter(
+    "bot_updates_rejected_total",
+    "Апдейты, отклонённые из-за переполненной очереди",
+)
+
+BOT_DB_SESSIONS_OPENED_TOTAL = Counter(
+    "bot_db_sessions_opened_total",
+    "Сессии БД, реально открытые обработчиками апдейтов",
+)
+
+BOT_USER_CACHE_REQUESTS_TOTAL = Counter(
+    "bot_user_cache_requests_total",
+    "Обращения к кешу BotUser",
+    ["result"],
+)
+
+BOT_NOTIFICATIONS_TOTAL = Counter(
+    "bot_notifications_total",
+    "Исходы отправки уведомлений из outbox",
+    ["kind", "result"],
+)
+
+BOT_NOTIFICATIONS_COALESCED_TOTAL = Counter(
+    "bot_notifications_coalesced_total",
+    "Дубликаты уведомлений, схлопнутые в outbox до отправки",
+    ["kind"],
+)
+
+BOT_NOTIFICATION_DELIVERY_SECONDS = Histogram(
+    "bot_notification_delivery_seconds",
+    "Время от постановки уведомления в outbox до доставки",
+    ["kind"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+
+BOT_NOTIFICATION_THROTTLE_SECONDS = Histogram(
+    "bot_notification_throttle_seconds",
+    "Ожидание глобального лимита частоты перед отправкой",
+    buckets=LATENCY_BUCKETS,
+)
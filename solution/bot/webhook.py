@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from bot.utils.metrics import (
+    BOT_UPDATE_PROCESSING_SECONDS,
+    BOT_UPDATE_QUEUE_DEPTH,
+    BOT_UPDATE_QUEUE_WAIT_SECONDS,
+    BOT_UPDATES_IN_PROGRESS,
+    BOT_UPDATES_REJECTED_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def ordering_key(update: Update) -> int:
+    """Пользователь (или чат), чьи апдейты должны обрабатываться строго по порядку."""
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+class UpdateQueue:
+    """
+    Ограниченная очередь апдейтов с параллельной обработкой.
+    Апдейты раскладываются по шардам по ordering_key, у каждого шарда один воркер:
+    апдейты одного пользователя идут по порядку, разных — параллельно.
+    Если шард заполнен дольше put_timeout, put() возвращает False.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, workers: int = 16,
+                 max_size: int = 1000, put_timeout: float = 1.0):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.workers = workers
+        self.shard_size = max(1, max_size // workers)
+        self.put_timeout = put_timeout
+        self._shards: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def depth(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    async def start(self) -> None:
+        self._shards = [asyncio.Queue(maxsize=self.shard_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(shard)) for shard in self._shards]
+        BOT_UPDATE_QUEUE_DEPTH.set_function(self.depth)
+
+    async def put(self, update: Update) -> bool:
+        shard = self._shards[ordering_key(update) % self.workers]
+        try:
+            await asyncio.wait_for(shard.put((time.perf_counter(), update)), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            BOT_UPDATES_REJECTED_TOTAL.inc()
+            return False
+        return True
+
+    async def _worker(self, shard: asyncio.Queue) -> None:
+        while True:
+            enqueued, update = await shard.get()
+            started = time.perf_counter()
+            BOT_UPDATE_QUEUE_WAIT_SECONDS.observe(started - enqueued)
+            BOT_UPDATES_IN_PROGRESS.inc()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception:
+                logger.exception("Failed to process update %s", update.update_id)
+            finally:
+                BOT_UPDATES_IN_PROGRESS.dec()
+                BOT_UPDATE_PROCESSING_SECONDS.labels(event_type=update.event_type).observe(
+                    time.perf_counter() - started
+                )
+                shard.task_done()
+
+    async def join(self) -> None:
+        for shard in self._shards:
+            await shard.join()
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        try:
+            await asyncio.wait_for(self.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Update queue not drained, %d updates dropped", self.depth())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def create_webhook_app(queue: UpdateQueue, path: str = "/webhook", secret: Optional[str] = None) -> web.Application:
+    """
+    aiohttp-приложение вебхука. Апдейт подтверждается сразу после постановки в очередь;
+    при переполнении отвечаем 503, и Telegram доставит его повторно.
+    """
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        update = Update.model_validate(await request.json(), context={"bot": queue.bot})
+        if not await queue.put(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        response = web.Response(body=generate_latest())
+        response.headers["Content-Type"] = CONTENT_TYPE_LATEST
+        return response
+
+    async def on_startup(app: web.Application) -> None:
+        await queue.start()
+
+    async def on_cleanup(app: web.Application) -> None:
+        await queue.stop()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
@@ -3,20 +3,53 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
 
+from api.database.engine import DATABASE_URL, POSTGRES_DSN, Database
 from bot.middlewares import DBMiddleware
+from bot.notifications import NotificationSender, PostgresOutbox
 from bot.handlers import setup_routers
-from bot.database import load_sessionmaker
+from bot.database.cache import UserCache
+from bot.storage import create_fsm_storage
+from app.core.change_feed import ChangeEntity, ChangeFeedListener
 from app.core.config import settings
 from bot.utils.api_sdk import AdvertisingPlatformClient
+from bot.utils.charts import ChartRenderer
+from bot.webhook import UpdateQueue, create_webhook_app
 
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = (
-    f"postgresql+asyncpg://{settings.POSTGRES_USERNAME}:{settings.POSTGRES_PASSWORD}"
-    f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DATABASE}"
-)
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    await bot.delete_webhook()
+    await dp.start_polling(bot, allowed_updates=ALLOWED_UPDATES)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    queue = UpdateQueue(
+        dp, bot,
+        workers=settings.BOT_UPDATE_WORKERS,
+        max_size=settings.BOT_UPDATE_QUEUE_SIZE,
+    )
+    app = create_webhook_app(queue, path=settings.BOT_WEBHOOK_PATH, secret=settings.BOT_WEBHOOK_SECRET)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.BOT_WEBHOOK_HOST, settings.BOT_WEBHOOK_PORT).start()
+
+    try:
+        await dp.emit_startup(bot=bot)
+        await bot.set_webhook(
+            settings.BOT_WEBHOOK_URL.rstrip("/") + settings.BOT_WEBHOOK_PATH,
+            secret_token=settings.BOT_WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+        await asyncio.Event().wait()
+    finally:
+        # Сначала перестаём принимать апдейты и дорабатываем очередь (on_cleanup приложения), потом shutdown
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
 
 
 async def main():
@@ -27,27 +60,79 @@ async def main():
     logger.error("Starting bot")
 
 
-    sessionmaker = load_sessionmaker(DATABASE_URL)
+    database = Database(
+        DATABASE_URL,
+        pool_size=settings.BOT_DB_POOL_SIZE,
+        max_overflow=settings.BOT_DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_timeout=settings.DB_CONNECT_TIMEOUT,
+        instrument=True,
+    )
+    await database.start()
+    sessionmaker = database.sessionmaker
 
     bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
-    dp = Dispatcher(storage=MemoryStorage())
-    dp['api_client'] = AdvertisingPlatformClient(base_url='http://backend:8080')
-
+    dp = Dispatcher(storage=create_fsm_storage(sessionmaker))
+    api_client = AdvertisingPlatformClient(
+        base_url=settings.BOT_API_BASE_URL,
+        limit=settings.BOT_API_CONNECTION_LIMIT,
+        limit_per_host=settings.BOT_API_CONNECTION_LIMIT_PER_HOST,
+        timeout=settings.BOT_API_TIMEOUT,
+        connect_timeout=settings.BOT_API_CONNECT_TIMEOUT,
+        keepalive_timeout=settings.BOT_API_KEEPALIVE_TIMEOUT,
+        retries=settings.BOT_API_RETRIES,
+        retry_backoff=settings.BOT_API_RETRY_BACKOFF,
+    )
+    await api_client.start()
+    dp['api_client'] = api_client
+    chart_renderer = ChartRenderer(
+        max_workers=settings.BOT_CHART_WORKERS,
+        max_pending=settings.BOT_CHART_MAX_PENDING,
+        cache_size=settings.BOT_CHART_CACHE_SIZE,
+    )
+    dp['chart_renderer'] = chart_renderer
+
+
+    notification_sender = None
+    notification_feed = None
+    if settings.BOT_NOTIFICATIONS_ENABLED:
+        notification_sender = NotificationSender(
+            bot, PostgresOutbox(sessionmaker),
+            global_rate=settings.BOT_NOTIFY_GLOBAL_RATE,
+            per_chat_rate=settings.BOT_NOTIFY_PER_CHAT_RATE,
+            batch_size=settings.BOT_NOTIFY_BATCH_SIZE,
+            poll_interval=settings.BOT_NOTIFY_POLL_INTERVAL,
+            max_attempts=settings.BOT_NOTIFY_MAX_ATTEMPTS,
+        )
+        notification_feed = ChangeFeedListener(POSTGRES_DSN)
+        notification_feed.subscribe(ChangeEntity.NOTIFICATION, notification_sender.wake)
+        await notification_sender.start()
+        await notification_feed.start()
 
     setup_routers(dp)
 
     dp.update.outer_middleware.register(
-        DBMiddleware(sessionmaker=sessionmaker)
+        DBMiddleware(
+            sessionmaker=sessionmaker,
+            user_cache=UserCache(ttl=settings.BOT_USER_CACHE_TTL, max_size=settings.BOT_USER_CACHE_SIZE),
+        )
     )
 
     try:
-        await dp.start_polling(
-            bot,
-            allowed_updates=["message", "callback_query"]
-        )
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
     finally:
+        if notification_sender is not None:
+            await notification_feed.stop()
+            await notification_sender.stop()
+        await api_client.close()
+        chart_renderer.close()
         await dp.storage.close()
         await bot.session.close()
+        await database.close()
 
 
 def cli():
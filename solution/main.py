@@ -4,22 +4,53 @@ import uvicorn
 from fastapi import APIRouter
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from fastapi.staticfiles import StaticFiles
 
-from api.database import Base
-from api.deps import DATABASE_URL
+from api.database.engine import POSTGRES_DSN, database
+from api.database.migrations import check_revision
+from api.database.partitions import current_day, ensure_partitions
+from api.database.replica import replica_router
 from api.routes import clients, advertisers, campaigns_router, ml_scores_router, ads_router, time_router, stats_router, \
-    upload_router
+    upload_router, metrics_router
+from api.utils.body_limit import BodySizeLimitMiddleware
+from api.utils.audience_index import audience_index
+from api.utils.campaign_snapshot import campaign_snapshot
+from api.utils.images import image_pipeline
+from api.utils.metrics import PrometheusMiddleware
+from api.utils.sql_profiler import SQLProfilerMiddleware
+from api.utils.storage import storage
+from app.core.change_feed import ChangeEntity, ChangeFeedListener
 from app.core.config import settings
 
+change_feed = ChangeFeedListener(POSTGRES_DSN)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await database.start()
+    # Схему меняет только python -m api.database.migrations upgrade перед выкладкой
+    async with database.engine.begin() as conn:
+        await check_revision(conn)
+        await ensure_partitions(conn, await current_day(conn))
+    await replica_router.start()
+    # Снимок кампаний строится до первого GET /ads; записи других воркеров приходят через change feed
+    await campaign_snapshot.refresh()
+    await audience_index.reload()
+
+    if settings.CHANGE_FEED_ENABLED:
+        change_feed.subscribe([ChangeEntity.CAMPAIGN, ChangeEntity.TIME], campaign_snapshot.on_change)
+        change_feed.subscribe(ChangeEntity.CLIENT, audience_index.on_change)
+        await change_feed.start()
+    await storage.start()
 
     yield
 
+    image_pipeline.close()
+    await storage.close()
+    await change_feed.stop()
+    await replica_router.stop()
+    await database.close()
+
 app = FastAPI(title="PROD Backend 2025 Advertising Platform API", lifespan=lifespan)
 
 
@@ -34,15 +65,18 @@ app.include_router(upload_router)
 app.include_router(campaigns_router)
 app.include_router(stats_router)
 app.include_router(time_router)
+app.include_router(metrics_router)
 
 app.include_router(api_router)
 
+if settings.STORAGE_BACKEND == "local":
+    app.mount("/media", StaticFiles(directory=settings.STORAGE_LOCAL_DIR, check_dir=False), name="media")
+
+# Запас на заголовки multipart поверх самого файла
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.UPLOAD_MAX_BYTES + 64 * 1024)
+app.add_middleware(SQLProfilerMiddleware)
+app.add_middleware(PrometheusMiddleware)
 
-engine: AsyncEngine = create_async_engine(
-    DATABASE_URL,
-    future=True,
-    pool_pre_ping=True
-)
 
 if __name__ == "__main__":
     port = 8000
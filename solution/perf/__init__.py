@@ -0,0 +1,11 @@
+import subprocess
+from typing import Optional
+
+
+def git_revision() -> Optional[str]:
+    """Ревизия, на которой сделан замер, — чтобы отчёты разных сборок можно было сопоставить."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
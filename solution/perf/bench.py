@@ -0,0 +1,113 @@
+"""
+Микробенчмарки на локальном Postgres с базовой линией.
+
+    python -m perf.bench --bench-sizes small,medium --bench-save-baseline
+    python -m perf.bench --bench-sizes small,medium --bench-threshold 0.2
+
+Это обёртка над `pytest tests/bench --bench`. Перед каждым размером база из
+настроек приложения очищается и заполняется perf.dataset — запускать только
+на отдельной базе. Бенчмарк падает, если его медиана хуже базовой линии
+больше чем на threshold (0.25 — на 25%).
+"""
+import inspect
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from perf import git_revision
+from perf.dataset import DatasetConfig
+
+SIZES = {
+    "small": DatasetConfig(clients=10_000, advertisers=100, events=100_000),
+    "medium": DatasetConfig(clients=100_000, advertisers=1_000, events=1_000_000),
+    "large": DatasetConfig(clients=1_000_000, advertisers=5_000, events=10_000_000),
+}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+@dataclass
+class BenchResult:
+    name: str
+    size: str
+    rounds: int
+    median: float
+    p95: float
+    min: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]"
+
+
+async def measure(name: str, size: str, fn: Callable[[], Union[Any, Awaitable[Any]]],
+                  rounds: int = 10, warmup: int = 1,
+                  clock: Callable[[], float] = time.perf_counter) -> BenchResult:
+    """Прогоняет fn warmup раз вхолостую и rounds раз с замером; fn может быть корутинной функцией."""
+    async def call():
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+
+    for _ in range(warmup):
+        await call()
+    samples: List[float] = []
+    for _ in range(rounds):
+        started = clock()
+        await call()
+        samples.append(clock() - started)
+    samples.sort()
+    return BenchResult(
+        name=name, size=size, rounds=rounds,
+        median=statistics.median(samples),
+        p95=samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        min=samples[0],
+    )
+
+
+class Baseline:
+    def __init__(self, path: str, results: Optional[Dict[str, dict]] = None, meta: Optional[dict] = None):
+        self.path = path
+        self.results = results or {}
+        self.meta = meta or {}
+
+    @classmethod
+    def load(cls, path: str) -> "Baseline":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(path, data.get("results", {}), data.get("meta", {}))
+
+    def regression(self, result: BenchResult, threshold: float) -> Optional[float]:
+        """Относительное замедление медианы, если оно больше threshold, иначе None."""
+        previous = self.results.get(result.key)
+        if previous is None or previous["median"] <= 0:
+            return None
+        slowdown = result.median / previous["median"] - 1
+        return slowdown if slowdown > threshold else None
+
+    def save(self, results: List[BenchResult]) -> None:
+        for result in results:
+            self.results[result.key] = asdict(result)
+        self.meta = {
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+        }
+        with open(self.path, "w") as f:
+            json.dump({"meta": self.meta, "results": dict(sorted(self.results.items()))}, f, indent=2)
+
+
+def main(argv=None) -> int:
+    import pytest
+
+    tests = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "bench")
+    return pytest.main([tests, "--bench", "-q", *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
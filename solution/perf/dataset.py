@@ -0,0 +1,458 @@
+"""
+Генератор синтетического датасета для нагрузочных тестов и бенчмарков.
+
+    python -m perf.dataset --clients 1000000 --advertisers 5000 --events 20000000 --seed 42 --truncate
+
+Все таблицы строятся по столбцам в numpy из одного seed и заливаются в
+Postgres через COPY. У каждой таблицы свой поток случайных чисел, поэтому
+изменение, например, числа событий не меняет клиентов и кампании.
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import asyncpg
+import numpy as np
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.database.engine import POSTGRES_DSN, sqlalchemy_url
+from api.database.migrations import upgrade
+from api.database.partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+Table = Dict[str, np.ndarray]
+
+CITIES = (
+    "Moscow", "Saint Petersburg", "Novosibirsk", "Yekaterinburg", "Kazan", "Nizhny Novgorod",
+    "Chelyabinsk", "Samara", "Omsk", "Rostov-on-Don", "Ufa", "Krasnoyarsk", "Voronezh", "Perm",
+    "Volgograd", "Krasnodar", "Tyumen", "Irkutsk", "Khabarovsk", "Vladivostok", "Paris", "Berlin",
+)
+TOPICS = ("кофе", "кроссовки", "курсы Python", "доставку еды", "смартфоны", "фитнес", "ипотеку", "путешествия")
+GENDERS = np.array([None, "MALE", "FEMALE"], dtype=object)
+TARGET_GENDERS = np.array([None, "MALE", "FEMALE", "ALL"], dtype=object)
+EVENT_TYPES = np.array(["IMPRESSION", "CLICK"], dtype=object)
+EPOCH = np.datetime64("2025-01-01T00:00:00")
+SECONDS_PER_DAY = 86_400
+NO_EVENTS = np.iinfo(np.int64).max
+
+# Порядок важен: по нему идёт COPY, а TRUNCATE — в обратном
+TABLES = ("advertisers", "clients", "campaigns", "ml_scores", "ad_events")
+
+# Вторичные индексы (не PK и не UNIQUE-ограничения): на пустую таблицу их дешевле построить после COPY
+SECONDARY_INDEXES_SQL = """
+SELECT i.relname, pg_get_indexdef(i.oid)
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+WHERE x.indrelid = $1::regclass
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+"""
+# Внешние ключи проверяются триггером на каждую строку; ADD CONSTRAINT после COPY проверяет всё одним запросом
+FOREIGN_KEYS_SQL = """
+SELECT conname, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE conrelid = $1::regclass AND contype = 'f'
+"""
+
+
+@dataclass
+class DatasetConfig:
+    seed: int = 42
+    clients: int = 100_000
+    advertisers: int = 1_000
+    campaigns_per_advertiser: float = 3.0
+    # Редкие скоры: в среднем столько рекламодателей на клиента; плотные — скор у каждого клиента
+    scores_per_client: float = 5.0
+    dense_advertisers: int = 5
+    events: int = 1_000_000
+    click_rate: float = 0.05
+    days: int = 30
+
+
+def _city_weights() -> np.ndarray:
+    # Распределение Ципфа: несколько крупных городов и длинный хвост
+    weights = 1 / np.arange(1, len(CITIES) + 1) ** 1.1
+    return weights / weights.sum()
+
+
+def _uuids(rng: np.random.Generator, n: int) -> np.ndarray:
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return np.array([uuid.UUID(bytes=row.tobytes()) for row in raw], dtype=object)
+
+
+def _nullable(values: np.ndarray, null_mask: np.ndarray) -> np.ndarray:
+    out = values.astype(object)
+    out[null_mask] = None
+    return out
+
+
+def generate_advertisers(cfg: DatasetConfig, rng: np.random.Generator) -> Table:
+    n = cfg.advertisers
+    return {
+        "advertiser_id": _uuids(rng, n),
+        "name": np.array([f"Advertiser {i}" for i in range(n)], dtype=object),
+    }
+
+
+def generate_clients(cfg: DatasetConfig, rng: np.random.Generator) -> Table:
+    n = cfg.clients
+    age = np.clip(rng.normal(34, 12, n), 14, 90).astype(np.int16)
+    location = rng.choice(len(CITIES), size=n, p=_city_weights()).astype(np.int16)
+    gender = rng.choice(3, size=n, p=[0.03, 0.48, 0.49]).astype(np.int8)
+    return {
+        "id": _uuids(rng, n),
+        "login": np.array([f"user{i}" for i in range(n)], dtype=object),
+        "age": age,
+        "age_null": rng.random(n) < 0.02,
+        "location": location,
+        "location_null": rng.random(n) < 0.02,
+        "gender": gender,
+    }
+
+
+def generate_campaigns(cfg: DatasetConfig, rng: np.random.Generator) -> Table:
+    per_advertiser = rng.poisson(cfg.campaigns_per_advertiser, cfg.advertisers)
+    advertiser = np.repeat(np.arange(cfg.advertisers, dtype=np.int32), per_advertiser)
+    n = len(advertiser)
+
+    impressions_limit = np.clip(rng.lognormal(8, 1.5, n), 100, 5_000_000).astype(np.int64)
+    ctr = rng.uniform(0.01, 0.1, n)
+    clicks_limit = np.maximum(1, (impressions_limit * ctr)).astype(np.int64)
+    cost_per_impression = np.round(rng.lognormal(0, 0.7, n), 2) + 0.01
+    cost_per_click = np.round(cost_per_impression * rng.uniform(5, 30, n), 2)
+
+    start_date = rng.integers(0, cfg.days + 10, n)
+    end_date = start_date + rng.integers(1, 45, n)
+
+    target_gender = rng.choice(4, size=n, p=[0.4, 0.2, 0.2, 0.2]).astype(np.int8)
+    has_age_from = rng.random(n) < 0.5
+    age_from = rng.integers(14, 45, n)
+    has_age_to = rng.random(n) < 0.4
+    age_to = np.where(has_age_from, age_from, 14) + rng.integers(5, 40, n)
+    has_location = rng.random(n) < 0.35
+    location = rng.choice(len(CITIES), size=n, p=_city_weights()).astype(np.int16)
+
+    topics = rng.integers(0, len(TOPICS), n)
+    return {
+        "campaign_id": _uuids(rng, n),
+        "advertiser": advertiser,
+        "impressions_limit": impressions_limit,
+        "clicks_limit": clicks_limit,
+        "cost_per_impression": cost_per_impression,
+        "cost_per_click": cost_per_click,
+        "ad_title": np.array([f"Скидки на {TOPICS[t]} #{i}" for i, t in enumerate(topics)], dtype=object),
+        "ad_text": np.array([f"Лучшие предложения на {TOPICS[t]} только сегодня" for t in topics], dtype=object),
+        "start_date": start_date,
+        "end_date": end_date,
+        "target_gender": target_gender,
+        "age_from": age_from,
+        "has_age_from": has_age_from,
+        "age_to": age_to,
+        "has_age_to": has_age_to,
+        "location": location,
+        "has_location": has_location,
+        "popularity": rng.lognormal(0, 1, n),
+    }
+
+
+def generate_ml_scores(cfg: DatasetConfig, rng: np.random.Generator) -> Table:
+    n_clients, n_advertisers = cfg.clients, cfg.advertisers
+    dense = min(cfg.dense_advertisers, n_advertisers)
+    dense_clients = np.tile(np.arange(n_clients, dtype=np.int64), dense)
+    dense_advertisers = np.repeat(np.arange(dense, dtype=np.int64), n_clients)
+
+    sparse_count = rng.poisson(cfg.scores_per_client, n_clients)
+    sparse_clients = np.repeat(np.arange(n_clients, dtype=np.int64), sparse_count)
+    sparse_advertisers = rng.integers(0, n_advertisers, len(sparse_clients))
+
+    client = np.concatenate([dense_clients, sparse_clients])
+    advertiser = np.concatenate([dense_advertisers, sparse_advertisers])
+    # Пара (клиент, рекламодатель) — первичный ключ, дубли выкидываем
+    _, first = np.unique(client * n_advertisers + advertiser, return_index=True)
+    client, advertiser = client[first], advertiser[first]
+    return {
+        "client": client,
+        "advertiser": advertiser,
+        "score": np.clip(rng.lognormal(7, 2, len(client)), 0, 10_000_000).astype(np.int64),
+    }
+
+
+def _matches(clients: Table, campaigns: Table, client_idx: np.ndarray, campaign_idx: np.ndarray) -> np.ndarray:
+    """Те же правила таргетинга, что в GET /ads: NULL в кампании — «любой», NULL у клиента не совпадает."""
+    age = np.where(clients["age_null"][client_idx], 0, clients["age"][client_idx])
+    gender = campaigns["target_gender"][campaign_idx]
+    ok = (gender == 0) | (gender == 3) | (gender == clients["gender"][client_idx])
+    ok &= ~campaigns["has_age_from"][campaign_idx] | (campaigns["age_from"][campaign_idx] <= age)
+    ok &= ~campaigns["has_age_to"][campaign_idx] | (campaigns["age_to"][campaign_idx] >= age)
+    ok &= ~campaigns["has_location"][campaign_idx] | (
+        ~clients["location_null"][client_idx]
+        & (campaigns["location"][campaign_idx] == clients["location"][client_idx])
+    )
+    return ok
+
+
+def _rank_within(groups: np.ndarray) -> np.ndarray:
+    """Порядковый номер элемента внутри своей группы (для отсечения по лимитам)."""
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    counts = np.diff(np.r_[starts, len(groups)])
+    ranks = np.empty(len(groups), dtype=np.int64)
+    ranks[order] = np.arange(len(groups)) - np.repeat(starts, counts)
+    return ranks
+
+
+def generate_ad_events(cfg: DatasetConfig, clients: Table, campaigns: Table,
+                       rng: np.random.Generator, max_rounds: int = 20) -> Table:
+    """
+    Показы и клики за прошедшие cfg.days дней. Как и в рабочем сервисе, клиент
+    видит кампанию не больше одного раза, кликает только по показанному,
+    а лимиты показов и кликов кампании не превышаются.
+    """
+    n_clients = len(clients["id"])
+    last_day = np.minimum(campaigns["end_date"], cfg.days)
+    live = np.flatnonzero(campaigns["start_date"] <= last_day)
+    empty = {"campaign": np.empty(0, np.int64), "client": np.empty(0, np.int64),
+             "event_type": np.empty(0, np.int8), "event_day": np.empty(0, np.int64),
+             "seconds": np.empty(0, np.int64)}
+    if cfg.events <= 0 or len(live) == 0 or n_clients == 0:
+        return empty
+
+    weights = campaigns["popularity"][live] / campaigns["popularity"][live].sum()
+    target = int(cfg.events / (1 + cfg.click_rate))
+    keys = np.empty(0, dtype=np.int64)
+    for _ in range(max_rounds):
+        need = target - len(keys)
+        if need <= 0:
+            break
+        batch = int(need * 1.5) + 1000
+        campaign_idx = live[rng.choice(len(live), size=batch, p=weights)]
+        client_idx = rng.integers(0, n_clients, batch)
+        ok = _matches(clients, campaigns, client_idx, campaign_idx)
+        keys = np.unique(np.concatenate([keys, campaign_idx[ok].astype(np.int64) * n_clients + client_idx[ok]]))
+    keys = rng.permutation(keys)[:target]
+
+    campaign, client = keys // n_clients, keys % n_clients
+    keep = _rank_within(campaign) < campaigns["impressions_limit"][campaign]
+    campaign, client = campaign[keep], client[keep]
+
+    start = campaigns["start_date"][campaign]
+    span = last_day[campaign] - start + 1
+    day = start + (rng.random(len(campaign)) * span).astype(np.int64)
+    seconds = rng.integers(0, SECONDS_PER_DAY - 3600, len(campaign))
+
+    clicked = rng.random(len(campaign)) < cfg.click_rate
+    clicked[clicked] &= _rank_within(campaign[clicked]) < campaigns["clicks_limit"][campaign[clicked]]
+    n_clicks = int(clicked.sum())
+
+    events = {
+        "campaign": np.concatenate([campaign, campaign[clicked]]),
+        "client": np.concatenate([client, client[clicked]]),
+        "event_type": np.r_[np.zeros(len(campaign), np.int8), np.ones(n_clicks, np.int8)],
+        "event_day": np.concatenate([day, day[clicked]]),
+        "seconds": np.concatenate([seconds, seconds[clicked] + rng.integers(1, 3600, n_clicks)]),
+    }
+    # В хронологическом порядке, как пишет сервис: bigint-ключ растёт вместе со временем события
+    order = np.lexsort((events["seconds"], events["event_day"]))
+    return {name: column[order] for name, column in events.items()}
+
+
+@dataclass
+class Dataset:
+    advertisers: Table
+    clients: Table
+    campaigns: Table
+    ml_scores: Table
+    ad_events: Table
+
+
+def _seeds(cfg: DatasetConfig) -> List[np.random.SeedSequence]:
+    return np.random.SeedSequence(cfg.seed).spawn(5)
+
+
+def generate_client_population(cfg: DatasetConfig) -> Table:
+    """Только клиенты — те же, что попадут в базу при generate() с тем же seed и размером."""
+    return generate_clients(cfg, np.random.default_rng(_seeds(cfg)[1]))
+
+
+def generate(cfg: DatasetConfig) -> Dataset:
+    seeds = _seeds(cfg)
+    streams = [np.random.default_rng(s) for s in seeds]
+    advertisers = generate_advertisers(cfg, streams[0])
+    clients = generate_clients(cfg, streams[1])
+    campaigns = generate_campaigns(cfg, streams[2])
+    ml_scores = generate_ml_scores(cfg, streams[3])
+    ad_events = generate_ad_events(cfg, clients, campaigns, streams[4])
+    # Как у сервиса: день первого показа кампании, у кампаний без событий — пусто
+    first_event_day = np.full(len(campaigns["campaign_id"]), NO_EVENTS)
+    np.minimum.at(first_event_day, ad_events["campaign"], ad_events["event_day"])
+    campaigns["first_event_day"] = first_event_day
+    return Dataset(advertisers, clients, campaigns, ml_scores, ad_events)
+
+
+def table_rows(data: Dataset, table: str, batch_size: int = 50_000) -> Tuple[List[str], Iterator[Sequence[tuple]]]:
+    """Колонки таблицы и генератор пачек строк для COPY. Python-объекты создаются по пачке за раз."""
+    cities = np.array(CITIES, dtype=object)
+
+    if table == "advertisers":
+        t = data.advertisers
+        columns = ["advertiser_id", "name"]
+        total = len(t["advertiser_id"])
+
+        def batch(s: slice):
+            return t["advertiser_id"][s], t["name"][s]
+
+    elif table == "clients":
+        t = data.clients
+        columns = ["id", "login", "age", "location", "gender"]
+        total = len(t["id"])
+
+        def batch(s: slice):
+            return (
+                t["id"][s], t["login"][s],
+                _nullable(t["age"][s], t["age_null"][s]),
+                _nullable(cities[t["location"][s]], t["location_null"][s]),
+                GENDERS[t["gender"][s]],
+            )
+
+    elif table == "campaigns":
+        t = data.campaigns
+        columns = [
+            "campaign_id", "advertiser_id", "impressions_limit", "clicks_limit", "cost_per_impression",
+            "cost_per_click", "ad_title", "ad_text", "start_date", "end_date", "target_gender",
+            "target_age_from", "target_age_to", "target_location", "is_deleted", "create_date", "first_event_day",
+        ]
+        total = len(t["campaign_id"])
+
+        def batch(s: slice):
+            return (
+                t["campaign_id"][s], data.advertisers["advertiser_id"][t["advertiser"][s]],
+                t["impressions_limit"][s], t["clicks_limit"][s],
+                t["cost_per_impression"][s], t["cost_per_click"][s],
+                t["ad_title"][s], t["ad_text"][s], t["start_date"][s], t["end_date"][s],
+                TARGET_GENDERS[t["target_gender"][s]],
+                _nullable(t["age_from"][s], ~t["has_age_from"][s]),
+                _nullable(t["age_to"][s], ~t["has_age_to"][s]),
+                _nullable(cities[t["location"][s]], ~t["has_location"][s]),
+                np.zeros(len(t["start_date"][s]), dtype=bool),
+                (EPOCH + t["start_date"][s] * np.timedelta64(SECONDS_PER_DAY, "s")).astype(datetime),
+                _nullable(t["first_event_day"][s], t["first_event_day"][s] == NO_EVENTS),
+            )
+
+    elif table == "ml_scores":
+        t = data.ml_scores
+        columns = ["client_id", "advertiser_id", "score"]
+        total = len(t["score"])
+
+        def batch(s: slice):
+            return (
+                data.clients["id"][t["client"][s]],
+                data.advertisers["advertiser_id"][t["advertiser"][s]],
+                t["score"][s],
+            )
+
+    elif table == "ad_events":
+        t = data.ad_events
+        # id — identity, его выдаёт Postgres в порядке COPY
+        columns = ["campaign_id", "client_id", "event_type", "event_timestamp", "event_day"]
+        total = len(t["campaign"])
+
+        def batch(s: slice):
+            seconds = t["event_day"][s] * SECONDS_PER_DAY + t["seconds"][s]
+            return (
+                data.campaigns["campaign_id"][t["campaign"][s]], data.clients["id"][t["client"][s]],
+                EVENT_TYPES[t["event_type"][s]],
+                (EPOCH + seconds * np.timedelta64(1, "s")).astype(datetime),
+                t["event_day"][s],
+            )
+
+    else:
+        raise ValueError(f"Unknown table {table}")
+
+    def batches() -> Iterator[Sequence[tuple]]:
+        for offset in range(0, total, batch_size):
+            yield list(zip(*(column.tolist() for column in batch(slice(offset, offset + batch_size)))))
+
+    return columns, batches()
+
+
+async def load(data: Dataset, cfg: DatasetConfig, dsn: str = POSTGRES_DSN, truncate: bool = False) -> None:
+    # Схема, партиции и COPY — в одну и ту же базу из dsn
+    engine = create_async_engine(sqlalchemy_url(dsn))
+    await upgrade(engine)
+    async with engine.begin() as conn:
+        # Партиции на всю историю, иначе события лягут в DEFAULT
+        await ensure_partitions(conn, cfg.days, since=0)
+    await engine.dispose()
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute("SET maintenance_work_mem = '512MB'")
+        if truncate:
+            await conn.execute(f"TRUNCATE {', '.join(reversed(TABLES))} CASCADE")
+        for table in TABLES:
+            started = time.perf_counter()
+            columns, batches = table_rows(data, table)
+            rows = 0
+            async with conn.transaction():
+                indexes = await conn.fetch(SECONDARY_INDEXES_SQL, table) if truncate else []
+                foreign_keys = await conn.fetch(FOREIGN_KEYS_SQL, table) if truncate else []
+                for name, _ in foreign_keys:
+                    await conn.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+                for name, _ in indexes:
+                    await conn.execute(f'DROP INDEX "{name}"')
+                for batch in batches:
+                    await conn.copy_records_to_table(table, records=batch, columns=columns)
+                    rows += len(batch)
+                for _, definition in indexes:
+                    # Для партиционированной таблицы определение — ON ONLY, без индексов партиций
+                    await conn.execute(definition.replace(" ON ONLY ", " ON "))
+                for name, definition in foreign_keys:
+                    await conn.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+            logger.info("%s: %d rows in %.1fs", table, rows, time.perf_counter() - started)
+
+        async with conn.transaction():
+            await conn.execute("DELETE FROM system_time")
+            await conn.execute('INSERT INTO system_time ("current_date") VALUES ($1)', cfg.days)
+        await conn.execute(f"ANALYZE {', '.join(TABLES)}")
+    finally:
+        await conn.close()
+
+
+def parse_args(argv=None) -> Tuple[DatasetConfig, argparse.Namespace]:
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных и загрузка через COPY")
+    defaults = DatasetConfig()
+    for field in fields(DatasetConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(getattr(defaults, field.name)),
+                            default=getattr(defaults, field.name))
+    parser.add_argument("--dsn", default=POSTGRES_DSN, help="Postgres DSN (по умолчанию из настроек приложения)")
+    parser.add_argument("--truncate", action="store_true", help="Очистить таблицы перед загрузкой")
+    parser.add_argument("--dry-run", action="store_true", help="Только сгенерировать и вывести размеры")
+    args = parser.parse_args(argv)
+    cfg = DatasetConfig(**{field.name: getattr(args, field.name) for field in fields(DatasetConfig)})
+    return cfg, args
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    cfg, args = parse_args(argv)
+    started = time.perf_counter()
+    data = generate(cfg)
+    logger.info(
+        "generated in %.1fs: %d advertisers, %d clients, %d campaigns, %d ml_scores, %d ad_events",
+        time.perf_counter() - started, len(data.advertisers["advertiser_id"]), len(data.clients["id"]),
+        len(data.campaigns["campaign_id"]), len(data.ml_scores["score"]), len(data.ad_events["campaign"]),
+    )
+    if not args.dry_run:
+        asyncio.run(load(data, cfg, args.dsn, args.truncate))
+
+
+if __name__ == "__main__":
+    main()
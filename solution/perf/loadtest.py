@@ -0,0 +1,267 @@
+"""
+Нагрузочный тест цикла «показ → клик» против запущенного бэкенда.
+
+    python -m perf.loadtest --base-url http://localhost:8080 --rate 200 --duration 60 \\
+        --ctr 0.05 --start-day 30 --day-seconds 10 --output result.json
+
+GET /ads идёт по открытой модели: запросы отправляются с заданной частотой,
+не дожидаясь предыдущих ответов, а задержка считается от запланированного
+момента отправки — медленный сервер не снижает нагрузку и не прячет хвосты.
+Клиенты — те же, что создаёт perf.dataset с теми же --seed и --clients.
+В конце по всем увиденным кампаниям сверяются лимиты со статистикой.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import numpy as np
+
+from perf import git_revision
+from perf.dataset import CITIES, DatasetConfig, generate_client_population
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+
+
+@dataclass
+class LoadConfig:
+    base_url: str = "http://localhost:8080"
+    rate: float = 100.0
+    duration: float = 60.0
+    ctr: float = 0.05
+    max_in_flight: int = 1000
+    # Раз в day_seconds секунд /time/advance сдвигает день; 0 — время не двигается
+    day_seconds: float = 0.0
+    start_day: Optional[int] = None
+    seed: int = 42
+    clients: int = 100_000
+    register: bool = False
+    timeout: float = 10.0
+    output: Optional[str] = None
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+
+    def record(self, status: str, seconds: float) -> None:
+        self.statuses[status] += 1
+        self.latencies.append(seconds)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = np.array(self.latencies) * 1000
+        errors = sum(count for status, count in self.statuses.items() if not status.isdigit() or int(status) >= 500)
+        return {
+            "requests": len(latencies),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "errors": errors,
+            "statuses": dict(sorted(self.statuses.items())),
+            "latency_ms": {
+                name: round(float(np.percentile(latencies, q)), 2) if len(latencies) else None
+                for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+            },
+        }
+
+
+class LoadTest:
+    def __init__(self, cfg: LoadConfig, client_ids: Sequence[str], http: aiohttp.ClientSession,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.cfg = cfg
+        self.client_ids = client_ids
+        self.http = http
+        self.clock = clock
+        self.rng = random.Random(cfg.seed)
+        self.stats = {"ads": EndpointStats(), "click": EndpointStats(), "advance": EndpointStats()}
+        # campaign_id -> advertiser_id всех показанных кампаний, для сверки лимитов
+        self.campaigns: Dict[str, str] = {}
+        self.day = cfg.start_day
+        self.dropped = 0
+        self._in_flight = asyncio.Semaphore(cfg.max_in_flight)
+
+    async def _call(self, endpoint: str, method: str, path: str, started: float,
+                    **kwargs) -> Tuple[Optional[int], Any]:
+        try:
+            async with self.http.request(method, self.cfg.base_url + path, **kwargs) as resp:
+                body = await resp.json() if resp.status == 200 else None
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats[endpoint].record(type(e).__name__, self.clock() - started)
+            return None, None
+        self.stats[endpoint].record(str(status), self.clock() - started)
+        return status, body
+
+    async def _get(self, path: str) -> Optional[Any]:
+        try:
+            async with self.http.get(self.cfg.base_url + path) as resp:
+                return await resp.json() if resp.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def register_clients(self, population: Dict[str, np.ndarray], chunk: int = 500) -> None:
+        """Заводит популяцию через /clients/bulk — для стенда, не заполненного perf.dataset."""
+        genders = np.array(["MALE", "MALE", "FEMALE"])
+        for offset in range(0, len(self.client_ids), chunk):
+            s = slice(offset, offset + chunk)
+            payload = [
+                {"client_id": str(client_id), "login": login, "age": int(age),
+                 "location": CITIES[location], "gender": gender}
+                for client_id, login, age, location, gender in zip(
+                    population["id"][s], population["login"][s], population["age"][s],
+                    population["location"][s], genders[population["gender"][s]],
+                )
+            ]
+            async with self.http.post(self.cfg.base_url + "/clients/bulk", json=payload) as resp:
+                resp.raise_for_status()
+
+    async def _advance(self, day: int) -> None:
+        await self._call("advance", "POST", "/time/advance", self.clock(), json={"current_date": day})
+
+    async def _advance_days(self) -> None:
+        while True:
+            await asyncio.sleep(self.cfg.day_seconds)
+            self.day += 1
+            await self._advance(self.day)
+
+    async def _serve(self, client_id: str, scheduled: float) -> None:
+        try:
+            status, ad = await self._call("ads", "GET", "/ads", scheduled, params={"client_id": client_id})
+            if status != 200:
+                return
+            self.campaigns[ad["ad_id"]] = ad["advertiser_id"]
+            if self.rng.random() < self.cfg.ctr:
+                await self._call("click", "POST", f"/ads/{ad['ad_id']}/click", self.clock(),
+                                 json={"client_id": client_id})
+        finally:
+            self._in_flight.release()
+
+    async def over_delivery(self, concurrency: int = 20) -> Dict[str, int]:
+        """Сколько показов и кликов сверх лимита набрали кампании, попавшие в выдачу."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def check(campaign_id: str, advertiser_id: str):
+            async with semaphore:
+                campaign = await self._get(f"/advertisers/{advertiser_id}/campaigns/{campaign_id}")
+                stats = await self._get(f"/stats/campaigns/{campaign_id}")
+            if campaign is None or stats is None:
+                return None
+            return (max(0, stats["impressions_count"] - campaign["impressions_limit"]),
+                    max(0, stats["clicks_count"] - campaign["clicks_limit"]))
+
+        results = await asyncio.gather(*(check(cid, adv) for cid, adv in self.campaigns.items()))
+        checked = [r for r in results if r is not None]
+        return {
+            "campaigns_checked": len(checked),
+            "campaigns_over_impressions": sum(1 for impressions, _ in checked if impressions),
+            "excess_impressions": sum(impressions for impressions, _ in checked),
+            "campaigns_over_clicks": sum(1 for _, clicks in checked if clicks),
+            "excess_clicks": sum(clicks for _, clicks in checked),
+        }
+
+    async def run(self) -> Dict[str, Any]:
+        if self.day is not None:
+            await self._advance(self.day)
+        clock_task = None
+        if self.cfg.day_seconds > 0 and self.day is not None:
+            clock_task = asyncio.create_task(self._advance_days())
+
+        tasks = set()
+        interval = 1 / self.cfg.rate
+        started = self.clock()
+        sent = 0
+        try:
+            while True:
+                scheduled = started + sent * interval
+                if scheduled - started >= self.cfg.duration:
+                    break
+                delay = scheduled - self.clock()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent += 1
+                if self._in_flight.locked():
+                    self.dropped += 1
+                    continue
+                await self._in_flight.acquire()
+                task = asyncio.create_task(self._serve(self.rng.choice(self.client_ids), scheduled))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            if clock_task is not None:
+                clock_task.cancel()
+        elapsed = self.clock() - started
+
+        return {
+            "version": REPORT_VERSION,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "config": asdict(self.cfg),
+            "elapsed_seconds": round(elapsed, 3),
+            "scheduled": sent,
+            "dropped": self.dropped,
+            "final_day": self.day,
+            "endpoints": {name: stats.summary(elapsed) for name, stats in self.stats.items()},
+            "over_delivery": await self.over_delivery(),
+        }
+
+
+async def run_load_test(cfg: LoadConfig) -> Dict[str, Any]:
+    population = generate_client_population(DatasetConfig(seed=cfg.seed, clients=cfg.clients))
+    client_ids = [str(client_id) for client_id in population["id"]]
+    connector = aiohttp.TCPConnector(limit=cfg.max_in_flight)
+    timeout = aiohttp.ClientTimeout(total=cfg.timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        test = LoadTest(cfg, client_ids, http)
+        if cfg.register:
+            await test.register_clients(population)
+        return await test.run()
+
+
+def parse_args(argv=None) -> LoadConfig:
+    parser = argparse.ArgumentParser(description="Нагрузка на GET /ads и клики с отчётом в JSON")
+    defaults = LoadConfig()
+    for field in fields(LoadConfig):
+        name = f"--{field.name.replace('_', '-')}"
+        default = getattr(defaults, field.name)
+        if isinstance(default, bool):
+            parser.add_argument(name, action="store_true")
+        elif field.name == "start_day":
+            parser.add_argument(name, type=int, default=default)
+        elif field.name == "output":
+            parser.add_argument(name, default=default, help="Файл для JSON-отчёта (по умолчанию stdout)")
+        else:
+            parser.add_argument(name, type=type(default), default=default)
+    args = parser.parse_args(argv)
+    if args.day_seconds > 0 and args.start_day is None:
+        parser.error("--day-seconds requires --start-day")
+    return LoadConfig(**{field.name: getattr(args, field.name) for field in fields(LoadConfig)})
+
+
+def main(argv=None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    cfg = parse_args(argv)
+    report = asyncio.run(run_load_test(cfg))
+    for name, summary in report["endpoints"].items():
+        logger.info("%s: %d req, %.1f rps, latency %s, statuses %s", name, summary["requests"],
+                    summary["throughput_rps"], summary["latency_ms"], summary["statuses"])
+    logger.info("over-delivery: %s", report["over_delivery"])
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if cfg.output:
+        with open(cfg.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
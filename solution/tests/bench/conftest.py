@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api.database.engine import DATABASE_URL
+from api.utils.campaign_snapshot import campaign_snapshot
+from perf.bench import DEFAULT_BASELINE, SIZES, Baseline, BenchResult, measure
+from perf.dataset import generate, load
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "бенчмарки на локальном Postgres")
+    group.addoption("--bench", action="store_true", help="Запустить бенчмарки (очищает базу из настроек!)")
+    group.addoption("--bench-sizes", default="small", help=f"Размеры датасета через запятую: {', '.join(SIZES)}")
+    group.addoption("--bench-rounds", type=int, default=10)
+    group.addoption("--bench-baseline", default=DEFAULT_BASELINE, help="Файл базовой линии")
+    group.addoption("--bench-save-baseline", action="store_true", help="Записать результаты как базовую линию")
+    group.addoption("--bench-threshold", type=float, default=0.25,
+                    help="Допустимое замедление медианы относительно базовой линии (0.25 — 25%%)")
+
+
+def pytest_generate_tests(metafunc):
+    if "bench_size" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("--bench-sizes", "small").split(",")
+        metafunc.parametrize("bench_size", sizes, scope="session")
+
+
+def pytest_sessionfinish(session):
+    results = getattr(session.config, "_bench_results", None)
+    if results and session.config.getoption("--bench-save-baseline", False):
+        Baseline.load(session.config.getoption("--bench-baseline")).save(results)
+
+
+@pytest.fixture(scope="session")
+def bench_dataset(request, bench_size):
+    """Заполняет базу датасетом нужного размера; тесты одного размера идут подряд."""
+    if not request.config.getoption("--bench", False):
+        pytest.skip("бенчмарки запускаются с --bench")
+    cfg = SIZES[bench_size]
+    data = generate(cfg)
+    asyncio.run(load(data, cfg, truncate=True))
+    campaign_snapshot.clear()
+    return data
+
+
+@pytest_asyncio.fixture
+async def bench_engine(bench_dataset):
+    engine = create_async_engine(DATABASE_URL)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def rollback_session(bench_engine):
+    """Сессия внутри внешней транзакции: commit() в коде роутов лишь закрывает savepoint, всё откатывается."""
+    @asynccontextmanager
+    async def open_session():
+        async with bench_engine.connect() as conn:
+            transaction = await conn.begin()
+            session = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+            try:
+                yield session
+            finally:
+                await session.close()
+                await transaction.rollback()
+
+    return open_session
+
+
+@pytest.fixture
+def bench(request, bench_size):
+    config = request.config
+    baseline = Baseline.load(config.getoption("--bench-baseline"))
+    if not hasattr(config, "_bench_results"):
+        config._bench_results = []
+
+    async def run(name, fn, rounds=None) -> BenchResult:
+        result = await measure(name, bench_size, fn, rounds=rounds or config.getoption("--bench-rounds"))
+        config._bench_results.append(result)
+        print(f"\n{result.key}: median {result.median * 1000:.2f} ms, p95 {result.p95 * 1000:.2f} ms")
+        if not config.getoption("--bench-save-baseline"):
+            slowdown = baseline.regression(result, config.getoption("--bench-threshold"))
+            if slowdown is not None:
+                pytest.fail(f"{result.key} медленнее базовой линии на {slowdown:.0%} "
+                            f"({baseline.results[result.key]['median'] * 1000:.2f} → {result.median * 1000:.2f} ms)")
+        return result
+
+    return run
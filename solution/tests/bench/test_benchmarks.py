@@ -0,0 +1,85 @@
+import itertools
+import json
+import uuid
+from typing import List
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from api.database.models.models import Campaign
+from api.routes.ads import get_ad_for_client
+from api.routes.clients import upsert_clients
+from api.routes.stats import _compute_campaigns_daily_stats, get_advertiser_daily_stats
+from api.schemas.campaign import CampaignResponse
+from api.schemas.client import ClientUpsert
+
+
+@pytest.mark.asyncio
+async def test_ad_serving(bench, bench_dataset, rollback_session):
+    clients = itertools.cycle(bench_dataset.clients["id"][:100])
+
+    async with rollback_session() as session:
+        async def serve():
+            try:
+                await get_ad_for_client(client_id=next(clients), session=session)
+            except HTTPException:
+                pass
+
+        await bench("ad_serving", serve)
+
+
+@pytest.mark.asyncio
+async def test_campaign_daily_stats(bench, bench_dataset, rollback_session):
+    busiest = np.bincount(bench_dataset.ad_events["campaign"]).argmax()
+    campaign_id = bench_dataset.campaigns["campaign_id"][busiest]
+
+    async with rollback_session() as session:
+        await bench("campaign_daily_stats", lambda: _compute_campaigns_daily_stats(session, [campaign_id]))
+
+
+@pytest.mark.asyncio
+async def test_advertiser_daily_merge(bench, bench_dataset, rollback_session):
+    largest = np.bincount(bench_dataset.campaigns["advertiser"]).argmax()
+    advertiser_id = bench_dataset.advertisers["advertiser_id"][largest]
+
+    async with rollback_session() as session:
+        async def daily():
+            await get_advertiser_daily_stats(advertiserId=advertiser_id, session=session)
+            # identity map иначе отдаст кампании из прошлого раунда без запроса
+            session.expunge_all()
+
+        await bench("advertiser_daily_stats", daily)
+
+
+@pytest.mark.asyncio
+async def test_bulk_client_upsert(bench, bench_dataset, rollback_session):
+    existing = bench_dataset.clients["id"][:250]
+
+    def payload() -> List[ClientUpsert]:
+        ids = list(existing) + [uuid.uuid4() for _ in range(250)]
+        return [ClientUpsert(client_id=client_id, login=f"bench{i}", age=30, location="Moscow", gender="MALE")
+                for i, client_id in enumerate(ids)]
+
+    async with rollback_session() as session:
+        async def upsert():
+            await upsert_clients(payload(), session)
+            session.expunge_all()
+
+        await bench("bulk_client_upsert_500", upsert)
+
+
+@pytest.mark.asyncio
+async def test_campaign_list_serialization(bench, rollback_session):
+    async with rollback_session() as session:
+        campaigns = (await session.execute(select(Campaign).limit(1000))).scalars().all()
+    adapter = TypeAdapter(List[CampaignResponse])
+
+    def serialize():
+        # Как FastAPI для response_model: валидация из ORM-объектов, затем JSON
+        return json.dumps(adapter.dump_python(adapter.validate_python(campaigns, from_attributes=True),
+                                              mode="json")).encode()
+
+    await bench("campaign_response_json_1000", serialize)
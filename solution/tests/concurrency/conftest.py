@@ -0,0 +1,87 @@
+import uuid
+from dataclasses import dataclass
+from typing import List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.database.engine import DATABASE_URL
+from api.database.migrations import upgrade
+from api.database.models.models import AdEvent, Advertiser, Campaign, Client, ClientGenderEnum
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("stress", "проверка лимитов под конкурентной нагрузкой на Postgres")
+    group.addoption("--stress", action="store_true", help="Запустить стресс-тесты на базе из настроек")
+    group.addoption("--stress-parallelism", type=int, default=50, help="Одновременных транзакций")
+    group.addoption("--stress-operations", type=int, default=3000, help="Операций на тест")
+
+
+@dataclass
+class StressWorld:
+    advertiser_id: uuid.UUID
+    campaigns: List[Campaign]
+    client_ids: List[uuid.UUID]
+    parallelism: int
+    operations: int
+
+
+@pytest.fixture
+def stress_options(request):
+    if not request.config.getoption("--stress", False):
+        pytest.skip("стресс-тесты запускаются с --stress")
+    return request.config.getoption("--stress-parallelism"), request.config.getoption("--stress-operations")
+
+
+@pytest_asyncio.fixture
+async def stress_engine(stress_options):
+    parallelism, _ = stress_options
+    engine = create_async_engine(DATABASE_URL, pool_size=parallelism, max_overflow=0)
+    await upgrade(engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def stress_sessionmaker(stress_engine):
+    return async_sessionmaker(stress_engine, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def stress_world(stress_options, stress_sessionmaker):
+    """
+    Свой рекламодатель, кампании с маленькими лимитами и клиенты — чтобы не
+    зависеть от данных в базе; после теста всё созданное удаляется.
+    """
+    parallelism, operations = stress_options
+    advertiser_id = uuid.uuid4()
+    campaigns = [
+        Campaign(
+            campaign_id=uuid.uuid4(), advertiser_id=advertiser_id,
+            impressions_limit=impressions_limit, clicks_limit=clicks_limit,
+            cost_per_impression=1.0, cost_per_click=10.0,
+            ad_title=f"stress {i}", ad_text="stress", start_date=0, end_date=10 ** 6, is_deleted=False,
+        )
+        for i, (impressions_limit, clicks_limit) in enumerate([(1, 1), (2, 1), (5, 2), (10, 3), (25, 5), (50, 10)])
+    ]
+    client_ids = [uuid.uuid4() for _ in range(200)]
+
+    async with stress_sessionmaker() as session:
+        session.add(Advertiser(advertiser_id=advertiser_id, name="stress"))
+        await session.flush()
+        session.add_all(campaigns)
+        session.add_all(Client(id=client_id, login=f"stress{i}", age=30, location="Moscow",
+                               gender=ClientGenderEnum.MALE) for i, client_id in enumerate(client_ids))
+        await session.commit()
+
+    yield StressWorld(advertiser_id, campaigns, client_ids, parallelism, operations)
+
+    campaign_ids = [c.campaign_id for c in campaigns]
+    async with stress_sessionmaker() as session:
+        await session.execute(delete(AdEvent).where(AdEvent.campaign_id.in_(campaign_ids)))
+        await session.execute(delete(Campaign).where(Campaign.campaign_id.in_(campaign_ids)))
+        await session.execute(delete(Client).where(Client.id.in_(client_ids)))
+        await session.execute(delete(Advertiser).where(Advertiser.advertiser_id == advertiser_id))
+        await session.commit()
@@ -0,0 +1,119 @@
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import pytest
+import pytest_asyncio
+
+from api.database.compact_ad_events import backfill, layout, prepare, swap
+from api.database.engine import POSTGRES_DSN
+
+# Старая схема ad_events (uuid-ключ, индекс на каждой колонке) в отдельной схеме базы
+LEGACY_SQL = """
+CREATE TYPE adeventtypeenum AS ENUM ('IMPRESSION', 'CLICK');
+CREATE TABLE campaigns (campaign_id UUID PRIMARY KEY);
+CREATE TABLE clients (id UUID PRIMARY KEY);
+CREATE TABLE ad_events (
+    id UUID PRIMARY KEY,
+    campaign_id UUID NOT NULL REFERENCES campaigns (campaign_id),
+    client_id UUID NOT NULL REFERENCES clients (id),
+    event_type adeventtypeenum NOT NULL,
+    event_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    event_day INTEGER NOT NULL
+);
+CREATE INDEX ix_ad_events_campaign_id ON ad_events (campaign_id);
+CREATE INDEX ix_ad_events_client_id ON ad_events (client_id);
+CREATE INDEX ix_ad_events_event_type ON ad_events (event_type);
+CREATE INDEX ix_ad_events_event_timestamp ON ad_events (event_timestamp);
+CREATE INDEX ix_ad_events_event_day ON ad_events (event_day);
+"""
+INSERT_SQL = """
+INSERT INTO ad_events (id, campaign_id, client_id, event_type, event_timestamp, event_day)
+VALUES ($1, $2, $3, $4, $5, $6)
+"""
+KEYS_SQL = "SELECT campaign_id, event_type::text, client_id, {timestamp} FROM {table} GROUP BY 1, 2, 3"
+
+
+@pytest_asyncio.fixture
+async def legacy_schema(stress_options):
+    """Фабрика соединений, для которых ad_events — таблица старой схемы; схема удаляется после теста."""
+    schema = f"compact_test_{uuid.uuid4().hex[:8]}"
+    admin = await asyncpg.connect(POSTGRES_DSN)
+    await admin.execute(f"CREATE SCHEMA {schema}")
+    connections = []
+
+    async def connect() -> asyncpg.Connection:
+        conn = await asyncpg.connect(POSTGRES_DSN, server_settings={"search_path": schema})
+        connections.append(conn)
+        return conn
+
+    try:
+        yield connect
+    finally:
+        for conn in connections:
+            await conn.close()
+        await admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        await admin.close()
+
+
+@pytest.mark.asyncio
+async def test_backfill_and_swap_keep_every_event_under_concurrent_writes(legacy_schema):
+    rng = random.Random(3)
+    conn = await legacy_schema()
+    await conn.execute(LEGACY_SQL)
+    campaigns = [uuid.uuid4() for _ in range(20)]
+    clients = [uuid.uuid4() for _ in range(200)]
+    await conn.executemany("INSERT INTO campaigns VALUES ($1)", [(c,) for c in campaigns])
+    await conn.executemany("INSERT INTO clients VALUES ($1)", [(c,) for c in clients])
+
+    # Старые события вперемешку с повторами пары кампания–клиент одного типа
+    started = datetime(2025, 1, 1)
+    legacy = [
+        (uuid.uuid4(), rng.choice(campaigns), rng.choice(clients), rng.choice(["IMPRESSION", "CLICK"]),
+         started + timedelta(seconds=rng.randrange(86_400)), rng.randrange(10))
+        for _ in range(3000)
+    ]
+    await conn.executemany(INSERT_SQL, legacy)
+    taken = {(campaign, event_type, client) for _, campaign, client, event_type, _, _ in legacy}
+
+    await prepare(conn)
+    writer = await legacy_schema()
+
+    async def write_during_backfill():
+        """Новые события и удаления, пока идёт перенос: их должен отзеркалить триггер."""
+        written = []
+        for n in range(300):
+            key = (rng.choice(campaigns), rng.choice(["IMPRESSION", "CLICK"]), rng.choice(clients))
+            if key in taken:
+                continue
+            taken.add(key)
+            row_id = uuid.uuid4()
+            await writer.execute(INSERT_SQL, row_id, key[0], key[2], key[1],
+                                 started + timedelta(days=1, seconds=n), 10)
+            written.append(row_id)
+            if n % 10 == 0:
+                await writer.execute("DELETE FROM ad_events WHERE id = $1", written.pop(rng.randrange(len(written))))
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(backfill(conn, batch_size=200, pause=0.005), write_during_backfill())
+    await swap(conn)
+    assert await layout(conn) == "compact"
+
+    # Из повторов остаётся самое раннее событие; всё, что записано и не удалено во время переноса, на месте
+    expected = set(await conn.fetch(KEYS_SQL.format(timestamp="min(event_timestamp)", table="ad_events_legacy")))
+    actual = set(await conn.fetch(KEYS_SQL.format(timestamp="max(event_timestamp)", table="ad_events")))
+    assert actual == expected
+    assert await conn.fetchval("SELECT count(*) FROM ad_events") == len(expected)
+    assert await conn.fetchval("SELECT count(DISTINCT id) = count(*) FROM ad_events")
+
+    # После swap новые строки получают id из переименованной последовательности
+    max_id = await conn.fetchval("SELECT max(id) FROM ad_events")
+    client = uuid.uuid4()
+    await conn.execute("INSERT INTO clients VALUES ($1)", client)
+    new_id = await conn.fetchval("""
+        INSERT INTO ad_events (event_timestamp, campaign_id, client_id, event_day, event_type)
+        VALUES (now(), $1, $2, 11, 'IMPRESSION') RETURNING id
+    """, campaigns[0], client)
+    assert new_id > max_id
@@ -0,0 +1,118 @@
+import asyncio
+import random
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import text
+
+from api.routes.ads import safe_record_click, safe_record_impression
+
+INVARIANTS_SQL = {
+    "over_delivery": """
+        SELECT c.campaign_id
+        FROM campaigns c
+        JOIN ad_events e ON e.campaign_id = c.campaign_id
+        WHERE c.campaign_id = ANY(:ids)
+        GROUP BY c.campaign_id, c.impressions_limit, c.clicks_limit
+        HAVING count(DISTINCT e.client_id) FILTER (WHERE e.event_type = 'IMPRESSION') > c.impressions_limit
+            OR count(DISTINCT e.client_id) FILTER (WHERE e.event_type = 'CLICK') > c.clicks_limit
+    """,
+    "duplicates": """
+        SELECT campaign_id, client_id, event_type
+        FROM ad_events
+        WHERE campaign_id = ANY(:ids)
+        GROUP BY campaign_id, client_id, event_type
+        HAVING count(*) > 1
+    """,
+    "click_without_impression": """
+        SELECT k.campaign_id, k.client_id
+        FROM ad_events k
+        WHERE k.campaign_id = ANY(:ids) AND k.event_type = 'CLICK'
+          AND NOT EXISTS (
+              SELECT 1 FROM ad_events i
+              WHERE i.campaign_id = k.campaign_id AND i.client_id = k.client_id AND i.event_type = 'IMPRESSION'
+          )
+    """,
+}
+
+
+async def assert_limits_hold(sessionmaker, campaigns):
+    ids = [c.campaign_id for c in campaigns]
+    async with sessionmaker() as session:
+        for name, sql in INVARIANTS_SQL.items():
+            violations = (await session.execute(text(sql), {"ids": ids})).all()
+            assert violations == [], f"{name}: {violations[:5]}"
+
+
+async def _event_counts(sessionmaker, campaigns):
+    async with sessionmaker() as session:
+        rows = await session.execute(text("""
+            SELECT campaign_id, event_type, count(*) FROM ad_events
+            WHERE campaign_id = ANY(:ids) GROUP BY campaign_id, event_type
+        """), {"ids": [c.campaign_id for c in campaigns]})
+        return {(cid, str(event_type)): count for cid, event_type, count in rows}
+
+
+async def _fire(sessionmaker, operations, parallelism):
+    """Каждая операция — в своей сессии, как запрос к API; не больше parallelism одновременно."""
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def run(record, campaign_id, client_id):
+        async with semaphore:
+            async with sessionmaker() as session:
+                return await record(campaign_id, client_id, session)
+
+    return await asyncio.gather(*(run(*op) for op in operations))
+
+
+@pytest.mark.asyncio
+async def test_same_impression_from_every_worker_is_written_once(stress_world, stress_sessionmaker):
+    campaign = stress_world.campaigns[-1]
+    client_id = stress_world.client_ids[0]
+    ops = [(safe_record_impression, campaign.campaign_id, client_id)] * stress_world.parallelism * 4
+
+    results = await _fire(stress_sessionmaker, ops, stress_world.parallelism)
+
+    assert all(results)
+    counts = await _event_counts(stress_sessionmaker, [campaign])
+    assert counts == {(campaign.campaign_id, "IMPRESSION"): 1}
+    await assert_limits_hold(stress_sessionmaker, stress_world.campaigns)
+
+
+@pytest.mark.asyncio
+async def test_impressions_fill_exactly_up_to_limit(stress_world, stress_sessionmaker):
+    rng = random.Random(1)
+    ops = [
+        (safe_record_impression, rng.choice(stress_world.campaigns).campaign_id, rng.choice(stress_world.client_ids))
+        for _ in range(stress_world.operations)
+    ]
+    attempted = defaultdict(set)
+    for _, campaign_id, client_id in ops:
+        attempted[campaign_id].add(client_id)
+
+    await _fire(stress_sessionmaker, ops, stress_world.parallelism)
+
+    await assert_limits_hold(stress_sessionmaker, stress_world.campaigns)
+    counts = await _event_counts(stress_sessionmaker, stress_world.campaigns)
+    for campaign in stress_world.campaigns:
+        # Блокировки не должны терять записи: лимит выбран полностью, если желающих хватало
+        expected = min(campaign.impressions_limit, len(attempted[campaign.campaign_id]))
+        assert counts.get((campaign.campaign_id, "IMPRESSION"), 0) == expected
+
+
+@pytest.mark.asyncio
+async def test_mixed_impressions_and_clicks_respect_limits(stress_world, stress_sessionmaker):
+    rng = random.Random(2)
+    ops = []
+    for _ in range(stress_world.operations):
+        record = safe_record_impression if rng.random() < 0.6 else safe_record_click
+        # Узкий круг клиентов — больше гонок за одни и те же пары и кликов без показа
+        ops.append((record, rng.choice(stress_world.campaigns).campaign_id, rng.choice(stress_world.client_ids[:40])))
+
+    results = await _fire(stress_sessionmaker, ops, stress_world.parallelism)
+
+    await assert_limits_hold(stress_sessionmaker, stress_world.campaigns)
+    assert any(results) and not all(results)
+    counts = await _event_counts(stress_sessionmaker, stress_world.campaigns)
+    for campaign in stress_world.campaigns:
+        assert counts.get((campaign.campaign_id, "CLICK"), 0) <= campaign.clicks_limit
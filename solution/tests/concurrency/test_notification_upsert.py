@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database.models.models import BotNotification, BotUser
+from api.utils.notifications import NotificationKind, notify_advertiser
+
+CHAT_ID = -(10 ** 12) - 43
+
+
+@pytest.mark.asyncio
+async def test_pending_upsert_survives_generic_plan(stress_world, stress_engine):
+    """
+    С шестого выполнения на одном соединении Postgres может перейти на общий план
+    подготовленного запроса — ON CONFLICT по частичному индексу должен продолжать работать.
+    """
+    runs = 8
+    async with stress_engine.connect() as connection:
+        session = AsyncSession(bind=connection, expire_on_commit=False)
+        try:
+            session.add(BotUser(user_id=CHAT_ID, advertiser_id=stress_world.advertiser_id))
+            await session.commit()
+            for n in range(runs):
+                await notify_advertiser(session, stress_world.advertiser_id, NotificationKind.DAILY_DIGEST,
+                                        "digest:stress", f"run {n}")
+                await session.commit()
+
+            rows = (await session.execute(
+                select(BotNotification.body, BotNotification.coalesced).where(BotNotification.chat_id == CHAT_ID)
+            )).all()
+            assert rows == [(f"run {runs - 1}", runs - 1)]
+        finally:
+            await session.rollback()
+            await session.execute(delete(BotNotification).where(BotNotification.chat_id == CHAT_ID))
+            await session.execute(delete(BotUser).where(BotUser.user_id == CHAT_ID))
+            await session.commit()
+            await session.close()
@@ -0,0 +1,55 @@
+import pytest
+import pytest_asyncio
+
+from api.database.engine import DATABASE_URL, Database
+from api.database.replica import REPLICA_URL, ReplicaRouter
+from app.core.config import settings
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("replica", "чтение с реплики на живой паре primary/реплика")
+    group.addoption("--replica", action="store_true",
+                    help="Запустить тесты реплики (POSTGRES_REPLICA_HOST из настроек; ставит её воспроизведение на паузу)")
+
+
+def _database(url: str, name: str) -> Database:
+    return Database(url, pool_size=2, max_overflow=0, pool_timeout=5, pool_recycle=60, connect_timeout=2,
+                    listeners=0, name=name)
+
+
+@pytest.fixture
+def replica_enabled(request):
+    if not request.config.getoption("--replica", False):
+        pytest.skip("тесты реплики запускаются с --replica")
+    if not settings.POSTGRES_REPLICA_HOST:
+        pytest.skip("POSTGRES_REPLICA_HOST не задан")
+
+
+@pytest_asyncio.fixture
+async def primary(replica_enabled):
+    db = _database(DATABASE_URL, "primary")
+    await db.start()
+    yield db
+    await db.close()
+
+
+@pytest_asyncio.fixture
+async def replica(replica_enabled):
+    db = _database(REPLICA_URL, "replica")
+    await db.start()
+    yield db
+    await db.close()
+
+
+@pytest_asyncio.fixture
+async def make_router(primary):
+    routers = []
+
+    async def make(replica: Database, max_staleness: float = 0.5) -> ReplicaRouter:
+        router = ReplicaRouter(primary, replica, max_staleness=max_staleness, check_interval=0.05)
+        routers.append(router)
+        return router
+
+    yield make
+    for router in routers:
+        await router.stop()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+
+from api.database.engine import Database
+
+# Закоммиченная WAL-запись без изменения таблиц: двигает LSN primary
+EMIT_WAL_SQL = "SELECT pg_logical_emit_message(true, 'replica-test', 'x')"
+
+
+async def _in_recovery(router) -> bool:
+    async with router.session() as session:
+        return (await session.execute(text("SELECT pg_is_in_recovery()"))).scalar()
+
+
+async def _wait(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_fresh_replica_serves_reads_and_sees_committed_writes(primary, replica, make_router):
+    router = await make_router(replica)
+    async with primary.engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE IF NOT EXISTS replica_probe (value int)"))
+    try:
+        await router.start()
+        async with primary.engine.begin() as conn:
+            await conn.execute(text("INSERT INTO replica_probe VALUES (42)"))
+        written_at = time.monotonic()
+        # Свежесть по замеру LSN после коммита гарантирует, что реплика видит запись
+        await _wait(lambda: router.use_replica() and router.lag.caught_up_at > written_at)
+        assert await _in_recovery(router)
+        async with router.session() as session:
+            assert (await session.execute(text("SELECT count(*) FROM replica_probe WHERE value = 42"))).scalar() == 1
+    finally:
+        async with primary.engine.begin() as conn:
+            await conn.execute(text("DROP TABLE replica_probe"))
+
+
+@pytest.mark.asyncio
+async def test_paused_replay_falls_back_to_primary(primary, replica, make_router):
+    router = await make_router(replica, max_staleness=0.3)
+    await router.start()
+    await _wait(router.use_replica)
+    async with replica.engine.connect() as conn:
+        await conn.execute(text("SELECT pg_wal_replay_pause()"))
+    try:
+        async with primary.engine.begin() as conn:
+            await conn.execute(text(EMIT_WAL_SQL))
+        await _wait(lambda: not router.use_replica())
+        assert not await _in_recovery(router)
+    finally:
+        async with replica.engine.connect() as conn:
+            await conn.execute(text("SELECT pg_wal_replay_resume()"))
+    await _wait(router.use_replica)
+    assert await _in_recovery(router)
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_falls_back_to_primary(primary, make_router):
+    down = Database("postgresql+asyncpg://postgres:x@127.0.0.1:1/adv", pool_size=1, max_overflow=0,
+                    pool_timeout=1, pool_recycle=60, connect_timeout=0.5, listeners=0, name="replica")
+    router = await make_router(down)
+    await router.start()
+    await asyncio.sleep(0.3)
+    assert not router.use_replica()
+    assert not await _in_recovery(router)
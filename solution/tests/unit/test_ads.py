@@ -197,3 +197,45 @@ async def test_safe_record_click_no_impression():
     assert result is False
     mock_session.commit.assert_not_awaited()
     safe_record_click.__globals__["get_current_day"] = original_get_current_day
+
+
+@pytest.mark.asyncio
+async def test_safe_record_impression_after_time_rollback_moves_first_event_day():
+    """Время вернули назад: показ раньше first_event_day должен сдвинуть границу, иначе он выпадет из подсчёта."""
+    mock_session = AsyncMock()
+    mock_campaign = Campaign()
+    mock_campaign.is_deleted = False
+    mock_campaign.start_date = 0
+    mock_campaign.end_date = 10
+    mock_campaign.impressions_limit = 5
+    mock_campaign.first_event_day = 7
+
+    mock_result_lock = MagicMock()
+    mock_result_lock.scalar_one_or_none.return_value = mock_campaign
+
+    mock_result_count = MagicMock()
+    mock_result_count.scalar.return_value = 1
+
+    mock_result_check = MagicMock()
+    mock_result_check.scalar_one_or_none.return_value = None
+
+    mock_session.execute.side_effect = [
+        mock_result_lock,
+        mock_result_count,
+        mock_result_check
+    ]
+
+    async def mock_get_current_day(*args, **kwargs):
+        return 3
+
+    original_get_current_day = safe_record_impression.__globals__["get_current_day"]
+    safe_record_impression.__globals__["get_current_day"] = mock_get_current_day
+
+    campaign_id = UUID("99999999-9999-9999-9999-999999999999")
+    client_id = UUID("aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa")
+
+    result = await safe_record_impression(campaign_id, client_id, mock_session)
+    assert result is True
+    assert mock_campaign.first_event_day == 3
+
+    safe_record_impression.__globals__["get_current_day"] = original_get_current_day
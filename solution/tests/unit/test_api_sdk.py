@@ -0,0 +1,102 @@
+import pytest
+from aiohttp import ClientResponseError, web
+from aiohttp.test_utils import TestServer
+
+from bot.utils.api_sdk import AdvertisingPlatformClient
+
+ADVERTISER = {"advertiser_id": "baaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa", "name": "Test Advertiser"}
+
+
+async def _start_server(handler):
+    app = web.Application()
+    app.router.add_get("/advertisers/{advertiser_id}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_session_survives_context_exit():
+    async def handler(request):
+        return web.json_response(ADVERTISER)
+
+    server = await _start_server(handler)
+    client = AdvertisingPlatformClient(str(server.make_url("/")))
+    try:
+        async with client as c:
+            await c.get_advertiser_by_id(ADVERTISER["advertiser_id"])
+            session = c.session
+        async with client as c:
+            await c.get_advertiser_by_id(ADVERTISER["advertiser_id"])
+            assert c.session is session
+            assert not session.closed
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_get_is_retried_on_unavailable():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        if len(calls) < 3:
+            return web.Response(status=503)
+        return web.json_response(ADVERTISER)
+
+    server = await _start_server(handler)
+    client = AdvertisingPlatformClient(str(server.make_url("/")), retries=3, retry_backoff=0)
+    await client.start()
+    try:
+        advertiser = await client.get_advertiser_by_id(ADVERTISER["advertiser_id"])
+        assert advertiser.name == ADVERTISER["name"]
+        assert len(calls) == 3
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        return web.Response(status=404)
+
+    server = await _start_server(handler)
+    client = AdvertisingPlatformClient(str(server.make_url("/")), retries=3, retry_backoff=0)
+    await client.start()
+    try:
+        with pytest.raises(ClientResponseError) as exc:
+            await client.get_advertiser_by_id(ADVERTISER["advertiser_id"])
+        assert exc.value.status == 404
+        assert len(calls) == 1
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_campaign_page_is_one_request():
+    calls = []
+
+    async def handler(request):
+        calls.append(dict(request.query))
+        return web.json_response({"total": 11, "items": []})
+
+    app = web.Application()
+    app.router.add_get("/advertisers/{advertiser_id}/campaigns/page", handler)
+    server = TestServer(app)
+    await server.start_server()
+    client = AdvertisingPlatformClient(str(server.make_url("/")))
+    await client.start()
+    try:
+        page = await client.list_campaigns_page(ADVERTISER["advertiser_id"], page=2)
+        assert page.total == 11
+        assert page.items == []
+        assert calls == [{"page": "2", "size": "10"}]
+    finally:
+        await client.close()
+        await server.close()
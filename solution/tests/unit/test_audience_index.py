@@ -0,0 +1,59 @@
+import uuid
+
+from api.database.models.models import ClientGenderEnum
+from api.utils.audience_index import AudienceCollector, AudienceIndex
+
+CLIENTS = [
+    ("MALE", 18, "Moscow"),
+    ("FEMALE", 25, "Moscow"),
+    ("FEMALE", 40, "Kazan"),
+    ("MALE", 65, "Kazan"),
+    ("MALE", None, None),
+]
+
+
+def _index(clients=CLIENTS) -> AudienceIndex:
+    index = AudienceIndex(database=None)
+    index._load([(uuid.uuid4(), (gender, age or 0, location)) for gender, age, location in clients])
+    return index
+
+
+def test_estimate_intersects_targeting():
+    index = _index()
+    assert index.estimate() == 5
+    assert index.estimate(gender="ALL") == 5
+    assert index.estimate(gender="MALE") == 3
+    assert index.estimate(age_from=20, age_to=40) == 2
+    assert index.estimate(age_from=40) == 2
+    assert index.estimate(age_to=18) == 2  # без возраста — как 0
+    assert index.estimate(gender="FEMALE", location="Kazan", age_from=30) == 1
+    assert index.estimate(location="Omsk") == 0
+
+
+def test_upsert_moves_client_between_bitsets():
+    index = _index()
+    client_id = uuid.uuid4()
+    index.upsert(client_id, ClientGenderEnum.FEMALE, 200, "Omsk")
+    assert index.estimate(location="Omsk", age_from=150) == 1
+    # 64 новых клиента — битсеты растут на слово
+    for _ in range(64):
+        index.upsert(uuid.uuid4(), "MALE", 30, "Kazan")
+    index.upsert(client_id, "MALE", 30, "Kazan")
+    assert len(index) == 70
+    assert index.estimate(location="Omsk") == 0
+    assert index.estimate(gender="MALE", location="Kazan", age_from=30, age_to=30) == 65
+    assert index.estimate(gender="FEMALE") == 2
+
+    fresh = _index(CLIENTS + [("MALE", 30, "Kazan")] * 65)
+    for targeting in [{}, {"gender": "MALE"}, {"age_from": 19, "age_to": 64}, {"location": "Moscow"}]:
+        assert index.estimate(**targeting) == fresh.estimate(**targeting)
+
+
+def test_collector_exports_demographics():
+    index = _index()
+    samples = {(s.labels["dimension"], s.labels["value"]): s.value
+               for family in AudienceCollector(index, top_locations=1).collect() for s in family.samples}
+    assert samples[("total", "")] == 5
+    assert samples[("gender", "MALE")] == 3
+    assert samples[("age", "0")] == 1
+    assert [key for key in samples if key[0] == "location"] == [("location", "Moscow")]
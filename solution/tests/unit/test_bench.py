@@ -0,0 +1,39 @@
+import pytest
+
+from perf.bench import Baseline, BenchResult, measure
+
+
+class StepClock:
+    def __init__(self, steps):
+        self.times = iter(steps)
+
+    def __call__(self):
+        return next(self.times)
+
+
+@pytest.mark.asyncio
+async def test_measure_skips_warmup_and_accepts_sync_and_async():
+    calls = []
+
+    async def work():
+        calls.append(1)
+
+    clock = StepClock([0, 1, 10, 13, 20, 22])
+    result = await measure("x", "small", work, rounds=3, warmup=2, clock=clock)
+    assert len(calls) == 5
+    assert (result.min, result.median, result.p95) == (1, 2, 3)
+
+    result = await measure("y", "small", lambda: None, rounds=1, warmup=0, clock=StepClock([0, 5]))
+    assert result.median == 5
+
+
+def test_baseline_round_trip_and_regression(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    Baseline.load(path).save([BenchResult("q", "small", 5, median=0.010, p95=0.012, min=0.009)])
+
+    baseline = Baseline.load(path)
+    assert baseline.meta["recorded_at"]
+    slower = BenchResult("q", "small", 5, median=0.013, p95=0.02, min=0.01)
+    assert baseline.regression(slower, threshold=0.35) is None
+    assert baseline.regression(slower, threshold=0.25) == pytest.approx(0.3)
+    assert baseline.regression(BenchResult("q", "large", 5, 1.0, 1.0, 1.0), threshold=0.0) is None
@@ -0,0 +1,93 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from bot.database import Repo
+from bot.database.cache import CachedUser, UserCache
+from bot.database.models import BotUser
+from bot.middlewares import DBMiddleware
+
+
+class CountingSessionmaker:
+    def __init__(self, factory):
+        self.factory = factory
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return self.factory()
+
+
+@pytest_asyncio.fixture
+async def sessions():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: BotUser.__table__.create(sync_conn))
+    yield CountingSessionmaker(sessionmaker(engine, expire_on_commit=False, class_=AsyncSession))
+    await engine.dispose()
+
+
+def test_user_cache_expires_and_evicts():
+    now = [0.0]
+    cache = UserCache(ttl=10, max_size=2, clock=lambda: now[0])
+    for user_id in (1, 2, 3):
+        cache.put(CachedUser(user_id, None, None))
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
+
+    now[0] = 11
+    assert cache.get(2) is None
+
+
+@pytest.mark.asyncio
+async def test_middleware_opens_session_only_when_repo_is_used(sessions):
+    middleware = DBMiddleware(sessionmaker=sessions, user_cache=UserCache())
+
+    async def idle_handler(event, data):
+        return "ok"
+
+    assert await middleware(idle_handler, None, {}) == "ok"
+    assert sessions.opened == 0
+
+    async def db_handler(event, data):
+        return await data["repo"].create_user(100)
+
+    await middleware(db_handler, None, {})
+    assert sessions.opened == 1
+
+
+@pytest.mark.asyncio
+async def test_get_user_is_cached_and_invalidated_on_binding_change(sessions):
+    cache = UserCache()
+    repo = Repo(sessions, cache)
+    await repo.create_user(100)
+    await repo.close()
+
+    first = Repo(sessions, cache)
+    assert (await first.get_user(100)).advertiser_name is None
+    await first.close()
+    opened = sessions.opened
+
+    second = Repo(sessions, cache)
+    assert (await second.get_user(100)).advertiser_name is None
+    assert sessions.opened == opened
+
+    await second.set_advertiser(100, advertiser_id=None, advertiser_name="Acme")
+    await second.close()
+
+    third = Repo(sessions, cache)
+    assert (await third.get_user(100)).advertiser_name == "Acme"
+    await third.close()
+
+
+@pytest.mark.asyncio
+async def test_set_advertiser_creates_missing_user(sessions):
+    repo = Repo(sessions, UserCache())
+    await repo.set_advertiser(200, advertiser_id=None, advertiser_name="Acme")
+    await repo.close()
+
+    fresh = Repo(sessions)
+    user = await fresh.get_user(200)
+    await fresh.close()
+    assert user is not None and user.advertiser_name == "Acme"
@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from api.database.models.models import TargetingGenderEnum
+from api.utils import campaign_snapshot as module
+from api.utils.campaign_snapshot import CampaignSnapshot, CampaignSnapshotStore
+
+
+def _row(gender=None, age_from=None, age_to=None, location=None, impressions_limit=10, clicks_limit=5,
+         cost_per_impression=1.0, cost_per_click=10.0, first_event_day=None):
+    return SimpleNamespace(
+        campaign_id=uuid.uuid4(), advertiser_id=uuid.uuid4(), ad_title="title", ad_text="text",
+        ad_photo_url=None, ad_photo_variants=None, first_event_day=first_event_day,
+        target_gender=gender, target_age_from=age_from, target_age_to=age_to, target_location=location,
+        impressions_limit=impressions_limit, clicks_limit=clicks_limit,
+        cost_per_impression=cost_per_impression, cost_per_click=cost_per_click,
+    )
+
+
+def test_candidates_follow_targeting():
+    rows = [
+        _row(),
+        _row(gender=TargetingGenderEnum.ALL, location=""),
+        _row(gender=TargetingGenderEnum.FEMALE),
+        _row(age_from=18, age_to=25),
+        _row(location="Kazan"),
+        _row(location="Moscow", first_event_day=3),
+    ]
+    snapshot = CampaignSnapshot.from_rows(day=5, generation=1, built_at=0.0, rows=rows)
+    assert snapshot.events_from == 3
+    # Время откатили раньше первого показа — новые события будут днём 2
+    assert CampaignSnapshot.from_rows(day=2, generation=2, built_at=0.0, rows=rows).events_from == 2
+    assert snapshot.candidates("MALE", 30, "Kazan").tolist() == [0, 1, 4]
+    assert snapshot.candidates("FEMALE", 20, "Moscow").tolist() == [0, 1, 2, 3, 5]
+    assert snapshot.candidates(None, 0, "").tolist() == [0, 1]
+
+
+def test_best_ranks_by_expected_profit_then_ml_score():
+    rows = [
+        _row(cost_per_impression=1.0, cost_per_click=1.0),
+        _row(cost_per_impression=5.0, cost_per_click=1.0, impressions_limit=3),
+        _row(cost_per_impression=2.0, cost_per_click=1.0),
+        _row(cost_per_impression=2.0, cost_per_click=1.0),
+    ]
+    snapshot = CampaignSnapshot.from_rows(day=0, generation=1, built_at=0.0, rows=rows)
+    candidates = np.arange(4)
+    zeros = np.zeros(4, dtype=np.int64)
+    no = np.zeros(4, dtype=bool)
+    ml = np.array([0.0, 0.0, 100.0, 200.0])
+
+    assert snapshot.best(candidates, zeros, zeros, no, no, ml) == 1
+    # Лимит показов выбран — кампания 1 выпадает, из равных по прибыли выигрывает больший ML-скор
+    assert snapshot.best(candidates, np.array([0, 3, 0, 0]), zeros, no, no, ml) == 3
+    # Клиент уже видел и кликнул: прибыли 0, но кампания остаётся допустимой
+    seen = np.ones(4, dtype=bool)
+    assert snapshot.best(candidates, zeros, zeros, seen, seen, np.array([0.0, 0.0, 0.0, 1.0])) == 3
+    assert snapshot.best(candidates, np.full(4, 10), np.full(4, 5), no, no, ml) is None
+
+
+@pytest.mark.asyncio
+async def test_store_coalesces_concurrent_refreshes(monkeypatch):
+    builds = []
+
+    async def build_snapshot(session, generation, built_at):
+        builds.append(generation)
+        await asyncio.sleep(0.01)
+        return CampaignSnapshot.from_rows(day=0, generation=generation, built_at=built_at, rows=[])
+
+    monkeypatch.setattr(module, "build_snapshot", build_snapshot)
+    store = CampaignSnapshotStore(database=None, max_age=30.0)
+    snapshots = await asyncio.gather(*(store.refresh(session=object()) for _ in range(10)))
+    # Первый строит сразу, остальные девять дожидаются и получают один общий снимок
+    assert builds == [1, 10]
+    assert store.current is snapshots[-1] and store.current.generation == 10
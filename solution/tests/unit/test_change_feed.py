@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.change_feed import (
+    MAX_PAYLOAD_BYTES,
+    ChangeEntity,
+    ChangeEvent,
+    ChangeFeedListener,
+    ChangeOp,
+)
+
+
+def test_change_event_payload_roundtrip():
+    event = ChangeEvent(ChangeEntity.CAMPAIGN, ("a", "b"), ChangeOp.DELETE)
+    assert ChangeEvent.from_payload(event.to_payload()) == event
+
+
+def test_change_event_split_respects_notify_limit():
+    keys = tuple(str(uuid.uuid4()) for _ in range(1000))
+    parts = ChangeEvent(ChangeEntity.CLIENT, keys).split()
+
+    assert len(parts) > 1
+    assert all(len(p.to_payload().encode()) < 8000 for p in parts)
+    assert all(len(",".join(p.keys)) <= MAX_PAYLOAD_BYTES for p in parts)
+    assert tuple(k for p in parts for k in p.keys) == keys
+
+
+def test_change_event_without_keys_is_not_dropped():
+    assert ChangeEvent(ChangeEntity.TIME).split() == [ChangeEvent(ChangeEntity.TIME)]
+
+
+@pytest.mark.asyncio
+async def test_listener_dispatches_to_entity_subscribers():
+    listener = ChangeFeedListener("postgresql://unused")
+    received = []
+
+    async def on_campaign(event):
+        received.append(("async", event))
+
+    listener.subscribe(ChangeEntity.CAMPAIGN, on_campaign)
+    listener.subscribe([ChangeEntity.CAMPAIGN, ChangeEntity.TIME], lambda e: received.append(("sync", e)))
+
+    event = ChangeEvent(ChangeEntity.CAMPAIGN, ("x",))
+    await listener.dispatch(event)
+    await listener.dispatch(ChangeEvent(ChangeEntity.CLIENT, ("y",)))
+
+    assert received == [("async", event), ("sync", event)]
+
+
+@pytest.mark.asyncio
+async def test_notify_keeps_dispatch_task_until_done():
+    listener = ChangeFeedListener("postgresql://unused")
+    release = asyncio.Event()
+    received = []
+
+    async def on_score(event):
+        await release.wait()
+        received.append(event)
+
+    listener.subscribe(ChangeEntity.ML_SCORE, on_score)
+    event = ChangeEvent(ChangeEntity.ML_SCORE, ("client:advertiser",))
+    listener._on_notify(None, 0, "adv_changes", event.to_payload())
+
+    assert len(listener._dispatches) == 1
+    release.set()
+    await asyncio.gather(*listener._dispatches)
+    assert received == [event]
+    assert not listener._dispatches
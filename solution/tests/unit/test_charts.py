@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bot.utils.api_sdk import DailyStatsResponse
+from bot.utils.charts import ChartRenderer, sparkline
+
+
+def _daily(impressions, clicks):
+    return [
+        DailyStatsResponse(date=day, impressions_count=i, clicks_count=c, conversion=0.0,
+                           spent_impressions=0.0, spent_clicks=0.0, spent_total=0.0)
+        for day, (i, c) in enumerate(zip(impressions, clicks), start=1)
+    ]
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_sparkline_scales_to_range():
+    assert sparkline([0, 7, 14]) == "▁▅█"
+    assert sparkline([3, 3]) == "▁▁"
+    assert sparkline([]) == ""
+
+
+@pytest.mark.asyncio
+async def test_render_is_cached_by_campaign_and_data():
+    executor = CountingExecutor()
+    renderer = ChartRenderer(executor=executor)
+    stats = _daily([10, 20], [1, 2])
+    try:
+        first = await renderer.render("c1", stats)
+        second = await renderer.render("c1", stats)
+        assert first.startswith(b"\x89PNG")
+        assert second is first
+        assert executor.submitted == 1
+
+        await renderer.render("c1", _daily([10, 20, 5], [1, 2, 0]))
+        assert executor.submitted == 2
+    finally:
+        renderer.close()
+
+
+@pytest.mark.asyncio
+async def test_render_returns_none_when_saturated():
+    executor = CountingExecutor()
+    renderer = ChartRenderer(max_pending=1, executor=executor)
+    try:
+        first, second = await asyncio.gather(
+            renderer.render("c1", _daily([1], [0])),
+            renderer.render("c2", _daily([2], [1])),
+        )
+        assert first is not None
+        assert second is None
+        assert "Показы" in renderer.text_fallback(_daily([2], [1]))
+    finally:
+        renderer.close()
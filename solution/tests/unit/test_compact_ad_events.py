@@ -0,0 +1,11 @@
+from api.database.compact_ad_events import COLUMNS, PREPARE_SQL
+from api.database.models.models import AdEvent
+
+
+def test_compact_table_matches_model():
+    # Перенос создаёт таблицу с колонками модели в том же порядке: partitions.convert
+    # потом подключает её начальной партицией без перезаписи
+    table = AdEvent.__table__
+    assert ("id",) + COLUMNS == tuple(column.name for column in table.columns)
+    for column in COLUMNS:
+        assert f"    {column} " in PREPARE_SQL
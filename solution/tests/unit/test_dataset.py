@@ -0,0 +1,51 @@
+import numpy as np
+
+from perf.dataset import DatasetConfig, _matches, generate, table_rows
+
+CFG = DatasetConfig(seed=7, clients=3000, advertisers=40, events=20000, dense_advertisers=2, days=10)
+
+
+def test_same_seed_gives_same_dataset():
+    first, second = generate(CFG), generate(CFG)
+    assert list(first.clients["id"]) == list(second.clients["id"])
+    assert np.array_equal(first.ad_events["client"], second.ad_events["client"])
+    other = generate(DatasetConfig(**{**CFG.__dict__, "events": 100}))
+    # У таблиц независимые потоки: число событий не влияет на кампании
+    assert list(other.campaigns["campaign_id"]) == list(first.campaigns["campaign_id"])
+
+
+def test_ml_scores_are_unique_and_dense_advertisers_cover_everyone():
+    data = generate(CFG)
+    scores = data.ml_scores
+    pairs = scores["client"] * CFG.advertisers + scores["advertiser"]
+    assert len(np.unique(pairs)) == len(pairs)
+    for advertiser in range(CFG.dense_advertisers):
+        assert (scores["advertiser"] == advertiser).sum() == CFG.clients
+
+
+def test_events_follow_serving_rules():
+    data = generate(CFG)
+    events, campaigns = data.ad_events, data.campaigns
+    impressions = events["event_type"] == 0
+    clicks = ~impressions
+    assert impressions.sum() > 0 and clicks.sum() > 0
+
+    imp_keys = events["campaign"][impressions] * CFG.clients + events["client"][impressions]
+    assert len(np.unique(imp_keys)) == len(imp_keys)
+    click_keys = events["campaign"][clicks] * CFG.clients + events["client"][clicks]
+    assert np.isin(click_keys, imp_keys).all()
+
+    assert _matches(data.clients, campaigns, events["client"], events["campaign"]).all()
+    assert (events["event_day"] >= campaigns["start_date"][events["campaign"]]).all()
+    assert (events["event_day"] <= np.minimum(campaigns["end_date"][events["campaign"]], CFG.days)).all()
+
+    per_campaign = np.bincount(events["campaign"][impressions], minlength=len(campaigns["campaign_id"]))
+    assert (per_campaign <= campaigns["impressions_limit"]).all()
+
+
+def test_rows_match_columns():
+    data = generate(CFG)
+    for table in ("clients", "campaigns", "ad_events"):
+        columns, batches = table_rows(data, table, batch_size=1000)
+        row = next(batches)[0]
+        assert len(row) == len(columns)
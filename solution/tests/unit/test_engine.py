@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.database.engine import PoolStatus, connections_needed, database
+from api.routes.time import readiness
+from api.utils.metrics import InstrumentedQueuePool, db_route, instrument_pool
+
+
+def test_connections_needed_covers_every_worker():
+    assert connections_needed(pool_size=20, max_overflow=10, workers=4, reserved=20) == 4 * 31 + 20
+    with pytest.raises(ValueError):
+        connections_needed(pool_size=0, max_overflow=10, workers=1, reserved=0)
+
+
+async def _ready(monkeypatch, pool, ping_error=None):
+    async def ping(timeout):
+        if ping_error:
+            raise ping_error
+
+    monkeypatch.setattr(database, "status", lambda: pool)
+    monkeypatch.setattr(database, "ping", ping)
+    response = await readiness()
+    return response.status_code, json.loads(response.body)
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_pool_saturation(monkeypatch):
+    status, body = await _ready(monkeypatch, PoolStatus(size=20, max_overflow=10, in_use=6, idle=14, overflow=0))
+    assert status == 200 and body["status"] == "ready"
+    assert body["pool"]["saturation"] == 0.2
+
+    status, body = await _ready(monkeypatch, PoolStatus(size=20, max_overflow=10, in_use=29, idle=0, overflow=9))
+    assert status == 503 and body["status"] == "saturated"
+
+    status, body = await _ready(monkeypatch, PoolStatus(size=20, max_overflow=10, in_use=0, idle=20, overflow=0),
+                                ping_error=asyncio.TimeoutError())
+    assert status == 503 and body["status"] == "database unavailable"
+
+    status, body = await _ready(monkeypatch, None)
+    assert status == 503 and body["status"] == "starting"
+
+
+@pytest.mark.asyncio
+async def test_connection_hold_is_labelled_with_route(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/hold.db", poolclass=InstrumentedQueuePool)
+    instrument_pool(engine, "hold-test")
+    labels = {"pool": "hold-test", "route": "/ads"}
+    try:
+        token = db_route.set("/ads")
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        finally:
+            db_route.reset(token)
+    finally:
+        await engine.dispose()
+
+    assert REGISTRY.get_sample_value("db_connection_hold_seconds_count", labels) == 1
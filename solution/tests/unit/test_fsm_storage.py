@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from bot.database.models import BotFSMState
+from bot.storage import BatchingStorage
+from bot.storage.postgres import PostgresStorage
+from bot.storage.batching import UNSET
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+class Form(StatesGroup):
+    name = State()
+
+
+class RecordingBackend(MemoryStorage):
+    def __init__(self, fail_times: int = 0):
+        super().__init__()
+        self.batches = []
+        self.fail_times = fail_times
+
+    async def write_many(self, records):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("backend unavailable")
+        self.batches.append(records)
+        for record in records:
+            if record.state is not UNSET:
+                await self.set_state(record.key, record.state)
+            if record.data is not UNSET:
+                await self.set_data(record.key, record.data)
+
+
+@pytest.mark.asyncio
+async def test_writes_are_coalesced_and_readable_before_flush():
+    backend = RecordingBackend()
+    storage = BatchingStorage(backend, flush_interval=60)
+    try:
+        await storage.set_state(KEY, Form.name)
+        await storage.update_data(KEY, {"a": 1})
+        await storage.update_data(KEY, {"b": 2})
+
+        assert await storage.get_state(KEY) == Form.name.state
+        assert await storage.get_data(KEY) == {"a": 1, "b": 2}
+        assert await backend.get_state(KEY) is None
+
+        await storage.flush()
+        assert len(backend.batches) == 1
+        assert len(backend.batches[0]) == 1
+        assert await backend.get_data(KEY) == {"a": 1, "b": 2}
+    finally:
+        await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_background_flush_and_close():
+    backend = RecordingBackend()
+    storage = BatchingStorage(backend, flush_interval=0.01)
+    await storage.set_state(KEY, "s1")
+    await asyncio.sleep(0.05)
+    assert await backend.get_state(KEY) == "s1"
+
+    await storage.set_data(KEY, {"x": 1})
+    await storage.close()
+    assert await backend.get_data(KEY) == {"x": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_requeued_without_overwriting_newer_writes():
+    backend = RecordingBackend(fail_times=1)
+    storage = BatchingStorage(backend, flush_interval=60)
+    try:
+        await storage.set_state(KEY, "old")
+        await storage.set_data(KEY, {"x": 1})
+        with pytest.raises(ConnectionError):
+            await storage.flush()
+
+        await storage.set_state(KEY, "new")
+        await storage.flush()
+        assert await backend.get_state(KEY) == "new"
+        assert await backend.get_data(KEY) == {"x": 1}
+    finally:
+        await storage.close()
+
+
+@pytest_asyncio.fixture
+async def fsm_sessions():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        # JSONB в SQLite не создаётся — та же таблица с JSON
+        await conn.execute(text(
+            "CREATE TABLE bot_fsm_states (key VARCHAR PRIMARY KEY, state VARCHAR, "
+            "data JSON NOT NULL DEFAULT '{}', expires_at TIMESTAMP)"
+        ))
+    yield sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_expired_row_does_not_revive_unwritten_field(fsm_sessions):
+    storage = PostgresStorage(fsm_sessions, ttl=60)
+    await storage.set_state(KEY, Form.name)
+    await storage.set_data(KEY, {"a": 1})
+    async with fsm_sessions() as session:
+        await session.execute(update(BotFSMState).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        await session.commit()
+
+    await storage.set_state(KEY, Form.name)
+    assert await storage.get_state(KEY) == Form.name.state
+    assert await storage.get_data(KEY) == {}
+
+    await storage.set_data(KEY, {"b": 2})
+    assert await storage.get_state(KEY) == Form.name.state
+    assert await storage.get_data(KEY) == {"b": 2}
@@ -0,0 +1,68 @@
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from perf.loadtest import LoadConfig, LoadTest
+
+CAMPAIGN = "11111111-1111-1111-1111-111111111111"
+ADVERTISER = "22222222-2222-2222-2222-222222222222"
+
+
+async def _fake_backend():
+    seen = {"days": [], "clicks": 0}
+
+    async def get_ad(request):
+        # Чётные клиенты получают объявление, нечётные — 404, как при отсутствии подходящих кампаний
+        if int(request.query["client_id"]) % 2:
+            return web.json_response({"detail": "No suitable campaign found"}, status=404)
+        return web.json_response({"ad_id": CAMPAIGN, "advertiser_id": ADVERTISER, "ad_title": "t",
+                                  "ad_text": "x", "ad_photo_url": None})
+
+    async def click(request):
+        seen["clicks"] += 1
+        return web.Response(status=204)
+
+    async def advance(request):
+        seen["days"].append((await request.json())["current_date"])
+        return web.json_response({"current_date": seen["days"][-1]})
+
+    async def campaign(request):
+        return web.json_response({"impressions_limit": 10, "clicks_limit": 5})
+
+    async def stats(request):
+        return web.json_response({"impressions_count": 12, "clicks_count": 5})
+
+    app = web.Application()
+    app.router.add_get("/ads", get_ad)
+    app.router.add_post("/ads/{ad_id}/click", click)
+    app.router.add_post("/time/advance", advance)
+    app.router.add_get("/advertisers/{adv}/campaigns/{cid}", campaign)
+    app.router.add_get("/stats/campaigns/{cid}", stats)
+    server = TestServer(app)
+    await server.start_server()
+    return server, seen
+
+
+@pytest.mark.asyncio
+async def test_report_counts_statuses_clicks_and_over_delivery():
+    server, seen = await _fake_backend()
+    cfg = LoadConfig(base_url=str(server.make_url("")).rstrip("/"), rate=200, duration=0.25, ctr=1.0,
+                     start_day=3, day_seconds=0.1)
+    try:
+        async with aiohttp.ClientSession() as http:
+            report = await LoadTest(cfg, [str(i) for i in range(10)], http).run()
+    finally:
+        await server.close()
+
+    ads = report["endpoints"]["ads"]
+    assert ads["requests"] == report["scheduled"] == 50
+    assert set(ads["statuses"]) == {"200", "404"}
+    assert ads["errors"] == 0
+    assert ads["latency_ms"]["p50"] <= ads["latency_ms"]["p99"]
+    assert report["endpoints"]["click"]["statuses"] == {"204": ads["statuses"]["200"]} == {"204": seen["clicks"]}
+    assert seen["days"][:2] == [3, 4]
+    assert report["over_delivery"] == {
+        "campaigns_checked": 1, "campaigns_over_impressions": 1, "excess_impressions": 2,
+        "campaigns_over_clicks": 0, "excess_clicks": 0,
+    }
@@ -0,0 +1,33 @@
+import pytest
+from alembic.script import ScriptDirectory
+
+from api.database import migrations
+from api.database.migrations import BASELINE, SchemaOutdated, alembic_config, check_revision, head_revision
+
+
+def test_revisions_form_a_single_chain_from_baseline(monkeypatch, tmp_path):
+    # Конфиг не зависит от текущего каталога — CLI и старт API запускаются откуда угодно
+    monkeypatch.chdir(tmp_path)
+    script = ScriptDirectory.from_config(alembic_config())
+
+    assert script.get_heads() == [head_revision()]
+    chain = [revision.revision for revision in script.walk_revisions()]
+    assert chain[-1] == BASELINE
+    assert len(chain) == len(set(chain))
+
+
+@pytest.mark.asyncio
+async def test_check_revision_refuses_outdated_schema(monkeypatch):
+    async def at(revision):
+        monkeypatch.setattr(migrations, "current_revision", lambda conn: _value(revision))
+        return await check_revision(conn=None)
+
+    assert await at(head_revision()) == head_revision()
+    with pytest.raises(SchemaOutdated, match="migrations upgrade"):
+        await at(BASELINE)
+    with pytest.raises(SchemaOutdated, match="no revision"):
+        await at(None)
+
+
+async def _value(value):
+    return value
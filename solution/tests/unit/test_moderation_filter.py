@@ -0,0 +1,30 @@
+from api.utils.moderation_filter import AhoCorasick, ModerationPrefilter, PrefilterVerdict
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    matches = sorted(automaton.iter_matches("ushers"))
+    assert matches == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_prefilter_rejects_blocked_word_forms():
+    prefilter = ModerationPrefilter(blocklist=["казино"], allowlist=["скидки"])
+    decision = prefilter.check("Лучшие КАЗИНОшки", "Скидки каждый день")
+    assert decision.verdict == PrefilterVerdict.REJECT
+    assert decision.blocked == ("казино",)
+
+
+def test_prefilter_accepts_only_fully_covered_text():
+    prefilter = ModerationPrefilter(blocklist=["казино"], allowlist=["скидки", "каждый день", "на все товары"])
+    accepted = prefilter.check("Скидки", "Скидки на все товары каждый день!")
+    assert accepted.verdict == PrefilterVerdict.ACCEPT
+    assert accepted.coverage == 1.0
+
+    ambiguous = prefilter.check("Скидки", "Скидки на все товары и немного сомнительного")
+    assert ambiguous.verdict == PrefilterVerdict.UNKNOWN
+
+
+def test_prefilter_allowlist_requires_whole_words():
+    prefilter = ModerationPrefilter(blocklist=[], allowlist=["сок"])
+    assert prefilter.check("Высокий", None).verdict == PrefilterVerdict.UNKNOWN
+    assert prefilter.check("Сок", None).verdict == PrefilterVerdict.ACCEPT
@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bot.notifications import NotificationSender, OutboxMessage, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MemoryOutbox:
+    def __init__(self, messages):
+        self.pending = {m.id: m for m in messages}
+        self.sent, self.deferred, self.failed, self.retried = [], [], [], []
+
+    async def claim(self, limit):
+        claimed = sorted(self.pending.values(), key=lambda m: m.id)[:limit]
+        for message in claimed:
+            del self.pending[message.id]
+        return claimed
+
+    async def mark_sent(self, ids):
+        self.sent.extend(ids)
+
+    async def defer(self, ids, delay):
+        self.deferred.extend(ids)
+
+    async def retry(self, message_id, delay, error):
+        self.retried.append(message_id)
+
+    async def fail(self, message_id, error):
+        self.failed.append(message_id)
+
+
+def _message(message_id, chat_id, attempts=1):
+    return OutboxMessage(id=message_id, chat_id=chat_id, kind="limit_reached", body=f"m{message_id}",
+                         attempts=attempts, coalesced=0, created_at=datetime.now(timezone.utc))
+
+
+async def _fake_telegram(responder):
+    received = []
+
+    async def send_message(request):
+        payload = await request.post() if request.content_type != "application/json" else await request.json()
+        received.append((int(payload["chat_id"]), payload["text"]))
+        response = responder(len(received))
+        return web.json_response(response, status=response.get("error_code", 200))
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/sendMessage", send_message)
+    server = TestServer(app)
+    await server.start_server()
+    bot = Bot(token="42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(str(server.make_url("")))))
+    return server, bot, received
+
+
+def _ok(n):
+    return {"ok": True, "result": {"message_id": n, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "x"}}
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=1, clock=clock)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0
+
+
+@pytest.mark.asyncio
+async def test_per_chat_limit_defers_without_blocking_other_chats():
+    server, bot, received = await _fake_telegram(_ok)
+    clock = FakeClock()
+    outbox = MemoryOutbox([_message(1, 10), _message(2, 10), _message(3, 20), _message(4, 30)])
+    sender = NotificationSender(bot, outbox, global_rate=100, global_burst=100, per_chat_rate=1,
+                                clock=clock, sleep=clock.sleep)
+    try:
+        assert await sender.run_once() == 4
+        assert [chat for chat, _ in received] == [10, 20, 30]
+        assert outbox.sent == [1, 3, 4]
+        assert outbox.deferred == [2]
+        assert clock.sleeps == []
+    finally:
+        await bot.session.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_global_rate_is_paced():
+    server, bot, received = await _fake_telegram(_ok)
+    clock = FakeClock()
+    outbox = MemoryOutbox([_message(i, 100 + i) for i in range(1, 5)])
+    sender = NotificationSender(bot, outbox, global_rate=2, global_burst=1, clock=clock, sleep=clock.sleep)
+    try:
+        await sender.run_once()
+        assert len(received) == 4
+        assert sum(clock.sleeps) == pytest.approx(1.5)
+    finally:
+        await bot.session.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_flood_wait_defers_rest_of_batch_and_blocked_chat_fails():
+    def responder(n):
+        if n == 1:
+            return {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+        return {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 7",
+                "parameters": {"retry_after": 7}}
+
+    server, bot, received = await _fake_telegram(responder)
+    clock = FakeClock()
+    outbox = MemoryOutbox([_message(1, 10), _message(2, 20), _message(3, 30)])
+    sender = NotificationSender(bot, outbox, global_rate=100, global_burst=100, clock=clock, sleep=clock.sleep)
+    try:
+        await sender.run_once()
+        assert outbox.failed == [1]
+        assert outbox.deferred == [2, 3]
+        assert outbox.sent == []
+        assert clock.sleeps == [7]
+    finally:
+        await bot.session.close()
+        await server.close()
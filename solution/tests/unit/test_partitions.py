@@ -0,0 +1,19 @@
+from api.database.partitions import Partition, parse_bound, windows
+
+
+def test_parse_bound():
+    assert parse_bound("ad_events_p7", "FOR VALUES FROM (7) TO (14)") == Partition("ad_events_p7", 7, 14)
+    assert parse_bound("ad_events_p_initial", "FOR VALUES FROM (MINVALUE) TO (35)") == \
+        Partition("ad_events_p_initial", None, 35)
+    assert parse_bound("ad_events_default", "DEFAULT") is None
+
+
+def test_windows_are_aligned_and_reach_ahead():
+    assert windows(10, days=7, ahead=2) == [(7, 14), (14, 21), (21, 28)]
+    assert windows(10, since=0, days=7, ahead=0) == [(0, 7), (7, 14)]
+
+
+def test_initial_partition_covers_its_windows():
+    initial = Partition("ad_events_p_initial", None, 14)
+    assert initial.overlaps(7, 14) and not initial.overlaps(14, 21)
+    assert Partition("ad_events_p14", 14, 21).overlaps(20, 27)
@@ -0,0 +1,39 @@
+import math
+
+import pytest
+
+from api.database.engine import Database
+from api.database.replica import LagTracker, ReplicaRouter
+
+
+def test_lag_tracker_measures_since_last_caught_up_sample():
+    lag = LagTracker()
+    assert lag.replica(at=0.0, replay_lsn=0) == math.inf
+
+    lag.primary(at=1.0, lsn=100)
+    assert lag.replica(at=1.1, replay_lsn=100) == pytest.approx(0.1)
+    # Простаивающий primary: LSN не растёт, реплика не отстаёт
+    lag.primary(at=5.0, lsn=100)
+    assert lag.replica(at=5.1, replay_lsn=100) == pytest.approx(0.1)
+
+    # Запись на primary, реплика застряла: отставание растёт от последнего догнанного замера
+    lag.primary(at=6.0, lsn=200)
+    lag.primary(at=7.0, lsn=300)
+    assert lag.replica(at=7.5, replay_lsn=100) == pytest.approx(2.5)
+    assert lag.replica(at=8.0, replay_lsn=250) == pytest.approx(2.0)
+    assert lag.replica(at=8.5, replay_lsn=300) == pytest.approx(1.5)
+
+
+def test_router_reads_primary_unless_replica_is_fresh():
+    replica = Database("postgresql+asyncpg://replica/adv", pool_size=1, max_overflow=0, pool_timeout=1,
+                       pool_recycle=60, connect_timeout=1, name="replica")
+    router = ReplicaRouter(primary=None, replica=replica, max_staleness=5.0, check_interval=1.0)
+    assert not router.use_replica()
+
+    replica.engine = object()
+    router.staleness = 1.0
+    assert router.use_replica()
+    router.staleness = 6.0
+    assert not router.use_replica()
+
+    assert not ReplicaRouter(primary=None, replica=None, max_staleness=5.0, check_interval=1.0).use_replica()
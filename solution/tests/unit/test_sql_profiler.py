@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.utils.sql_profiler import QueryStats, _current_stats, explain_prefix, instrument_engine
+
+
+def test_explain_analyze_only_for_side_effect_free_reads():
+    assert explain_prefix("SELECT * FROM ad_events WHERE campaign_id = $1") == "EXPLAIN (ANALYZE, BUFFERS)"
+    assert explain_prefix("SELECT * FROM campaigns WHERE campaign_id = $1 FOR UPDATE") == "EXPLAIN"
+    assert explain_prefix("SELECT pg_notify($1::VARCHAR, $2::VARCHAR) AS pg_notify_1") == "EXPLAIN"
+    assert explain_prefix("UPDATE campaigns SET first_event_day = $1") is None
+
+
+@pytest.mark.asyncio
+async def test_failed_statement_does_not_break_timing():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(Exception):
+                await conn.execute(text("SELECT * FROM missing_table"))
+            await conn.execute(text("SELECT 1"))
+            assert "query_started" not in conn.sync_connection.info
+    finally:
+        _current_stats.reset(token)
+        await engine.dispose()
+
+    assert stats.statements == 1
+    assert 0 <= stats.db_time < 1
@@ -0,0 +1,174 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import upload
+from api.utils.body_limit import BodySizeLimitMiddleware
+from api.utils.images import ImagePipeline, image_key
+from api.utils.storage import MIN_MULTIPART_PART_BYTES, LocalStorage, S3Storage
+from app.core.config import settings
+from PIL import Image
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.calls = []
+
+    async def put_object(self, **kwargs):
+        self.calls.append(("put_object", len(kwargs["Body"])))
+
+    async def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create_multipart_upload",))
+        return {"UploadId": "u1"}
+
+    async def upload_part(self, **kwargs):
+        self.calls.append(("upload_part", kwargs["PartNumber"], len(kwargs["Body"])))
+        return {"ETag": f"e{kwargs['PartNumber']}"}
+
+    async def complete_multipart_upload(self, **kwargs):
+        self.calls.append(("complete_multipart_upload", kwargs["MultipartUpload"]["Parts"]))
+
+    async def abort_multipart_upload(self, **kwargs):
+        self.calls.append(("abort_multipart_upload",))
+
+
+async def _chunks(*sizes):
+    for size in sizes:
+        yield b"x" * size
+
+
+def _s3_with_fake_client():
+    s3 = S3Storage(bucket="files", public_url="https://cdn/files", part_size=MIN_MULTIPART_PART_BYTES)
+    s3._client = FakeS3Client()
+    return s3
+
+
+def _jpeg(width, height, color="red"):
+    exif = Image.Exif()
+    exif[0x010F] = "SecretCam"
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    local = LocalStorage(str(tmp_path), "http://testserver/media")
+    executor = ThreadPoolExecutor(max_workers=1)
+    pipeline = ImagePipeline(local, widths=(64, 128), executor=executor)
+    monkeypatch.setattr(upload, "image_pipeline", pipeline)
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 4096)
+    app = FastAPI()
+    app.include_router(upload.router)
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=16384)
+    with TestClient(app) as test_client:
+        yield test_client, local
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_small_file_is_a_single_put():
+    s3 = _s3_with_fake_client()
+    assert await s3.save("k.png", _chunks(1000, 1000)) == 2000
+    assert s3._client.calls == [("put_object", 2000)]
+
+
+@pytest.mark.asyncio
+async def test_large_file_is_streamed_in_parts():
+    s3 = _s3_with_fake_client()
+    mb = 1024 * 1024
+    await s3.save("k.png", _chunks(*[mb] * 11))
+    calls = s3._client.calls
+    assert calls[0] == ("create_multipart_upload",)
+    assert calls[1:3] == [("upload_part", 1, 5 * mb), ("upload_part", 2, 5 * mb)]
+    assert calls[3] == ("upload_part", 3, mb)
+    assert calls[4][0] == "complete_multipart_upload"
+    assert [part["PartNumber"] for part in calls[4][1]] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_aborts_multipart_upload():
+    s3 = _s3_with_fake_client()
+
+    async def broken():
+        yield b"x" * MIN_MULTIPART_PART_BYTES
+        raise ConnectionError
+
+    with pytest.raises(ConnectionError):
+        await s3.save("k.png", broken())
+    assert s3._client.calls[-1] == ("abort_multipart_upload",)
+
+
+def test_upload_is_resized_without_metadata(client):
+    test_client, local = client
+    resp = test_client.post("/upload/photo", files={"file": ("a.jpg", _jpeg(200, 100), "image/jpeg")})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["deduplicated"] is False
+    assert body["file_url"] == body["variants"]["128"]
+    assert body["variants"]["64"] == f"http://testserver/media/{image_key(body['content_hash'], 64, 'webp')}"
+
+    with Image.open(local.path(image_key(body["content_hash"], 64, "webp"))) as small:
+        assert small.format == "WEBP"
+        assert small.size == (64, 32)
+        assert not small.getexif()
+
+
+def test_identical_upload_is_deduplicated(client):
+    test_client, local = client
+    first = test_client.post("/upload/photo", files={"file": ("a.jpg", _jpeg(50, 50), "image/jpeg")}).json()
+    key = image_key(first["content_hash"], 128, "webp")
+    # Картинка уже меньше всех вариантов — не растягивается
+    with Image.open(local.path(key)) as image:
+        assert image.size == (50, 50)
+    mtime = local.path(key).stat().st_mtime_ns
+
+    second = test_client.post("/upload/photo", files={"file": ("b.jpg", _jpeg(50, 50), "image/jpeg")}).json()
+    assert second["deduplicated"] is True
+    assert second["variants"] == first["variants"]
+    assert local.path(key).stat().st_mtime_ns == mtime
+
+
+def test_broken_image_is_rejected(client):
+    test_client, local = client
+    resp = test_client.post("/upload/photo", files={"file": ("a.png", b"\x89PNG" + b"0" * 100, "image/png")})
+    assert resp.status_code == 400
+    assert list(local.root.iterdir()) == []
+
+
+def test_variants_are_derived_only_from_pipeline_urls(tmp_path):
+    pipeline = ImagePipeline(LocalStorage(str(tmp_path), "http://cdn/media"), widths=(64, 128))
+    digest = "ab" * 32
+    assert pipeline.variants_for_url(f"http://cdn/media/img/{digest}/128.webp") == {
+        "64": f"http://cdn/media/img/{digest}/64.webp",
+        "128": f"http://cdn/media/img/{digest}/128.webp",
+    }
+    assert pipeline.variants_for_url("https://example.com/photo.jpg") is None
+    assert pipeline.variants_for_url(None) is None
+
+
+def test_file_over_limit_is_rejected(client):
+    test_client, local = client
+    resp = test_client.post("/upload/photo", files={"file": ("a.png", b"0" * 5000, "image/png")})
+    assert resp.status_code == 413
+    assert list(local.root.iterdir()) == []
+
+    resp = test_client.post("/upload/photo", files={"file": ("a.png", b"0" * 20000, "image/png")})
+    assert resp.status_code == 413
+
+
+def test_chunked_body_is_cut_off_while_streaming(client):
+    test_client, local = client
+
+    def body():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\nContent-Type: image/png\r\n\r\n'
+        for _ in range(20):
+            yield b"0" * 1000
+        yield b"\r\n--b--\r\n"
+
+    resp = test_client.post("/upload/photo", content=body(),
+                            headers={"content-type": "multipart/form-data; boundary=b"})
+    assert resp.status_code == 413
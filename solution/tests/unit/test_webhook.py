@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from bot.webhook import SECRET_HEADER, UpdateQueue, create_webhook_app
+
+
+def synthetic_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def _dispatcher(handled: list, delay: float = 0) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def record(message: Message):
+        await asyncio.sleep(delay)
+        handled.append((message.from_user.id, message.text))
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def _client(queue: UpdateQueue, secret=None) -> TestClient:
+    client = TestClient(TestServer(create_webhook_app(queue, secret=secret)))
+    await client.start_server()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_user_keep_order():
+    handled = []
+    bot = Bot(token="42:TEST")
+    queue = UpdateQueue(_dispatcher(handled, delay=0.01), bot, workers=4)
+    client = await _client(queue)
+    try:
+        update_id = 0
+        for i in range(5):
+            for user_id in (1, 2, 3):
+                update_id += 1
+                resp = await client.post("/webhook", json=synthetic_update(update_id, user_id, str(i)))
+                assert resp.status == 200
+        await queue.join()
+
+        for user_id in (1, 2, 3):
+            assert [text for uid, text in handled if uid == user_id] == ["0", "1", "2", "3", "4"]
+    finally:
+        await client.close()
+        await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_answers_503():
+    handled = []
+    bot = Bot(token="42:TEST")
+    queue = UpdateQueue(_dispatcher(handled, delay=0.5), bot, workers=1, max_size=1, put_timeout=0.01)
+    client = await _client(queue)
+    try:
+        statuses = [
+            (await client.post("/webhook", json=synthetic_update(i, 7, "x"))).status
+            for i in range(1, 4)
+        ]
+        assert statuses[:2] == [200, 200]
+        assert statuses[2] == 503
+    finally:
+        await client.close()
+        await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_secret_token_is_checked():
+    bot = Bot(token="42:TEST")
+    queue = UpdateQueue(_dispatcher([]), bot, workers=1)
+    client = await _client(queue, secret="s3cret")
+    try:
+        resp = await client.post("/webhook", json=synthetic_update(1, 1, "x"))
+        assert resp.status == 401
+        resp = await client.post("/webhook", json=synthetic_update(1, 1, "x"), headers={SECRET_HEADER: "s3cret"})
+        assert resp.status == 200
+    finally:
+        await client.close()
+        await bot.session.close()
+
+
+def test_webhook_mode_requires_url():
+    with pytest.raises(ValidationError, match="BOT_WEBHOOK_URL"):
+        Settings(BOT_MODE="webhook", BOT_WEBHOOK_URL=None)
+    assert Settings(BOT_MODE="webhook", BOT_WEBHOOK_URL="https://bot.example").BOT_WEBHOOK_URL